@@ -0,0 +1,19 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+
+# Externel environment
+import os
+
+DEMO_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'test_demo.txt')
+DUPLICATE_LINES = (4, 8) # the lines of the demo with an element given twice in a unit
+
+def demo_lines():
+    with open(DEMO_PATH, 'r') as fin:
+        return fin.readlines()
+
+def demo_puzzles():
+    '''The puzzles of the demo without contradiction: [(line number, Structure), ...]'''
+    return [(i, Structure(line)) for i, line in enumerate(demo_lines()) if line.strip() and i not in DUPLICATE_LINES]
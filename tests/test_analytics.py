@@ -0,0 +1,44 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.analytics import *
+from . import DEMO_PATH, demo_lines, demo_puzzles
+
+# Externel environment
+import unittest
+
+class TestGrade(unittest.TestCase):
+    def test_grade_steps(self):
+        steps = [(0, '1', 'scanned'), (1, '2', 'scanned'), (2, '3', 'area')]
+        grade = grade_steps(steps)
+        self.assertEqual(grade.score, 2 * TECHNIQUE_WEIGHTS['scanned'] + TECHNIQUE_WEIGHTS['area'])
+        self.assertEqual(grade.level, 'medium')
+        self.assertEqual(grade.histogram, {'scanned': 2, 'area': 1})
+        self.assertEqual(grade_steps([]).level, 'easy')
+
+    def test_guess_scored_once(self):
+        # The guess kept in the steps is one of the search nodes
+        grade = grade_steps([(0, '1', 'scanned'), (1, '2', 'guess')], nodes=3)
+        self.assertEqual(grade.score, TECHNIQUE_WEIGHTS['scanned'] + 3 * TECHNIQUE_WEIGHTS['guess'])
+        self.assertEqual(grade.level, 'expert')
+
+    def test_grade_puzzle(self):
+        for i, problem_structure in demo_puzzles():
+            result = solve_puzzle(problem_structure)
+            grade = grade_puzzle(problem_structure)
+            self.assertTrue(grade.flg_solved, 'line ' + str(i))
+            self.assertEqual(grade.steps_num, len(result.steps))
+            self.assertEqual(grade.nodes, result.nodes)
+            self.assertEqual(grade.level == 'expert', result.nodes > 0, 'line ' + str(i))
+            self.assertEqual(grade.to_dict(), grade_puzzle(problem_structure).to_dict())
+        self.assertEqual(grade_puzzle(Structure(demo_lines()[1]), search=False).flg_solved, False)
+
+    def test_grade_file(self):
+        grades = list(grade_file(DEMO_PATH))
+        self.assertEqual([i for i, grade in grades], list(range(len([line for line in demo_lines() if line.strip()]))))
+        self.assertEqual(grades[1][1].to_dict(), grade_puzzle(Structure(demo_lines()[1])).to_dict())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from utils.batch import *
+from . import DEMO_PATH, DUPLICATE_LINES, demo_lines
+
+# Externel environment
+import io
+import unittest
+
+class TestBatch(unittest.TestCase):
+    def test_lines_kept(self):
+        lines = demo_lines()
+        fout = io.StringIO()
+        stats = batch_solve(DEMO_PATH, fout, workers=2, chunk_size=3)
+        results = fout.getvalue().split('\n')[:-1]
+        self.assertEqual(len(results), len(lines))
+        self.assertEqual(sum(stat['puzzles'] for stat in stats.values()), len([line for line in lines if line.strip()]))
+        for i, (line, result) in enumerate(zip(lines, results)):
+            if not line.strip():
+                self.assertEqual(result, '', 'line ' + str(i))
+            elif i in DUPLICATE_LINES:
+                self.assertTrue(result.startswith('Conflict error'), 'line ' + str(i))
+            else:
+                self.assertEqual(result.split(','), dlx_solve(Structure(line))[0], 'line ' + str(i))
+
+    def test_tagged(self):
+        lines = demo_lines()
+        fout = io.StringIO()
+        batch_solve(DEMO_PATH, fout, workers=1, tagged=True)
+        tags = [result.split('\t')[:2] for result in fout.getvalue().split('\n')[:-1]]
+        self.assertEqual(tags, [[str(i), '0' if i in DUPLICATE_LINES else '1'] for i, line in enumerate(lines) if line.strip()])
+
+    def test_solve_line(self):
+        flg_solved, data = solve_line('1,2,3')
+        self.assertFalse(flg_solved)
+        self.assertTrue(data.startswith('Length error'))
+
+if __name__ == '__main__':
+    unittest.main()
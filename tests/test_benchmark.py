@@ -0,0 +1,51 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.benchmark import *
+
+# Externel environment
+import io
+import os
+import json
+import tempfile
+import unittest
+import contextlib
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus(self):
+        for name in ('4x4', '9x9-irregular'):
+            lines, box_idx_list = generate_corpus(name, count=5, seed=1)
+            self.assertEqual(generate_corpus(name, count=5, seed=1), (lines, box_idx_list))
+            self.assertNotEqual(generate_corpus(name, count=5, seed=2)[0], lines)
+            meta_size = CORPORA[name][0]
+            for line in lines:
+                problem_structure = Structure(line, meta_size=meta_size, box_idx_list=box_idx_list)
+                self.assertIsNone(problem_structure.find_conflict())
+        self.assertFalse(get_geometry(3, irregular_boxes(3)).flg_regular)
+
+    def test_report(self):
+        report = run_benchmarks(corpora=['4x4'], benchmarks=['parse', 'solve', 'display'], count=3)
+        self.assertEqual(sorted(report['results']['4x4']), ['display', 'parse', 'solve'])
+        for result in report['results']['4x4'].values():
+            self.assertEqual(result['count'], 3)
+            self.assertLessEqual(result['p50'], result['p99'])
+
+    def test_compare(self):
+        baseline = {'results': {'4x4': {'solve': {'p50': 1.0}, 'parse': {'p50': 1.0}}}}
+        report = {'results': {'4x4': {'solve': {'p50': 1.5}, 'parse': {'p50': 1.1}, 'display': {'p50': 9.0}}}}
+        self.assertEqual(compare_reports(baseline, report, threshold=0.2), [('4x4', 'solve', 1.0, 1.5, 1.5)])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as path:
+            target = os.path.join(path, 'baseline.json')
+            argv = ['--corpora', '4x4', '--benchmarks', 'parse', '--count', '2']
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(argv + ['--save', target]), 0)
+                with open(target, 'r') as fin:
+                    self.assertIn('4x4', json.load(fin)['results'])
+                self.assertEqual(main(argv + ['--compare', target, '--threshold', '1000']), 0)
+
+if __name__ == '__main__':
+    unittest.main()
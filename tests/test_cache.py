@@ -0,0 +1,82 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.predicter import *
+from utils.cache import *
+from . import demo_puzzles
+
+# Externel environment
+import os
+import random
+import tempfile
+import unittest
+
+def transform_puzzle(data, meta_size, rnd):
+    '''An equivalent puzzle: relabel the elements, swap the bands and stacks and transpose the grid at random.'''
+    size = meta_size**2
+    bands = rnd.sample(range(meta_size), meta_size)
+    stacks = rnd.sample(range(meta_size), meta_size)
+    rows = [band * meta_size + i for band in bands for i in range(meta_size)]
+    cols = [stack * meta_size + i for stack in stacks for i in range(meta_size)]
+    elements = sorted(set(element for element in data if element != '.'))
+    labels = dict(zip(elements, rnd.sample(elements, len(elements))))
+    labels['.'] = '.'
+    transposed = rnd.random() < 0.5
+    return [labels[data[cols[c] * size + rows[r] if transposed else rows[r] * size + cols[c]]] for r in range(size) for c in range(size)]
+
+class TestCanonicalize(unittest.TestCase):
+    def test_restore(self):
+        for i, problem_structure in demo_puzzles():
+            canonical_data, transform = canonicalize(problem_structure)
+            self.assertEqual(restore(canonical_data, transform), problem_structure.data, 'line ' + str(i))
+
+    def test_restore_solution(self):
+        for i, problem_structure in demo_puzzles()[:4]:
+            canonical_data, transform = canonicalize(problem_structure)
+            canonical_solution = solve_puzzle(Structure(canonical_data)).solution
+            self.assertEqual(restore(canonical_solution, transform), solve_puzzle(problem_structure).solution, 'line ' + str(i))
+
+    def test_equivalent_puzzles(self):
+        rnd = random.Random(0)
+        for i, problem_structure in demo_puzzles()[:4]:
+            canonical_data = canonicalize(problem_structure)[0]
+            for _ in range(3):
+                data = transform_puzzle(problem_structure.data, problem_structure.meta_size, rnd)
+                self.assertEqual(canonicalize(Structure(data))[0], canonical_data, 'line ' + str(i))
+
+class TestSolutionCache(unittest.TestCase):
+    def test_equivalent_hit(self):
+        rnd = random.Random(1)
+        cache = SolutionCache()
+        problem_structure = demo_puzzles()[2][1]
+        self.assertEqual(cache.solve(problem_structure), solve_puzzle(problem_structure).solution)
+        equivalent = Structure(transform_puzzle(problem_structure.data, 3, rnd))
+        self.assertEqual(cache.solve(equivalent, solve_func=lambda structure: None), solve_puzzle(equivalent).solution)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_eviction(self):
+        cache = SolutionCache(max_size=2)
+        puzzles = [problem_structure for i, problem_structure in demo_puzzles() if problem_structure.meta_size == 3][:3]
+        for problem_structure in puzzles:
+            cache.solve(problem_structure)
+        self.assertEqual(cache.stats()['size'], 2)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertIsNone(cache.get(puzzles[0]))
+        self.assertEqual(cache.get(puzzles[2]), solve_puzzle(puzzles[2]).solution)
+
+    def test_shelf(self):
+        problem_structure = demo_puzzles()[2][1]
+        with tempfile.TemporaryDirectory() as path:
+            cache = SolutionCache(path=os.path.join(path, 'solutions'))
+            cache.solve(problem_structure)
+            cache.close()
+            cache = SolutionCache(path=os.path.join(path, 'solutions'))
+            self.assertEqual(cache.get(problem_structure), solve_puzzle(problem_structure).solution)
+            self.assertEqual(cache.stats()['disk_hits'], 1)
+            cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
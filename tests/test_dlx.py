@@ -0,0 +1,45 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from . import demo_puzzles
+from .test_structure import jigsaw_boxes
+
+# Externel environment
+import unittest
+
+def is_solution(solution, problem_structure):
+    geometry = problem_structure.geometry
+    if any(given != '.' and given != element for given, element in zip(problem_structure.data, solution)): return False
+    return all(len(set(solution[idx] for idx in unit)) == geometry.size for unit in geometry.units)
+
+class TestDancingLinks(unittest.TestCase):
+    def test_demo(self):
+        for i, problem_structure in demo_puzzles():
+            solutions = dlx_solve(problem_structure, max_solutions=2)
+            self.assertEqual(len(solutions), 1, 'line ' + str(i))
+            self.assertTrue(is_solution(solutions[0], problem_structure), 'line ' + str(i))
+
+    def test_count(self):
+        # Every 4x4 grid: 288 of them
+        self.assertEqual(dlx_count(Structure(['.'] * 16), limit=None), 288)
+        self.assertEqual(dlx_count(Structure(['.'] * 16), limit=10), 10)
+        self.assertEqual(len(dlx_solve(Structure(['.'] * 16), max_solutions=5)), 5)
+
+    def test_large_and_irregular(self):
+        for problem_structure in (Structure(['.'] * 256), Structure(['.'] * 81, box_idx_list=jigsaw_boxes(3))):
+            solutions = dlx_solve(problem_structure)
+            self.assertEqual(len(solutions), 1)
+            self.assertTrue(is_solution(solutions[0], problem_structure))
+
+    def test_matrix_restored(self):
+        problem_structure = demo_puzzles()[1][1]
+        dancing_links = get_dancing_links(problem_structure.geometry)
+        links = (list(dancing_links.left), list(dancing_links.right), list(dancing_links.up), list(dancing_links.down))
+        dlx_count(problem_structure, limit=None)
+        self.assertEqual((dancing_links.left, dancing_links.right, dancing_links.up, dancing_links.down), links)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from utils.analytics import *
+from utils.generator import *
+from utils.stream import read_puzzles
+from .test_structure import jigsaw_boxes
+
+# Externel environment
+import os
+import random
+import tempfile
+import unittest
+
+class TestGenerator(unittest.TestCase):
+    def test_levels(self):
+        for level in LEVELS:
+            for seed in range(2):
+                puzzle, solution = generate_puzzle(level=level, rnd=random.Random(seed))
+                problem_structure = Structure(puzzle)
+                self.assertEqual(dlx_count(problem_structure, limit=2), 1, level)
+                self.assertEqual(dlx_solve(problem_structure)[0], solution, level)
+                self.assertEqual(grade_puzzle(problem_structure).level, level)
+
+    def test_any_level(self):
+        for meta_size, box_idx_list in ((2, None), (3, None), (3, jigsaw_boxes(3))):
+            puzzle, solution = generate_puzzle(meta_size=meta_size, box_idx_list=box_idx_list, rnd=random.Random(3), symmetric=True)
+            problem_structure = Structure(puzzle, meta_size=meta_size, box_idx_list=box_idx_list)
+            self.assertEqual(dlx_count(problem_structure, limit=2), 1)
+            self.assertEqual([idx for idx, ele in enumerate(puzzle) if ele == '.'], \
+                [idx for idx, ele in enumerate(puzzle[::-1]) if ele == '.'])
+
+    def test_reproducible(self):
+        puzzles = list(generate_puzzles(4, level='easy', seed=5))
+        self.assertEqual(puzzles, list(generate_puzzles(4, level='easy', seed=5, workers=2, chunk_size=1)))
+        self.assertNotEqual(puzzles, list(generate_puzzles(4, level='easy', seed=6)))
+
+    def test_count_solutions(self):
+        geometry = get_geometry(2)
+        self.assertEqual(count_solutions([15] * 16, geometry, limit=1000), 288)
+        self.assertEqual(count_solutions([15] * 16, geometry, limit=2), 2)
+
+    def test_levels_without_cages(self):
+        # The cage method is graded medium, but the solvers of the plain grids do not have it
+        for level in ('medium', 'hard'):
+            puzzle, solution = generate_puzzle(level=level, rnd=random.Random(1))
+            self.assertEqual(dlx_solve(Structure(puzzle)), [solution], level)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as path:
+            target = os.path.join(path, 'puzzles.txt')
+            main([target, '-n', '2', '-l', 'medium'])
+            self.assertEqual(len(list(read_puzzles(target))), 2)
+
+if __name__ == '__main__':
+    unittest.main()
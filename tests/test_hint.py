@@ -0,0 +1,65 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from utils.hint import *
+from . import demo_lines, demo_puzzles
+
+# Externel environment
+import unittest
+
+class TestHintSession(unittest.TestCase):
+    def test_play_by_hints(self):
+        for i, problem_structure in demo_puzzles():
+            solution = dlx_solve(problem_structure)[0]
+            session = HintSession(problem_structure)
+            hint = session.hint()
+            while hint:
+                idx, element, method = hint
+                self.assertEqual(element, solution[idx], 'line ' + str(i) + ', ' + method)
+                session.place(idx, element)
+                hint = session.hint()
+            self.assertFalse(session.flg_conflict, 'line ' + str(i))
+            # The puzzles needing a guess stop without a hint
+            for idx, element in enumerate(session.data):
+                if element != '.': self.assertEqual(element, solution[idx], 'line ' + str(i))
+            self.assertEqual(session.flg_solved, '.' not in session.data, 'line ' + str(i))
+
+    def test_erase_restores_candidates(self):
+        problem_structure = Structure(demo_lines()[1])
+        solution = dlx_solve(problem_structure)[0]
+        blanks = [idx for idx, element in enumerate(problem_structure.data) if element == '.'][:6]
+        session = HintSession(problem_structure)
+        for idx in blanks:
+            session.place(idx, solution[idx])
+        session.erase(blanks[2])
+        expected = HintSession(problem_structure)
+        for idx in blanks[:2] + blanks[3:]:
+            expected.place(idx, solution[idx])
+        self.assertEqual(session.data, expected.data)
+        self.assertEqual(list(session.solver.candidates), list(expected.solver.candidates))
+        self.assertEqual(session.hint(), expected.hint())
+
+    def test_conflict(self):
+        problem_structure = Structure(demo_lines()[1])
+        solution = dlx_solve(problem_structure)[0]
+        session = HintSession(problem_structure)
+        blanks = [idx for idx, element in enumerate(problem_structure.data) if element == '.']
+        session.place(blanks[0], solution[blanks[0]])
+        hint = session.hint()
+        # The same element again in a peer
+        peer = [idx for idx in session.solver.peers[blanks[0]] if session.data[idx] == '.'][0]
+        session.place(peer, solution[blanks[0]])
+        self.assertTrue(session.flg_conflict)
+        self.assertIsNone(session.hint())
+        session.erase(peer)
+        self.assertFalse(session.flg_conflict)
+        self.assertEqual(session.hint(), hint)
+        given = [idx for idx, element in enumerate(problem_structure.data) if element != '.'][0]
+        with self.assertRaises(AssertionError):
+            session.place(given, solution[given])
+
+if __name__ == '__main__':
+    unittest.main()
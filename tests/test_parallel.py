@@ -0,0 +1,54 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from utils.parallel import *
+from . import DUPLICATE_LINES, demo_lines
+
+# Externel environment
+import unittest
+
+def many_solutions():
+    '''A demo solution with its first three rows blanked, it has several solutions.'''
+    data = dlx_solve(Structure(demo_lines()[2]))[0]
+    for idx in range(27):
+        data[idx] = '.'
+    return Structure(data)
+
+class TestParallel(unittest.TestCase):
+    def test_split_frontier(self):
+        problem_structure = many_solutions()
+        solutions, subproblems = split_frontier(problem_structure, 8)
+        self.assertGreaterEqual(len(solutions) + len(subproblems), 1)
+        # The subproblems are disjoint and cover every solution
+        counts = [dlx_count(Structure(data), limit=None) for data in subproblems]
+        self.assertEqual(len(solutions) + sum(counts), dlx_count(problem_structure, limit=None))
+
+    def test_solve(self):
+        problem_structure = Structure(demo_lines()[1])
+        result = parallel_solve(problem_structure, workers=2, slice_seconds=0.001)
+        self.assertTrue(result.flg_solved)
+        self.assertEqual(result.solution, dlx_solve(problem_structure)[0])
+
+    def test_short_slices(self):
+        # A slice too short for any node still gives back smaller subproblems
+        problem_structure = many_solutions()
+        self.assertEqual(parallel_count(problem_structure, limit=None, workers=2, slice_seconds=0.0), \
+            dlx_count(problem_structure, limit=None))
+
+    def test_count(self):
+        problem_structure = many_solutions()
+        solutions_num = dlx_count(problem_structure, limit=None)
+        self.assertGreater(solutions_num, 2)
+        self.assertEqual(parallel_count(problem_structure, limit=None, workers=2, slice_seconds=0.001), solutions_num)
+        self.assertEqual(parallel_count(problem_structure, limit=2, workers=2, slice_seconds=0.001), 2)
+
+    def test_conflict(self):
+        problem_structure = Structure(demo_lines()[DUPLICATE_LINES[0]])
+        self.assertFalse(parallel_solve(problem_structure, workers=2).flg_solved)
+        self.assertEqual(parallel_count(problem_structure, workers=2), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.predicter import *
+from utils.dlx import *
+from . import demo_lines, demo_puzzles
+
+# Externel environment
+import io
+import unittest
+import contextlib
+
+class TestPredictor(unittest.TestCase):
+    def test_matches_dlx(self):
+        for i, problem_structure in demo_puzzles():
+            solutions = dlx_solve(problem_structure, max_solutions=2)
+            self.assertEqual(len(solutions), 1, 'line ' + str(i))
+            result = solve_puzzle(problem_structure)
+            self.assertTrue(result.flg_solved, 'line ' + str(i))
+            self.assertEqual(result.solution, solutions[0], 'line ' + str(i))
+
+    def test_search_statistics(self):
+        result = solve_puzzle(Structure(demo_lines()[1]))
+        self.assertTrue(result.flg_solved)
+        self.assertGreater(result.nodes, 0)
+        self.assertGreater(result.max_depth, 0)
+        self.assertLessEqual(result.max_depth, result.nodes)
+
+    def test_count_solutions(self):
+        data = dlx_solve(Structure(demo_lines()[2]))[0]
+        for idx in range(0, 81, 3):
+            data[idx] = '.'
+        problem_structure = Structure(data)
+        self.assertEqual(Predictor(problem_structure).search(limit=None), dlx_count(problem_structure, limit=None))
+        self.assertEqual(Predictor(problem_structure).search(limit=2), min(2, dlx_count(problem_structure, limit=None)))
+
+    def test_no_solution(self):
+        # The last blank of the first row has no candidate left: 1 - 8 in its row and 9 in its column
+        data = list('12345678.' + '........9') + ['.'] * 63
+        problem_structure = Structure(data)
+        self.assertEqual(dlx_count(problem_structure, limit=None), 0)
+        result = solve_puzzle(problem_structure)
+        self.assertFalse(result.flg_solved)
+        self.assertEqual(result.solution[8], '.')
+
+class TestSolveResult(unittest.TestCase):
+    def test_no_side_effect(self):
+        for i, problem_structure in demo_puzzles():
+            data = problem_structure.data
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                result = solve_puzzle(problem_structure)
+            self.assertEqual(problem_structure.data, data, 'line ' + str(i))
+            self.assertEqual(output.getvalue(), '', 'line ' + str(i))
+            self.assertEqual(result.reason, None)
+
+    def test_technique_counts_follow_steps(self):
+        for i, problem_structure in demo_puzzles():
+            result = solve_puzzle(problem_structure)
+            histogram = {}
+            for step in result.steps:
+                histogram[step[2]] = histogram.get(step[2], 0) + 1
+            self.assertEqual({method: num for method, num in result.technique_counts.items() if num}, histogram, 'line ' + str(i))
+            self.assertLessEqual(result.technique_counts.get('guess', 0), result.nodes, 'line ' + str(i))
+
+class TestBudget(unittest.TestCase):
+    def check_partial(self, result, solution):
+        # Only the deduced values are kept, the guesses of the search are rolled back
+        self.assertFalse(result.flg_solved)
+        for idx, element in enumerate(result.solution):
+            if element != '.': self.assertEqual(element, solution[idx])
+
+    def test_max_steps(self):
+        problem_structure = Structure(demo_lines()[1])
+        solution = dlx_solve(problem_structure)[0]
+        steps_num = len(solve_puzzle(problem_structure).steps)
+        result = solve_puzzle(problem_structure, budget=Budget(max_steps=steps_num + 1))
+        self.assertEqual(result.reason, 'max_steps')
+        self.check_partial(result, solution)
+
+    def test_max_nodes(self):
+        problem_structure = Structure(demo_lines()[1])
+        result = solve_puzzle(problem_structure, budget=Budget(max_nodes=1))
+        self.assertEqual(result.reason, 'max_nodes')
+        self.check_partial(result, dlx_solve(problem_structure)[0])
+        self.assertEqual(solve_puzzle(problem_structure, budget=Budget(max_nodes=10**6)).reason, None)
+
+    def test_cancelled_and_deadline(self):
+        problem_structure = Structure(demo_lines()[1])
+        token = CancelToken()
+        token.cancel()
+        self.assertEqual(solve_puzzle(problem_structure, budget=Budget(token=token)).reason, 'cancelled')
+        result = solve_puzzle(problem_structure, budget=Budget(deadline=0.0))
+        self.assertEqual(result.reason, 'deadline')
+        self.assertEqual(result.solution, problem_structure.data)
+        self.assertLessEqual(Budget(timeout=1.0, deadline=0.0).deadline, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.solver import *
+from utils.profiler import *
+from . import demo_puzzles
+
+# Externel environment
+import json
+import unittest
+
+class TestProfiler(unittest.TestCase):
+    def test_same_result(self):
+        for i, problem_structure in demo_puzzles()[:6]:
+            result, profiler, _ = profile_solve(problem_structure)
+            self.assertEqual(result.solution, solve_puzzle(problem_structure).solution, 'line ' + str(i))
+            self.assertGreater(profiler.stats['scanned']['calls'], 0)
+            self.assertGreater(profiler.stats['scanned']['placed'], 0)
+
+    def test_merge_and_export(self):
+        problem_structure = demo_puzzles()[2][1]
+        first = profile_solve(problem_structure)[1]
+        second = profile_solve(problem_structure)[1]
+        calls = first.stats['scanned']['calls']
+        first.merge(second)
+        self.assertEqual(first.stats['scanned']['calls'], 2 * calls)
+        element_calls = sum(stat['calls'] for stat in first.stats['scanned']['elements'].values())
+        self.assertEqual(element_calls, 2 * calls)
+        self.assertEqual(json.loads(first.to_json()), first.to_dict())
+
+    def test_detach(self):
+        solver = BasicSolver(demo_puzzles()[2][1])
+        methods = dict(solver.methods)
+        profiler = TechniqueProfiler()
+        profiler.attach(solver)
+        self.assertNotEqual(solver.methods, methods)
+        profiler.detach(solver)
+        self.assertEqual(solver.methods, methods)
+        self.assertIsNone(solver.profiled_methods)
+
+    def test_cprofile(self):
+        result, profiler, cprofile_stats = profile_solve(demo_puzzles()[2][1], cprofile=True)
+        self.assertTrue(result.flg_solved)
+        self.assertTrue(any(key[2] == 'check_scanned_drop' for key in cprofile_stats.stats))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from utils.stream import format_dotted_line, structure_to_raw
+from utils.service import *
+from . import DUPLICATE_LINES, demo_lines, demo_puzzles
+
+# Externel environment
+import asyncio
+import unittest
+
+class TestParse(unittest.TestCase):
+    def test_invalid(self):
+        lines = demo_lines()
+        for line in ['', ' \n', '.' * 80, '.' * 256, 'x' * 81] + [lines[i] for i in DUPLICATE_LINES]:
+            problem_structure, fmt, error = parse_puzzle(line)
+            self.assertIsNone(problem_structure, repr(line))
+            self.assertTrue(error.startswith('invalid puzzle'), repr(line))
+
+    def test_formats(self):
+        problem_structure = demo_puzzles()[1][1]
+        dotted = format_dotted_line(structure_to_raw(problem_structure))
+        for line, fmt in ((','.join(problem_structure.data), 'comma'), (dotted, 'dotted')):
+            parsed, parsed_fmt, error = parse_puzzle(line)
+            self.assertIsNone(error)
+            self.assertEqual(parsed_fmt, fmt)
+            self.assertEqual(parsed.data, problem_structure.data)
+
+class TestSolve(unittest.TestCase):
+    def test_solve_request(self):
+        problem_structure = demo_puzzles()[1][1]
+        dotted = format_dotted_line(structure_to_raw(problem_structure))
+        # The solution is in the comma format whatever the format of the puzzle
+        result = solve_request(bytes(parse_puzzle(dotted)[0].cells))
+        self.assertTrue(result['flg_solved'])
+        self.assertEqual(result['solution'].split(','), dlx_solve(problem_structure)[0])
+        result = solve_request(bytes(problem_structure.cells), max_nodes=0, max_steps=1)
+        self.assertFalse(result['flg_solved'])
+        self.assertIn('reason', result)
+
+    def test_service(self):
+        lines = [line for i, line in enumerate(demo_lines()) if line.strip()][:4] + ['']
+        # The service is built outside the loop, it binds the running loop at the first use
+        service = SolveService(workers=1, timeout=30.0)
+        async def run():
+            await service.start(port=0)
+            try:
+                service.admit(len(lines))
+                deadline = service.loop.time() + service.timeout
+                return [await service.solve(line, deadline) for line in lines], service.metrics()
+            finally:
+                await service.close()
+        results, metrics = asyncio.run(run())
+        for line, result in zip(lines, results):
+            if parse_puzzle(line)[2]:
+                self.assertIn('error', result, repr(line))
+            else:
+                self.assertEqual(result['solution'].split(','), dlx_solve(Structure(line))[0])
+        self.assertEqual(metrics['counts']['puzzles'], len(lines))
+        self.assertEqual(metrics['pending'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.solver import *
+from utils.dlx import *
+from utils.profiler import TechniqueProfiler
+from . import demo_lines, demo_puzzles
+
+# Externel environment
+import random
+import unittest
+from itertools import combinations
+
+def solver_state(solver):
+    return (list(solver.data), list(solver.candidates), list(solver.placed_units), solver.blank_count, \
+        list(solver.steps), solver.flg_conflict)
+
+def naive_candidates(data, geometry, elements):
+    '''The candidates of every blank by reading its row, column and box, as sets of elements.'''
+    units = geometry.rows + geometry.cols + geometry.boxes
+    candidates = []
+    for idx, element in enumerate(data):
+        if element != '.':
+            candidates.append(set())
+            continue
+        seen = set(data[i] for unit in units if idx in unit for i in unit)
+        candidates.append(set(elements) - seen)
+    return candidates
+
+def mask_elements(mask, elements):
+    return set(element for i, element in enumerate(elements) if mask >> i & 1)
+
+class TestBitmask(unittest.TestCase):
+    def test_initial_candidates(self):
+        for i, problem_structure in demo_puzzles():
+            solver = BasicSolver(problem_structure)
+            expected = naive_candidates(problem_structure.data, problem_structure.geometry, solver.elements)
+            self.assertEqual([mask_elements(mask, solver.elements) for mask in solver.candidates], expected, 'line ' + str(i))
+
+    def test_place_updates_masks(self):
+        problem_structure = Structure(demo_lines()[1])
+        solver = BasicSolver(problem_structure)
+        idx = solver.data.index('.')
+        element = sorted(mask_elements(solver.candidates[idx], solver.elements))[0]
+        solver.place(idx, element)
+        self.assertEqual(solver.data[idx], element)
+        expected = naive_candidates(solver.data, problem_structure.geometry, solver.elements)
+        self.assertEqual([mask_elements(mask, solver.elements) for mask in solver.candidates], expected)
+        for unit_id in solver.cell_units[idx]:
+            self.assertTrue(solver.placed_units[unit_id] & solver.element_bits[element])
+
+    def test_basic_solver_agrees_with_dlx(self):
+        for i, problem_structure in demo_puzzles():
+            solution = dlx_solve(problem_structure)[0]
+            solver = BasicSolver(problem_structure)
+            solver.solve()
+            self.assertFalse(solver.flg_conflict, 'line ' + str(i))
+            for idx, element in enumerate(solver.data):
+                if element != '.': self.assertEqual(element, solution[idx], 'line ' + str(i) + ', idx ' + str(idx))
+
+class TestIncremental(unittest.TestCase):
+    def test_same_as_full_scans(self):
+        # A profiled solver scans every cell, unit and element in every step
+        for i, problem_structure in demo_puzzles():
+            solver = BasicSolver(problem_structure)
+            solver.solve()
+            full = BasicSolver(problem_structure)
+            TechniqueProfiler().attach(full)
+            full.solve()
+            self.assertEqual(solver.data, full.data, 'line ' + str(i))
+
+    def test_dirty_marks(self):
+        solver = BasicSolver(Structure(demo_lines()[1]))
+        solver.solve()
+        self.assertEqual((solver.dirty_cells, solver.dirty_units), (set(), set()))
+        self.assertFalse(any(solver.dirty_elements.values()))
+        self.assertFalse(solver.step())
+        idx = solver.data.index('.')
+        element = sorted(mask_elements(solver.candidates[idx], solver.elements))[0]
+        solver.place(idx, element)
+        self.assertEqual(solver.dirty_units, set(solver.cell_units[idx]))
+        self.assertTrue(solver.dirty_cells.issubset(solver.peers[idx]))
+        self.assertTrue(all(mask & solver.element_bits[element] for mask in solver.dirty_elements.values()))
+
+class TestSubsetsAndFish(unittest.TestCase):
+    def test_covered_subsets(self):
+        rnd = random.Random(0)
+        for _ in range(50):
+            items = [(key, rnd.randrange(1, 64)) for key in range(rnd.randrange(2, 8))]
+            items = [item for item in items if popcount(item[1]) <= 3]
+            expected = set()
+            for n in range(2, 4):
+                for subset in combinations(items, n):
+                    union = 0
+                    for key, mask in subset: union |= mask
+                    if popcount(union) <= n: expected.add((tuple(key for key, mask in subset), union))
+            # A subset covering fewer bits than its items is found without its supersets
+            found = set(covered_subsets(items, 3))
+            self.assertTrue(found.issubset(expected))
+            self.assertTrue(all(any(set(keys).issuperset(found_keys) for found_keys, _ in found) for keys, union in expected))
+
+    def test_drops_keep_solution(self):
+        drops = 0
+        for i, problem_structure in demo_puzzles():
+            solution = dlx_solve(problem_structure)[0]
+            solver = BasicSolver(problem_structure)
+            candidates = list(solver.candidates)
+            solver.drop_by_subsets(candidates)
+            for element in solver.elements:
+                solver.drop_by_fish(element, candidates, solver.rows, solver.cell_rows, solver.cell_cols, solver.cols)
+                solver.drop_by_fish(element, candidates, solver.cols, solver.cell_cols, solver.cell_rows, solver.rows)
+            for idx, mask in enumerate(candidates):
+                if solver.data[idx] == '.': self.assertTrue(mask & solver.element_bits[solution[idx]], 'line ' + str(i))
+            drops += sum(popcount(mask) for mask in solver.candidates) - sum(popcount(mask) for mask in candidates)
+        self.assertGreater(drops, 0)
+
+class TestCheckpoint(unittest.TestCase):
+    def test_rollback_restores_state(self):
+        problem_structure = Structure(demo_lines()[1])
+        solver = BasicSolver(problem_structure)
+        solver.solve()
+        before = solver_state(solver)
+        checkpoint = solver.checkpoint()
+        # Guess every candidate of the first blank, each followed by the basic solver, and roll back after each
+        idx = solver.data.index('.')
+        for element in solver.elements:
+            if not solver.candidates[idx] & solver.element_bits[element]: continue
+            solver.add_ready(idx, element, method='guess')
+            solver.update()
+            solver.solve()
+            self.assertNotEqual(solver_state(solver), before)
+            solver.rollback(checkpoint)
+            self.assertEqual(solver_state(solver), before)
+
+    def test_nested_checkpoints(self):
+        solver = BasicSolver(Structure(demo_lines()[1]))
+        blanks = [idx for idx, element in enumerate(solver.data) if element == '.']
+        first_state, first = solver_state(solver), solver.checkpoint()
+        mask = solver.candidates[blanks[0]]
+        element = solver.elements[(mask & -mask).bit_length() - 1]
+        solver.place(blanks[0], element)
+        second_state, second = solver_state(solver), solver.checkpoint()
+        # The same element again in a peer is a contradiction
+        peer = [idx for idx in solver.peers[blanks[0]] if solver.data[idx] == '.'][0]
+        solver.place(peer, element)
+        self.assertTrue(solver.flg_conflict)
+        solver.rollback(second)
+        self.assertEqual(solver_state(solver), second_state)
+        solver.rollback(first)
+        self.assertEqual(solver_state(solver), first_state)
+
+    def test_undo_place_restores_masks(self):
+        problem_structure = Structure(demo_lines()[1])
+        solver = BasicSolver(problem_structure)
+        before = solver_state(solver)
+        idxes = [idx for idx, element in enumerate(solver.data) if element == '.'][:5]
+        for idx in idxes:
+            candidates = solver.candidates[idx]
+            if candidates: solver.place(idx, solver.elements[(candidates & -candidates).bit_length() - 1])
+        while solver.trail:
+            solver.undo_place()
+        self.assertEqual(solver_state(solver), before)
+
+if __name__ == '__main__':
+    unittest.main()
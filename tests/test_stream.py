@@ -0,0 +1,62 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.stream import *
+from . import demo_puzzles
+
+# Externel environment
+import io
+import os
+import tempfile
+import unittest
+
+class TestStream(unittest.TestCase):
+    def round_trip(self, fmt, puzzles, meta_size=3):
+        with tempfile.TemporaryDirectory() as path:
+            target = os.path.join(path, 'puzzles.' + fmt)
+            self.assertEqual(write_puzzles(target, puzzles, fmt=fmt, meta_size=meta_size), len(puzzles))
+            return list(read_puzzles(target, raw=True))
+
+    def test_round_trips(self):
+        puzzles = [problem_structure for i, problem_structure in demo_puzzles() if problem_structure.meta_size == 3]
+        raws = [structure_to_raw(problem_structure) for problem_structure in puzzles]
+        for fmt in ('comma', 'dotted', 'binary'):
+            self.assertEqual(self.round_trip(fmt, puzzles), raws, fmt)
+
+    def test_binary_large(self):
+        # The grids over 9x9 use a byte per cell instead of 4 bits
+        puzzles = [bytearray(i % 26 for i in range(625)), bytearray(625)]
+        self.assertEqual(self.round_trip('binary', puzzles, meta_size=5), puzzles)
+
+    def test_binary_random_access(self):
+        puzzles = [structure_to_raw(problem_structure) for i, problem_structure in demo_puzzles() if problem_structure.meta_size == 3]
+        with tempfile.TemporaryDirectory() as path:
+            target = os.path.join(path, 'puzzles.bin')
+            write_puzzles(target, puzzles, fmt='binary')
+            with BinaryPuzzleFile(target) as binary_file:
+                self.assertEqual(len(binary_file), len(puzzles))
+                self.assertEqual(binary_file[3], puzzles[3])
+                self.assertEqual(binary_file[-1], puzzles[-1])
+                with self.assertRaises(IndexError):
+                    binary_file[len(puzzles)]
+
+    def test_dotted(self):
+        self.assertEqual(parse_dotted_line('0.3' + '0' * 78), bytearray([0, 0, 3] + [0] * 78))
+        with self.assertRaises(AssertionError):
+            parse_dotted_line('x' * 81)
+        with self.assertRaises(AssertionError):
+            PuzzleWriter(io.StringIO(), fmt='dotted', meta_size=4)
+
+    def test_structures(self):
+        puzzles = [problem_structure for i, problem_structure in demo_puzzles()]
+        buffer = io.StringIO()
+        for problem_structure in puzzles:
+            buffer.write(','.join(problem_structure.data) + '\n')
+        buffer.seek(0)
+        self.assertEqual([problem_structure.data for problem_structure in read_puzzles(buffer)], \
+            [problem_structure.data for problem_structure in puzzles])
+
+if __name__ == '__main__':
+    unittest.main()
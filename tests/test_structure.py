@@ -0,0 +1,141 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.solver import BasicSolver
+from . import DUPLICATE_LINES, demo_lines, demo_puzzles
+
+# Externel environment
+import io
+import unittest
+
+def jigsaw_boxes(meta_size):
+    '''The regular boxes with the last cell of the first box swapped with the first cell of the second box.'''
+    boxes = [list(box) for box in get_geometry(meta_size).boxes]
+    boxes[0][-1], boxes[1][0] = boxes[1][0], boxes[0][-1]
+    return boxes
+
+class TestGeometry(unittest.TestCase):
+    def check_tables(self, geometry):
+        size = geometry.size
+        for idx in range(size**2):
+            self.assertIn(idx, geometry.rows[geometry.cell_rows[idx]])
+            self.assertIn(idx, geometry.cols[geometry.cell_cols[idx]])
+            self.assertIn(idx, geometry.boxes[geometry.cell_boxes[idx]])
+            self.assertEqual(geometry.cell_rows[idx], idx // size)
+            self.assertEqual(geometry.cell_cols[idx], idx % size)
+            units = [unit for unit in geometry.units if idx in unit]
+            self.assertEqual(sorted(geometry.units[unit_id] for unit_id in geometry.cell_units[idx]), sorted(units))
+            self.assertEqual(set(geometry.peers[idx]), set(i for unit in units for i in unit) - {idx})
+
+    def test_regular(self):
+        for meta_size in (2, 3, 4):
+            geometry = get_geometry(meta_size)
+            self.assertTrue(geometry.flg_regular)
+            self.assertEqual(len(geometry.peers[0]), 3 * meta_size**2 - 2 * meta_size - 1)
+            self.check_tables(geometry)
+
+    def test_irregular(self):
+        for meta_size in (2, 3):
+            geometry = get_geometry(meta_size, jigsaw_boxes(meta_size))
+            self.assertFalse(geometry.flg_regular)
+            self.check_tables(geometry)
+
+    def test_cached(self):
+        self.assertIs(get_geometry(3), get_geometry(3))
+        self.assertIs(get_geometry(3, jigsaw_boxes(3)), get_geometry(3, jigsaw_boxes(3)))
+        for i, problem_structure in demo_puzzles():
+            self.assertIs(problem_structure.geometry, get_geometry(problem_structure.meta_size))
+
+    def test_bad_boxes(self):
+        boxes = jigsaw_boxes(2)
+        boxes[0][0] = boxes[1][1]
+        with self.assertRaises(AssertionError):
+            get_geometry(2, boxes)
+
+class TestStructure(unittest.TestCase):
+    def test_cells(self):
+        for i, problem_structure in demo_puzzles():
+            cells = problem_structure.cells
+            self.assertIsInstance(cells, bytearray)
+            self.assertEqual(len(cells), problem_structure.meta_size**4)
+            self.assertEqual([problem_structure.symbols[element_id] for element_id in cells], problem_structure.data)
+            self.assertEqual(Structure(bytes(cells), meta_size=problem_structure.meta_size).data, problem_structure.data)
+            self.assertEqual(Structure(problem_structure.data).cells, cells)
+
+    def test_compact(self):
+        problem_structure = demo_puzzles()[1][1]
+        self.assertFalse(hasattr(problem_structure, '__dict__'))
+        other = Structure(problem_structure.data)
+        self.assertIs(other.elements, problem_structure.elements)
+        self.assertIs(other.geometry, problem_structure.geometry)
+
+    def test_data_setter(self):
+        problem_structure = Structure(['.'] * 16)
+        data = list('1234341221434321')
+        problem_structure.data = data
+        self.assertEqual(problem_structure.data, data)
+        with self.assertRaises(AssertionError):
+            problem_structure.data = ['5'] * 16
+        with self.assertRaises(AssertionError):
+            Structure(bytes([5] * 16), meta_size=2)
+
+class TestConflict(unittest.TestCase):
+    def test_duplicate_givens(self):
+        lines = demo_lines()
+        for i in DUPLICATE_LINES:
+            problem_structure = Structure(lines[i])
+            conflict = problem_structure.find_conflict()
+            self.assertIsNotNone(conflict, 'line ' + str(i))
+            self.assertEqual(conflict[0], 'duplicate')
+            self.assertTrue(BasicSolver(problem_structure).flg_conflict, 'line ' + str(i))
+
+    def test_no_candidate(self):
+        # The last blank of the first row has no candidate left: 1 - 8 in its row and 9 in its column
+        problem_structure = Structure(list('12345678.' + '........9') + ['.'] * 63)
+        self.assertEqual(problem_structure.find_conflict(), ('no_candidate', 8))
+        self.assertTrue(BasicSolver(problem_structure).flg_conflict)
+
+    def test_no_conflict(self):
+        for i, problem_structure in demo_puzzles():
+            self.assertIsNone(problem_structure.find_conflict(), 'line ' + str(i))
+
+    def test_validate_many(self):
+        lines = demo_lines()
+        puzzles = [line for line in lines if line.strip()] + ['1,2,3', Structure(lines[1])]
+        errors = dict(validate_many(puzzles))
+        self.assertEqual(sorted(errors), list(range(len(puzzles))))
+        for i, puzzle in enumerate(puzzles[:-2]):
+            if lines.index(puzzle) in DUPLICATE_LINES:
+                self.assertTrue(errors[i].startswith('Conflict error'), 'puzzle ' + str(i))
+            else:
+                self.assertIsNone(errors[i], 'puzzle ' + str(i))
+        self.assertTrue(errors[len(puzzles) - 2].startswith('Length error'))
+        self.assertIsNone(errors[len(puzzles) - 1])
+
+class TestDisplay(unittest.TestCase):
+    def test_borders(self):
+        data = list('1.34341221434321')
+        self.assertEqual(Structure(data).display(), \
+            '+---+---+\n|1 .|3 4|\n|   |   |\n|3 4|1 2|\n+---+---+\n|2 1|4 3|\n|   |   |\n|4 3|2 1|\n+---+---+\n')
+        self.assertEqual(Structure(data, meta_size=2, box_idx_list=jigsaw_boxes(2)).display(), \
+            '+-----+-+\n|1 . 3|4|\n| +---+ |\n|3|4 1 2|\n+-+-+---+\n|2 1|4 3|\n|   |   |\n|4 3|2 1|\n+---+---+\n')
+
+    def test_cached_template(self):
+        problem_structure = demo_puzzles()[1][1]
+        template = get_display_template(problem_structure.geometry, 1, True)
+        self.assertIs(get_display_template(problem_structure.geometry, 1, True), template)
+        self.assertEqual(template.count('%s'), 81)
+        self.assertEqual(problem_structure.display(), template % tuple(problem_structure.data))
+
+    def test_render_many(self):
+        puzzles = [problem_structure for i, problem_structure in demo_puzzles()]
+        data = ['1'] * 16
+        fout = io.StringIO()
+        self.assertEqual(render_many(puzzles + [(puzzles[0], data)], fout, separator='--\n'), len(puzzles) + 1)
+        displays = [problem_structure.display() for problem_structure in puzzles] + [puzzles[0].display(data)]
+        self.assertEqual(fout.getvalue(), ''.join(display + '--\n' for display in displays))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.predicter import *
+from utils.stream import pack_raw
+from utils.trace import *
+from . import demo_puzzles
+
+# Externel environment
+import io
+import unittest
+
+class TestTrace(unittest.TestCase):
+    def trace(self, puzzles, flg_rollbacks):
+        buffer = io.BytesIO()
+        writer = TraceWriter(buffer, flg_rollbacks=flg_rollbacks)
+        results = [writer.trace_solve(problem_structure, puzzle_id=i) for i, problem_structure in enumerate(puzzles)]
+        buffer.seek(0)
+        return results, list(read_traces(buffer))
+
+    def test_round_trips(self):
+        puzzles = [problem_structure for i, problem_structure in demo_puzzles()]
+        for flg_rollbacks in (False, True):
+            results, records = self.trace(puzzles, flg_rollbacks)
+            self.assertEqual(len(records), len(puzzles))
+            for i, (problem_structure, result, record) in enumerate(zip(puzzles, results, records)):
+                self.assertEqual(record.puzzle_id, i)
+                self.assertEqual(record.cells, problem_structure.cells)
+                self.assertEqual(record.flg_solved, result.flg_solved)
+                self.assertEqual(record.nodes, result.nodes)
+                self.assertEqual([(idx, problem_structure.symbols[element_id], method) for idx, element_id, method, _ in record.steps], \
+                    [tuple(step) for step in result.steps])
+                self.assertEqual(record.replay().data, result.solution)
+
+    def test_large_end_record(self):
+        buffer = io.BytesIO()
+        writer = TraceWriter(buffer)
+        problem_structure = demo_puzzles()[0][1]
+        writer.begin(problem_structure)
+        writer.end(SolveResult(list(problem_structure.data), False, [], {}, 5000.0, nodes=2**33))
+        buffer.seek(0)
+        record = next(read_traces(buffer))
+        self.assertEqual(record.nodes, 2**33)
+        self.assertAlmostEqual(record.seconds, 5000.0)
+
+    def test_old_version(self):
+        # The traces of the version 1 have the 32-bit end records
+        problem_structure = demo_puzzles()[1][1]
+        buffer = io.BytesIO(TRACE_HEADER.pack(TRACE_MAGIC, 1) + PUZZLE_RECORD.pack(PUZZLE_CODE, 3, 7) + \
+            pack_raw(problem_structure.cells, 3) + END_RECORDS[1].pack(END_CODE, 0, 12, 3, 1500000))
+        record = next(read_traces(buffer))
+        self.assertEqual((record.puzzle_id, record.nodes, record.rollbacks, record.flg_solved), (7, 12, 3, False))
+        self.assertAlmostEqual(record.seconds, 1.5)
+        self.assertEqual(record.replay().data, problem_structure.data)
+        with self.assertRaises(AssertionError):
+            list(read_traces(io.BytesIO(TRACE_HEADER.pack(TRACE_MAGIC, 9))))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.solver import *
+from utils.predicter import *
+from utils.dlx import *
+from . import demo_lines
+
+# Externel environment
+import random
+import unittest
+
+def is_valid(data, geometry):
+    '''Every unit holds different elements, and every cage sums up to its total.'''
+    if '.' in data: return False
+    for unit in geometry.rows + geometry.cols + geometry.boxes + geometry.extras:
+        if len(set(data[idx] for idx in unit)) != len(unit): return False
+    for idxes, total in geometry.cages:
+        values = [int(data[idx]) for idx in idxes]
+        if len(set(values)) != len(values) or sum(values) != total: return False
+    return True
+
+def row_cages(solution):
+    '''The cages of three cells in a row, the totals are read from the solution.'''
+    return [(list(range(start, start + 3)), sum(int(solution[idx]) for idx in range(start, start + 3))) \
+            for start in range(0, 81, 3)]
+
+class TestDiagonal(unittest.TestCase):
+    def test_matches_dlx(self):
+        units = diagonal_units(3)
+        solution = solve_puzzle(Structure(['.'] * 81, units=units)).solution
+        self.assertTrue(is_valid(solution, get_geometry(3, units=units)))
+        rnd = random.Random(0)
+        for _ in range(5):
+            data = list(solution)
+            for idx in rnd.sample(range(81), 50):
+                data[idx] = '.'
+            problem_structure = Structure(data, units=units)
+            solutions = dlx_solve(problem_structure, max_solutions=2)
+            result = solve_puzzle(problem_structure)
+            self.assertTrue(result.flg_solved)
+            self.assertTrue(is_valid(result.solution, problem_structure.geometry))
+            if len(solutions) == 1: self.assertEqual(result.solution, solutions[0])
+
+    def test_conflict(self):
+        data = ['.'] * 81
+        data[0], data[40] = '5', '5'
+        self.assertIsNone(Structure(data).find_conflict())
+        self.assertEqual(Structure(data, units=diagonal_units(3)).find_conflict()[0], 'duplicate')
+
+class TestKiller(unittest.TestCase):
+    def test_solve(self):
+        solution = dlx_solve(Structure(demo_lines()[2]))[0]
+        problem_structure = Structure(['.'] * 81, cages=row_cages(solution))
+        result = solve_puzzle(problem_structure)
+        self.assertTrue(result.flg_solved)
+        self.assertTrue(is_valid(result.solution, problem_structure.geometry))
+        with self.assertRaises(AssertionError):
+            dlx_solve(problem_structure)
+
+    def test_cage_combinations(self):
+        values = list(range(1, 10))
+        self.assertEqual(cage_combinations(values, (1 << 9) - 1, 2, 3), (0b11,))
+        self.assertEqual(cage_combinations(values, (1 << 9) - 1, 9, 45), ((1 << 9) - 1,))
+        self.assertEqual(cage_combinations(values, 0b110, 2, 3), ())
+        self.assertEqual(sorted(cage_combinations(values, (1 << 9) - 1, 2, 10)), \
+            sorted((1 << (a - 1)) | (1 << (9 - a)) for a in range(1, 5)))
+
+    def test_conflict(self):
+        data = ['1', '2'] + ['.'] * 79
+        self.assertIsNone(Structure(data, cages=[([0, 1], 3)]).find_conflict())
+        self.assertEqual(Structure(data, cages=[([0, 1], 4)]).find_conflict(), ('cage', 0))
+        self.assertEqual(Structure(data, cages=[([0, 1, 2], 2)]).find_conflict(), ('cage', 0))
+        self.assertTrue(BasicSolver(Structure(data, cages=[([0, 1], 4)])).flg_conflict)
+
+    def test_layout_cache_bound(self):
+        solution = dlx_solve(Structure(demo_lines()[2]))[0]
+        for shift in range(LAYOUT_CACHE_SIZE + 10):
+            cages = row_cages(solution)
+            cages[0] = (cages[0][0], cages[0][1] + shift)
+            Structure(['.'] * 81, cages=cages).display()
+        self.assertLessEqual(len(geometry_cache), LAYOUT_CACHE_SIZE)
+        self.assertLessEqual(len(display_templates), LAYOUT_CACHE_SIZE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from utils.structure import *
+from utils.dlx import *
+from utils.stream import structure_to_raw, VALUES
+from utils.vectorized import *
+from . import DUPLICATE_LINES, demo_lines, demo_puzzles
+
+# Externel environment
+import unittest
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestVectorized(unittest.TestCase):
+    def setUp(self):
+        puzzles = [problem_structure for i, problem_structure in demo_puzzles() if problem_structure.meta_size == 3]
+        self.raws = [list(structure_to_raw(problem_structure)) for problem_structure in puzzles]
+        self.solutions = [[VALUES[ele] for ele in dlx_solve(problem_structure)[0]] for problem_structure in puzzles]
+
+    def test_propagate(self):
+        grids, unsolved, conflicted = batch_propagate(self.raws)
+        self.assertFalse(conflicted.any())
+        for grid, flg_unsolved, solution in zip(grids.tolist(), unsolved, self.solutions):
+            self.assertTrue(all(value in (0, expected) for value, expected in zip(grid, solution)))
+            self.assertEqual(bool(flg_unsolved), 0 in grid)
+        small_grids, small_unsolved, _ = batch_propagate(self.raws, chunk_size=3)
+        self.assertTrue((small_grids == grids).all() and (small_unsolved == unsolved).all())
+
+    def test_solve(self):
+        grids, solved = batch_solve_array(self.raws)
+        self.assertTrue(solved.all())
+        self.assertEqual(grids.tolist(), self.solutions)
+
+    def test_conflict(self):
+        raw = list(structure_to_raw(Structure(demo_lines()[DUPLICATE_LINES[1]])))
+        grids, solved = batch_solve_array([raw] + self.raws[:2])
+        self.assertEqual(solved.tolist(), [False, True, True])
+        self.assertTrue(batch_propagate([raw])[2][0])
+
+if __name__ == '__main__':
+    unittest.main()
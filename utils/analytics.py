@@ -3,3 +3,72 @@
 
 from .structure import *
 from .solver import *
+from .predicter import *
+from .stream import read_puzzles
+
+# The weight of every placement by the technique, the guesses are weighted per search node explored instead.
+TECHNIQUE_WEIGHTS = {'scanned': 1, 'cage': 4, 'area': 4, 'group': 8, 'square': 10, 'subset': 6, 'fish': 12, 'guess': 30}
+# The level of a puzzle is decided by the hardest technique it needs.
+TECHNIQUE_LEVELS = {'scanned': 'easy', 'cage': 'medium', 'area': 'medium', 'group': 'hard', 'square': 'hard', 'subset': 'hard', 'fish': 'hard', \
+                    'guess': 'expert'}
+LEVELS = ['easy', 'medium', 'hard', 'expert']
+
+class Grade():
+    '''The difficulty grade of a puzzle, computed from the steps of its solve only, so it is deterministic.
+
+    Elements:
+    - score(int): sum of the technique weights of every placement but the guesses, plus the guess weight of every search node,
+        so a guess is scored once whether it is kept in the steps or rolled back
+    - level(str): easy / medium / hard / expert, by the hardest technique used
+    - histogram(dict): {method: the number of placements}
+    - steps_num(int): the number of placements
+    - nodes(int): the number of search nodes
+    - flg_solved(Boolean)
+    '''
+    __slots__ = ('score', 'level', 'histogram', 'steps_num', 'nodes', 'flg_solved')
+
+    def __init__(self, score, level, histogram, steps_num, nodes, flg_solved):
+        self.score = score
+        self.level = level
+        self.histogram = histogram
+        self.steps_num = steps_num
+        self.nodes = nodes
+        self.flg_solved = flg_solved
+
+    def to_dict(self):
+        return {'score': self.score, 'level': self.level, 'histogram': dict(self.histogram), \
+                'steps_num': self.steps_num, 'nodes': self.nodes, 'flg_solved': self.flg_solved}
+
+    def __repr__(self):
+        return 'Grade(' + ', '.join(key + '=' + repr(value) for key, value in self.to_dict().items()) + ')'
+
+def grade_steps(steps, nodes=0, flg_solved=True):
+    '''Grade the steps [(idx, element, method), ...] of a solve.'''
+    histogram = {}
+    for step in steps:
+        histogram[step[2]] = histogram.get(step[2], 0) + 1
+    score = sum(TECHNIQUE_WEIGHTS.get(method, 0) * num for method, num in histogram.items() if method != 'guess') + \
+        TECHNIQUE_WEIGHTS['guess'] * nodes
+    level = LEVELS[max([LEVELS.index(TECHNIQUE_LEVELS.get(method, 'easy')) for method in histogram] + [0])]
+    return Grade(score, level, histogram, len(steps), nodes, flg_solved)
+
+def grade_result(result):
+    '''Grade a SolveResult.'''
+    return grade_steps(result.steps, nodes=result.nodes, flg_solved=result.flg_solved)
+
+def grade_puzzle(problem_structure, search=True):
+    '''Solve the puzzle without rendering and grade it.'''
+    return grade_result(solve_puzzle(problem_structure, search=search))
+
+def grade_file(source, fmt=None, search=True):
+    '''Grade every puzzle of a file in one pass.
+
+    Input:
+    - source(str / file): read by stream.read_puzzles
+    - fmt(str): the same as stream.read_puzzles
+
+    Output:
+    - generator of (i, grade), i is the index of the puzzle in the file
+    '''
+    for i, problem_structure in enumerate(read_puzzles(source, fmt=fmt)):
+        yield i, grade_puzzle(problem_structure, search=search)
@@ -0,0 +1,137 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+
+# Externel environment
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+def solve_line(line, timeout=None, max_nodes=None):
+    '''Solve a puzzle line in the comma format with the predictor.
+
+    Input:
+    - timeout(float) / max_nodes(int): the budget of the solve, if None(default), then no limit
+
+    Output:
+    - (flg_solved, data): data is the comma joined result, the partial one if the budget runs out,
+                            or the error message if the line is invalid or its givens contradict each other
+    '''
+    budget = Budget(timeout=timeout, max_nodes=max_nodes) if timeout is not None or max_nodes is not None else None
+    try:
+        problem_structure = Structure(line)
+    except AssertionError as e:
+        return False, str(e)
+    conflict = problem_structure.find_conflict()
+    if conflict:
+        return False, problem_structure.conflict_message(conflict)
+    result = solve_puzzle(problem_structure, budget=budget)
+    return result.flg_solved, ','.join(result.solution)
+
+def solve_chunk(chunk, timeout=None, max_nodes=None):
+    '''Solve a chunk of puzzle lines in a worker.
+
+    Input:
+    - chunk(list): [(line_no, line), ...]
+    - timeout(float) / max_nodes(int): the budget of every puzzle
+
+    Output:
+    - (pid, seconds, results): results is [(line_no, flg_solved, data), ...], flg_solved is None for a blank line
+    '''
+    start = time.time()
+    results = []
+    for line_no, line in chunk:
+        if not line.strip():
+            results.append((line_no, None, ''))
+            continue
+        flg_solved, data = solve_line(line, timeout=timeout, max_nodes=max_nodes)
+        results.append((line_no, flg_solved, data))
+    return os.getpid(), time.time() - start, results
+
+def read_chunks(lines, chunk_size):
+    '''Read the lines lazily into chunks of [(line_no, line), ...], the blank lines are kept so that the results keep the line numbers.'''
+    numbered = enumerate(lines)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk: return
+        yield chunk
+
+def batch_solve(input_file, output_file, workers=None, chunk_size=256, tagged=False, timeout=None, max_nodes=None):
+    '''Solve every puzzle in the input file with a process pool and write the results in the input order.
+    At most 2 chunks per worker are in flight, so the memory is bounded whatever the input size.
+
+    Input:
+    - input_file(str / file): the puzzle file, one puzzle per line in the comma format
+    - output_file(str / file): the result file, one result per puzzle line.
+        Without tagged, an empty line is written for a blank line, so the result line N is the one of the input line N.
+    - workers(int): the number of processes, if None(default), then os.cpu_count()
+    - chunk_size(int): the number of puzzles in one submission
+    - tagged(Boolean): if True, then every result line is 'line_no\\tflg_solved\\tdata' and the blank lines are not written,
+                        else only the data
+    - timeout(float): the max seconds of every puzzle, the partial result is written if it runs out
+    - max_nodes(int): the max search nodes of every puzzle
+
+    Output:
+    - stats(dict): {pid: {'puzzles': num, 'seconds': seconds, 'throughput': puzzles per second}, ...}
+    '''
+    workers = workers if workers else os.cpu_count()
+    fin = open(input_file, 'r') if isinstance(input_file, str) else input_file
+    fout = open(output_file, 'w') if isinstance(output_file, str) else output_file
+    stats = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            chunks = read_chunks(fin, chunk_size)
+            for chunk in chunks:
+                pending.append(executor.submit(solve_chunk, chunk, timeout, max_nodes))
+                if len(pending) >= 2 * workers:
+                    write_results(pending.popleft().result(), fout, stats, tagged)
+            while pending:
+                write_results(pending.popleft().result(), fout, stats, tagged)
+    finally:
+        if isinstance(input_file, str): fin.close()
+        if isinstance(output_file, str): fout.close()
+    for stat in stats.values():
+        stat['throughput'] = stat['puzzles'] / stat['seconds'] if stat['seconds'] else 0.0
+    return stats
+
+def write_results(chunk_result, fout, stats, tagged=False):
+    '''Write the results of a solved chunk and add its worker's stats.'''
+    pid, seconds, results = chunk_result
+    stat = stats.setdefault(pid, {'puzzles': 0, 'seconds': 0.0})
+    stat['seconds'] += seconds
+    for line_no, flg_solved, data in results:
+        if flg_solved is None:
+            if not tagged: fout.write('\n')
+            continue
+        stat['puzzles'] += 1
+        fout.write((str(line_no) + '\t' + str(int(flg_solved)) + '\t' + data if tagged else data) + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a puzzle file with a process pool.')
+    parser.add_argument('input', help='the puzzle file, one puzzle per line in the comma format')
+    parser.add_argument('output', help='the result file')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='the number of processes (default: cpu count)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=256, help='the number of puzzles in one submission')
+    parser.add_argument('-t', '--tagged', action='store_true', help='tag every result with its line number and solved flag')
+    parser.add_argument('--timeout', type=float, default=None, help='the max seconds of every puzzle (default: no limit)')
+    parser.add_argument('--max-nodes', type=int, default=None, help='the max search nodes of every puzzle (default: no limit)')
+    args = parser.parse_args(argv)
+    start = time.time()
+    stats = batch_solve(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size, tagged=args.tagged, \
+                        timeout=args.timeout, max_nodes=args.max_nodes)
+    total = sum(stat['puzzles'] for stat in stats.values())
+    for pid, stat in sorted(stats.items()):
+        sys.stderr.write('worker ' + str(pid) + ': ' + str(stat['puzzles']) + ' puzzles, ' + \
+            '%.1f puzzles/s' % stat['throughput'] + '\n')
+    sys.stderr.write('total: ' + str(total) + ' puzzles in ' + '%.2f s' % (time.time() - start) + '\n')
+
+if __name__ == '__main__':
+    main()
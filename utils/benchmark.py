@@ -0,0 +1,200 @@
+# coding:utf-8
+# python3.6
+
+'''The benchmark suite of the parsing, the solver techniques and the display over generated corpora.
+
+Usage:
+    python -m utils.benchmark --save baseline.json
+    python -m utils.benchmark --compare baseline.json --threshold 0.2
+'''
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+from .dlx import *
+
+# Externel environment
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+
+# corpus name -> (meta_size, irregular, the ratio of the clues kept, the default number of puzzles)
+CORPORA = {
+    '4x4': (2, False, 0.5, 200),
+    '9x9': (3, False, 0.4, 200),
+    '16x16': (4, False, 0.55, 20),
+    '25x25': (5, False, 0.65, 4),
+    '4x4-irregular': (2, True, 0.5, 200),
+    '9x9-irregular': (3, True, 0.4, 100),
+}
+
+def irregular_boxes(meta_size):
+    '''A jigsaw layout: the regular boxes with the bottom-right cell of every box swapped with its right neighbour's bottom-left cell.'''
+    size = meta_size**2
+    boxes = [list(box) for box in get_geometry(meta_size).boxes]
+    for band in range(meta_size):
+        row = band * meta_size + meta_size - 1
+        for k in range(meta_size - 1):
+            left, right = boxes[band * meta_size + k], boxes[band * meta_size + k + 1]
+            idx_left, idx_right = row * size + (k + 1) * meta_size - 1, row * size + (k + 1) * meta_size
+            left[left.index(idx_left)] = idx_right
+            right[right.index(idx_right)] = idx_left
+    return boxes
+
+def full_grid(meta_size, box_idx_list, rnd):
+    '''A random solved grid: the pattern grid shuffled for the regular layout, a dancing links solution for the irregular one.'''
+    size = meta_size**2
+    if box_idx_list is None:
+        bands = rnd.sample(range(meta_size), meta_size)
+        rows = [band * meta_size + i for band in bands for i in rnd.sample(range(meta_size), meta_size)]
+        stacks = rnd.sample(range(meta_size), meta_size)
+        cols = [stack * meta_size + i for stack in stacks for i in rnd.sample(range(meta_size), meta_size)]
+        grid = [(meta_size * (r % meta_size) + int(r / meta_size) + c) % size for r in rows for c in cols]
+    else:
+        solution = dlx_solve(Structure(['.'] * size**2, meta_size=meta_size, box_idx_list=box_idx_list))[0]
+        grid = [int(i) - 1 for i in solution]
+    digits = rnd.sample(range(1, size + 1), size)
+    return [str(digits[i]) for i in grid]
+
+def generate_corpus(name, count=None, seed=0):
+    '''Generate the puzzle lines of a corpus, the clues are removed at random so the puzzles are not always unique.
+
+    Output:
+    - (lines, box_idx_list): lines in the comma format, box_idx_list is None for the regular layouts
+    '''
+    meta_size, irregular, ratio, default_count = CORPORA[name]
+    count = count if count else default_count
+    rnd = random.Random(str(seed) + name)
+    box_idx_list = irregular_boxes(meta_size) if irregular else None
+    lines = []
+    for _ in range(count):
+        grid = full_grid(meta_size, box_idx_list, rnd)
+        for idx in rnd.sample(range(len(grid)), len(grid) - int(len(grid) * ratio)):
+            grid[idx] = '.'
+        lines.append(','.join(grid))
+    return lines, box_idx_list
+
+def run_scan_all(method):
+    def run(problem_structure):
+        BasicSolver(problem_structure).scan_all(method, save_ready=True)
+    return run
+
+BENCHMARKS = {
+    'parse': None, # special: works on the lines
+    'step': lambda problem_structure: BasicSolver(problem_structure).step(),
+    'solve': lambda problem_structure: BasicSolver(problem_structure).solve(),
+    'check_scanned_drop': run_scan_all('scanned'),
+    'check_area_drop': run_scan_all('area'),
+    'check_group_drop': run_scan_all('group'),
+    'check_square_drop': run_scan_all('square'),
+    'check_subset_drop': run_scan_all('subset'),
+    'check_fish_drop': run_scan_all('fish'),
+    'search': lambda problem_structure: solve_puzzle(problem_structure),
+    'display': lambda problem_structure: problem_structure.display(),
+}
+
+def percentile(sorted_values, q):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def measure(func, items):
+    '''Run func over the items twice: timed, then under tracemalloc for the peak memory.
+
+    Output:
+    - {'count', 'seconds', 'throughput', 'p50', 'p99', 'peak_kb'}: the latencies are in milliseconds
+    '''
+    latencies = []
+    total_start = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        func(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    seconds = time.perf_counter() - total_start
+    tracemalloc.start()
+    for item in items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {'count': len(items), 'seconds': seconds, 'throughput': len(items) / seconds if seconds else 0.0, \
+            'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99), 'peak_kb': peak / 1024}
+
+def run_benchmarks(corpora=None, benchmarks=None, count=None, seed=0, log=None):
+    '''Run the benchmarks over the corpora.
+
+    Input:
+    - corpora(list(str)): the names in CORPORA, if None(default), then all
+    - benchmarks(list(str)): the names in BENCHMARKS, if None(default), then all
+    - count(int): the number of puzzles of every corpus, if None(default), then the corpus default
+    - seed(int)
+    - log(file): if not None, then write the progress lines into it
+
+    Output:
+    - report(dict): {'meta': {...}, 'results': {corpus: {benchmark: measure()}}}
+    '''
+    corpora = corpora if corpora else list(CORPORA)
+    benchmarks = benchmarks if benchmarks else list(BENCHMARKS)
+    report = {'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'seed': seed, 'count': count}, \
+              'results': {}}
+    for name in corpora:
+        lines, box_idx_list = generate_corpus(name, count=count, seed=seed)
+        meta_size = CORPORA[name][0]
+        build = lambda line: Structure(line, meta_size=meta_size, box_idx_list=box_idx_list)
+        structures = [build(line) for line in lines]
+        report['results'][name] = {}
+        for benchmark in benchmarks:
+            if benchmark == 'parse':
+                result = measure(build, lines)
+            else:
+                result = measure(BENCHMARKS[benchmark], structures)
+            report['results'][name][benchmark] = result
+            if log:
+                log.write('%-14s %-19s %10.1f/s  p50 %9.3f ms  p99 %9.3f ms  peak %9.1f KB\n' % \
+                    (name, benchmark, result['throughput'], result['p50'], result['p99'], result['peak_kb']))
+    return report
+
+def compare_reports(baseline, report, threshold=0.2):
+    '''Compare the p50 latencies of the report with the baseline.
+
+    Output:
+    - slowdowns(list): [(corpus, benchmark, baseline p50, p50, ratio), ...] with ratio > 1 + threshold
+    '''
+    slowdowns = []
+    for name, results in report['results'].items():
+        for benchmark, result in results.items():
+            base = baseline['results'].get(name, {}).get(benchmark)
+            if not base or not base['p50']: continue
+            ratio = result['p50'] / base['p50']
+            if ratio > 1 + threshold:
+                slowdowns.append((name, benchmark, base['p50'], result['p50'], ratio))
+    return slowdowns
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the parsing, the solver techniques and the display.')
+    parser.add_argument('--corpora', nargs='*', choices=list(CORPORA), help='the corpora to run (default: all)')
+    parser.add_argument('--benchmarks', nargs='*', choices=list(BENCHMARKS), help='the benchmarks to run (default: all)')
+    parser.add_argument('--count', type=int, default=None, help='the number of puzzles of every corpus')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='save the report as a JSON baseline')
+    parser.add_argument('--compare', help='compare with a JSON baseline, exit with 1 if something slows down')
+    parser.add_argument('--threshold', type=float, default=0.2, help='the allowed slowdown of p50 (default: 0.2)')
+    args = parser.parse_args(argv)
+    report = run_benchmarks(corpora=args.corpora, benchmarks=args.benchmarks, count=args.count, seed=args.seed, log=sys.stdout)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            slowdowns = compare_reports(json.load(f), report, threshold=args.threshold)
+        for name, benchmark, base_p50, p50, ratio in slowdowns:
+            print('SLOWDOWN %-14s %-19s p50 %.3f ms -> %.3f ms (x%.2f)' % (name, benchmark, base_p50, p50, ratio))
+        if slowdowns:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+
+# Externel environment
+import shelve
+from itertools import permutations
+from collections import OrderedDict
+
+arrangements_cache = {}
+
+def get_arrangements(meta_size):
+    '''Get the cell orders of all the arrangements of the regular grid: transposition x band swaps x stack swaps.
+    The band and stack swaps are only used up to meta_size 4, the bigger grids only use the transposition.
+
+    Output:
+    - arrangements(list(tuple)): every arrangement is the source idx of every cell
+    '''
+    arrangements = arrangements_cache.get(meta_size)
+    if arrangements is None:
+        size = meta_size**2
+        orders = [tuple(band * meta_size + i for band in perm for i in range(meta_size)) \
+            for perm in (permutations(range(meta_size)) if meta_size <= 4 else [tuple(range(meta_size))])]
+        arrangements = []
+        for transposed in (False, True):
+            for row_order in orders:
+                for col_order in orders:
+                    arrangements.append(tuple(col_order[c] * size + row_order[r] if transposed else row_order[r] * size + col_order[c] \
+                        for r in range(size) for c in range(size)))
+        arrangements_cache[meta_size] = arrangements
+    return arrangements
+
+def canonicalize(problem_structure):
+    '''Map the puzzle to the minimal representative of its equivalent puzzles under
+    digit relabeling, transposition, band swaps and stack swaps.
+    For every arrangement, the digits are relabeled in the order of their first appearance, which is the minimal relabeling.
+
+    Input:
+    - problem_structure(Structure): a regular puzzle
+
+    Output:
+    - (canonical_data, transform):
+        canonical_data(list(str)): the data of the representative
+        transform(tuple): (arrangement, {original element: canonical element}), used by restore()
+    '''
+    assert problem_structure.flg_regular, 'Only the regular puzzles can be canonicalized.'
+    data = problem_structure.data
+    elements = problem_structure.elements
+    best_key, best_arrangement = None, None
+    for arrangement in get_arrangements(problem_structure.meta_size):
+        labels = {'.': 0}
+        key = []
+        for idx in arrangement:
+            label = labels.get(data[idx])
+            if label is None:
+                label = labels[data[idx]] = len(labels)
+            key.append(label)
+            if best_key is not None and key[-1] != best_key[len(key) - 1]:
+                if key[-1] > best_key[len(key) - 1]: break
+                best_key = None # smaller already, no need to compare any more
+        else:
+            best_key, best_arrangement = key, arrangement
+    labels = {}
+    for idx in best_arrangement:
+        if data[idx] != '.' and data[idx] not in labels:
+            labels[data[idx]] = elements[len(labels)]
+    for ele in elements:
+        if ele not in labels:
+            labels[ele] = elements[len(labels)]
+    return ['.' if data[idx] == '.' else labels[data[idx]] for idx in best_arrangement], (best_arrangement, labels)
+
+def restore(canonical_data, transform):
+    '''Apply the inverse transform to the data of the representative, e.g. its solution.'''
+    arrangement, labels = transform
+    inverse = {canonical: ele for ele, canonical in labels.items()}
+    inverse['.'] = '.'
+    data = [None] * len(canonical_data)
+    for k, idx in enumerate(arrangement):
+        data[idx] = inverse[canonical_data[k]]
+    return data
+
+def predict_solution(problem_structure):
+    '''Solve the puzzle with the Predictor.
+
+    Output:
+    - solution(list(str)): None if it can not be solved
+    '''
+    result = solve_puzzle(problem_structure)
+    return result.solution if result.flg_solved else None
+
+class SolutionCache():
+    '''The size-bounded LRU cache of the solutions, keyed by the canonical form of the puzzles,
+    so the equivalent puzzles share one entry. An optional shelve file keeps the solutions between runs.
+
+    Elements:
+    - max_size(int): the max number of solutions in memory
+    - solutions(OrderedDict): {canonical key: canonical solution}, the least recently used first
+    - shelf: the opened shelve of the persistent tier, None if there is no path
+    - hits / disk_hits / misses / evictions(int): the counters
+
+    Functions:
+    - get: Get the cached solution of a puzzle
+    - put: Save the solution of a puzzle
+    - solve: Get the solution from the cache, or solve it and save it
+    '''
+    def __init__(self, max_size=100000, path=None):
+        self.max_size = max_size
+        self.solutions = OrderedDict()
+        self.shelf = shelve.open(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        solution = self.solutions.get(key)
+        if solution is not None:
+            self.solutions.move_to_end(key)
+            self.hits += 1
+            return solution
+        if self.shelf is not None and key in self.shelf:
+            solution = self.shelf[key]
+            self.remember(key, solution)
+            self.hits += 1
+            self.disk_hits += 1
+            return solution
+        self.misses += 1
+        return None
+
+    def remember(self, key, solution):
+        self.solutions[key] = solution
+        self.solutions.move_to_end(key)
+        while len(self.solutions) > self.max_size:
+            self.solutions.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, problem_structure):
+        '''Get the cached solution of the puzzle, None if it is not cached.'''
+        canonical_data, transform = canonicalize(problem_structure)
+        solution = self.lookup(','.join(canonical_data))
+        return restore(solution, transform) if solution is not None else None
+
+    def put(self, problem_structure, solution):
+        '''Save the solution of the puzzle.'''
+        canonical_data, transform = canonicalize(problem_structure)
+        self.save(','.join(canonical_data), solution, transform)
+
+    def save(self, key, solution, transform):
+        arrangement, labels = transform
+        canonical_solution = [labels[solution[idx]] for idx in arrangement]
+        self.remember(key, canonical_solution)
+        if self.shelf is not None:
+            self.shelf[key] = canonical_solution
+
+    def solve(self, problem_structure, solve_func=predict_solution):
+        '''Get the solution from the cache, or solve it with solve_func and save it.
+        The input structure is not changed.
+
+        Input:
+        - problem_structure(Structure)
+        - solve_func: structure -> solution data or None, predict_solution(default)
+
+        Output:
+        - solution(list(str)): None if it can not be solved
+        '''
+        canonical_data, transform = canonicalize(problem_structure)
+        key = ','.join(canonical_data)
+        solution = self.lookup(key)
+        if solution is not None:
+            return restore(solution, transform)
+        solution = solve_func(problem_structure)
+        if solution is not None:
+            self.save(key, solution, transform)
+        return solution
+
+    def stats(self):
+        return {'size': len(self.solutions), 'hits': self.hits, 'disk_hits': self.disk_hits, \
+                'misses': self.misses, 'evictions': self.evictions}
+
+    def close(self):
+        if self.shelf is not None:
+            self.shelf.close()
+            self.shelf = None
@@ -0,0 +1,231 @@
+# coding:utf-8
+# python3.6
+
+from .structure import *
+
+class DancingLinks():
+    '''The exact cover matrix of a sudoku layout, searched by Algorithm X with dancing links.
+
+    Every (idx, element) pair is a row of the matrix, covering the constraints:
+    the idx is filled, and the element is in every unit of idx holding every element, its row, its column, its box and the extras.
+    The sums of the cages are not exact covers, so the layouts with cages are not supported.
+    The links are kept in flat lists instead of node objects. The matrix is built once per geometry,
+    use get_dancing_links() to get the cached one. A search covers the given clues, searches and
+    uncovers everything again in the reverse order, so the matrix is back to its initial state afterwards.
+
+    Elements:
+    - geometry: the Geometry of the layout
+    - size: the number of elements
+    - left / right / up / down: the links of every node, node 0 is the root and nodes 1..columns_num are the column headers
+    - column: the column header of every node
+    - row: the matrix row (idx * size + element_id) of every node
+    - row_start: the first node of every matrix row
+    - row_size: the number of nodes of every matrix row
+    - column_size: the number of nodes left in every column
+    - active: whether every column is not covered
+    - nodes: the number of rows tried by the last search
+
+    Functions:
+    - search: Search the solutions of a puzzle data
+    '''
+    def __init__(self, geometry):
+        assert not geometry.cages, 'The cages are not supported by the dancing links.'
+        self.geometry = geometry
+        size = geometry.size
+        cells_num = size**2
+        columns_num = cells_num + geometry.units_num_full * size
+        self.size = size
+        self.left = [i - 1 for i in range(columns_num + 1)]
+        self.right = [i + 1 for i in range(columns_num + 1)]
+        self.left[0] = columns_num
+        self.right[columns_num] = 0
+        self.up = list(range(columns_num + 1))
+        self.down = list(range(columns_num + 1))
+        self.column = list(range(columns_num + 1))
+        self.row = [-1] * (columns_num + 1)
+        self.column_size = [0] * (columns_num + 1)
+        self.active = [True] * (columns_num + 1)
+        self.row_start = []
+        self.row_size = []
+        self.nodes = 0
+
+        for idx in range(cells_num):
+            for element_id in range(size):
+                columns = (1 + idx,) + tuple(1 + cells_num + unit_id * size + element_id \
+                                             for unit_id in geometry.cell_units[idx] if unit_id < geometry.units_num_full)
+                start = len(self.column)
+                self.row_start.append(start)
+                self.row_size.append(len(columns))
+                for k, c in enumerate(columns):
+                    node = start + k
+                    self.left.append(start + (k - 1) % len(columns))
+                    self.right.append(start + (k + 1) % len(columns))
+                    self.up.append(self.up[c])
+                    self.down.append(c)
+                    self.down[self.up[c]] = node
+                    self.up[c] = node
+                    self.column.append(c)
+                    self.row.append(idx * size + element_id)
+                    self.column_size[c] += 1
+
+    def cover(self, c):
+        left, right, up, down, column, column_size = self.left, self.right, self.up, self.down, self.column, self.column_size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        self.active[c] = False
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                column_size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        left, right, up, down, column, column_size = self.left, self.right, self.up, self.down, self.column, self.column_size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                column_size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+        self.active[c] = True
+
+    def select(self, node):
+        '''Cover the other columns of the row of the node, its own column is covered already.'''
+        j = self.right[node]
+        while j != node:
+            self.cover(self.column[j])
+            j = self.right[j]
+
+    def unselect(self, node):
+        j = self.left[node]
+        while j != node:
+            self.uncover(self.column[j])
+            j = self.left[j]
+
+    def search(self, element_ids, max_solutions=1, record=True):
+        '''Search the solutions of the puzzle.
+
+        Input:
+        - element_ids(list(int)): the element id of every idx, -1 for blank
+        - max_solutions(int): stop after this number of solutions are found, if None, then find all.
+        - record(Boolean): if False, then only count the solutions.
+
+        Output:
+        - (solutions_num, solutions): every solution is a list of element ids
+        '''
+        right, down, column, column_size, row = self.right, self.down, self.column, self.column_size, self.row
+        size = self.size
+        self.nodes = 0
+
+        # Toggle the given clues in
+        givens = []
+        flg_conflict = False
+        for idx, element_id in enumerate(element_ids):
+            if element_id < 0: continue
+            start = self.row_start[idx * size + element_id]
+            if not all(self.active[column[start + k]] for k in range(self.row_size[idx * size + element_id])):
+                flg_conflict = True
+                break
+            self.cover(column[start])
+            self.select(start)
+            givens.append(start)
+
+        solutions_num = 0
+        solutions = []
+        stack = []
+        try:
+            while not flg_conflict:
+                # Go deeper
+                if right[0] == 0:
+                    solutions_num += 1
+                    if record:
+                        solution = list(element_ids)
+                        for node in stack:
+                            solution[int(row[node] / size)] = row[node] % size
+                        solutions.append(solution)
+                    if max_solutions and solutions_num >= max_solutions: break
+                else:
+                    c, j = right[0], right[right[0]]
+                    while j != 0 and column_size[c] > 1:
+                        if column_size[j] < column_size[c]: c = j
+                        j = right[j]
+                    if column_size[c] > 0:
+                        self.cover(c)
+                        node = down[c]
+                        self.select(node)
+                        stack.append(node)
+                        self.nodes += 1
+                        continue
+                # Backtrack to the next row of the latest column
+                while stack:
+                    node = stack.pop()
+                    self.unselect(node)
+                    c = column[node]
+                    node = down[node]
+                    if node != c:
+                        self.select(node)
+                        stack.append(node)
+                        self.nodes += 1
+                        break
+                    self.uncover(c)
+                else:
+                    break
+        finally:
+            # Toggle everything out in the reverse order
+            while stack:
+                node = stack.pop()
+                self.unselect(node)
+                self.uncover(column[node])
+            while givens:
+                start = givens.pop()
+                self.unselect(start)
+                self.uncover(column[start])
+        return solutions_num, solutions
+
+dancing_links_cache = OrderedDict()
+
+def get_dancing_links(geometry):
+    '''Get the cached exact cover matrix of the geometry, build it at the first time, LRU bounded as get_geometry.'''
+    dancing_links = cache_get(dancing_links_cache, geometry)
+    if dancing_links is None:
+        dancing_links = cache_put(dancing_links_cache, geometry, DancingLinks(geometry))
+    return dancing_links
+
+def dlx_solve(problem_structure, max_solutions=1):
+    '''Solve the puzzle with dancing links.
+
+    Input:
+    - problem_structure(Structure)
+    - max_solutions(int): the max number of solutions to enumerate, if None, then all of them.
+
+    Output:
+    - solutions(list(list(str))): the data of every solution
+    '''
+    elements = problem_structure.elements
+    dancing_links = get_dancing_links(problem_structure.geometry)
+    _, solutions = dancing_links.search([i - 1 for i in problem_structure.cells], max_solutions=max_solutions)
+    return [[elements[i] for i in solution] for solution in solutions]
+
+def dlx_count(problem_structure, limit=2):
+    '''Count the solutions of the puzzle with dancing links, stop at the limit.
+    dlx_count(s) == 1 proves that the puzzle has a unique solution.
+
+    Input:
+    - problem_structure(Structure)
+    - limit(int): stop counting at this number, if None, then count all of them.
+
+    Output:
+    - solutions_num(int)
+    '''
+    dancing_links = get_dancing_links(problem_structure.geometry)
+    solutions_num, _ = dancing_links.search([i - 1 for i in problem_structure.cells], max_solutions=limit, record=False)
+    return solutions_num
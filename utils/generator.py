@@ -0,0 +1,282 @@
+# coding:utf-8
+# python3.6
+
+'''The generator of the puzzles with unique solutions, optionally graded at a level by the techniques of the basic solver.
+The puzzle i of a batch is seeded by (seed, i), so a batch is reproducible whatever the number of processes.
+
+Usage:
+    python -m utils.generator puzzles.txt -n 1000 -l medium -w 4
+'''
+
+# Our libraries:
+from .structure import *
+from .solver import *
+from .dlx import *
+from .analytics import *
+from .stream import write_puzzles
+
+# Externel environment
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+def level_methods(level):
+    '''The methods of BasicSolver up to the level, e.g. ['scanned', 'area'] for 'medium'.'''
+    return [method for method in TECHNIQUE_LEVELS \
+        if method != 'guess' and LEVELS.index(TECHNIQUE_LEVELS[method]) <= LEVELS.index(level)]
+
+def graded_level(data, meta_size, box_idx_list, methods=None):
+    '''The level of the puzzle graded as analytics.grade_puzzle does, None if it needs search.
+    With methods, the propagation of the predictor only tries these methods, which is cheaper but may fail where all of them succeed.
+    '''
+    solver = BasicSolver(Structure(data, meta_size=meta_size, box_idx_list=box_idx_list))
+    if methods:
+        # The levels list every technique, e.g. 'cage', which the solver only has for the layouts needing it
+        methods = [method for method in methods if method in solver.methods]
+    while not solver.flg_conflict and not solver.done_check():
+        if solver.step(methods=['scanned']): continue
+        if methods == ['scanned'] or solver.flg_conflict or not solver.step(methods=methods): break
+    if solver.flg_conflict or not solver.done_check(): return None
+    return grade_steps(solver.steps).level
+
+def propagate(candidates, geometry, queue, full_mask, flg_hidden=True):
+    '''Propagate the candidate bitmasks in place:
+        1. drop the bit of every single in the queue from its peers, the new singles are queued as well;
+        2. if flg_hidden, a bit left in one cell of a unit only makes the cell a single, then go back to 1.
+    Return False if a blank has no candidate left or an element has no place left in a unit.
+    '''
+    peers = geometry.peers
+    while queue:
+        while queue:
+            idx = queue.pop()
+            bit = candidates[idx]
+            for peer in peers[idx]:
+                mask = candidates[peer]
+                if mask & bit:
+                    mask ^= bit
+                    if not mask: return False
+                    candidates[peer] = mask
+                    if not mask & (mask - 1): queue.append(peer)
+        if not flg_hidden: break
+        for unit in geometry.rows + geometry.cols + geometry.boxes:
+            once, twice = 0, 0
+            for idx in unit:
+                twice |= once & candidates[idx]
+                once |= candidates[idx]
+            if once != full_mask: return False
+            hidden = once & ~twice
+            if not hidden: continue
+            for idx in unit:
+                mask = candidates[idx] & hidden
+                if mask and mask & (mask - 1): return False
+                if mask and candidates[idx] != mask:
+                    candidates[idx] = mask
+                    queue.append(idx)
+    return True
+
+def count_solutions(candidates, geometry, limit=2):
+    '''Count the solutions by a depth first search on the candidate bitmasks, stop at the limit.
+    count_solutions(...) == 1 proves that the puzzle has a unique solution.
+    The hidden singles only pay for their scan on the grids larger than 9x9.
+
+    Input:
+    - candidates(list(int)): the candidate bitmask of every cell, a clue has its bit only
+    - geometry(Geometry)
+    - limit(int)
+
+    Output:
+    - count(int): min(the number of solutions, limit)
+    '''
+    full_mask = (1 << geometry.size) - 1
+    flg_hidden = geometry.size > 9
+    candidates = list(candidates)
+    queue = [idx for idx, mask in enumerate(candidates) if not mask & (mask - 1)]
+    if not propagate(candidates, geometry, queue, full_mask, flg_hidden):
+        return 0
+    count = 0
+    stack = [candidates]
+    while stack:
+        candidates = stack.pop()
+        point, point_num = None, None
+        for idx, mask in enumerate(candidates):
+            if mask & (mask - 1):
+                num = popcount(mask)
+                if point is None or num < point_num:
+                    point, point_num = idx, num
+                    if num == 2: break
+        if point is None:
+            count += 1
+            if count >= limit: return count
+            continue
+        mask = candidates[point]
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            branch = list(candidates)
+            branch[point] = bit
+            if propagate(branch, geometry, [point], full_mask, flg_hidden):
+                stack.append(branch)
+    return count
+
+def keeps_unique(geometry, puzzle, solution, idxes, element_bits):
+    '''Check whether the puzzle, unique before the clues of the idxes were removed, is still unique.
+    It is iff no solution differs from the grid at the idxes, so a search with the value of the grid
+    dropped from the candidates of an idx only has to fail, which is cheaper than counting up to 2.
+    '''
+    full_mask = (1 << geometry.size) - 1
+    for k, idx in enumerate(idxes):
+        candidates = [element_bits[ele] if ele != '.' else full_mask for ele in puzzle]
+        for i in idxes[:k]:
+            candidates[i] = element_bits[solution[i]]
+        candidates[idx] = full_mask ^ element_bits[solution[idx]]
+        if count_solutions(candidates, geometry, limit=1): return False
+    return True
+
+def toggle_clues(geometry, unit_masks, puzzle, solution, idxes, element_bits):
+    '''Remove the clues of the idxes, or put them back if they are blanks, and update the unit masks of the clues.'''
+    for idx in idxes:
+        puzzle[idx] = solution[idx] if puzzle[idx] == '.' else '.'
+        bit = element_bits[solution[idx]]
+        for masks, units in zip(unit_masks, (geometry.cell_rows, geometry.cell_cols, geometry.cell_boxes)):
+            masks[units[idx]] ^= bit
+
+def is_forced(geometry, unit_masks, puzzle, idx, bit, full_mask):
+    '''Check whether the blank idx is forced to the bit by the clues only, as a naked single or a hidden single of its units.
+
+    Input:
+    - unit_masks(tuple): (row masks, column masks, box masks) of the clues
+    '''
+    row_masks, col_masks, box_masks = unit_masks
+    cell_rows, cell_cols, cell_boxes = geometry.cell_rows, geometry.cell_cols, geometry.cell_boxes
+    if row_masks[cell_rows[idx]] | col_masks[cell_cols[idx]] | box_masks[cell_boxes[idx]] | bit == full_mask:
+        return True
+    for unit in (geometry.rows[cell_rows[idx]], geometry.cols[cell_cols[idx]], geometry.boxes[cell_boxes[idx]]):
+        if all(i == idx or puzzle[i] != '.' or (row_masks[cell_rows[i]] | col_masks[cell_cols[i]] | box_masks[cell_boxes[i]]) & bit \
+                for i in unit):
+            return True
+    return False
+
+def generate_grid(meta_size=3, box_idx_list=None, rnd=None):
+    '''Generate a random solved grid.
+    The independent diagonal boxes (or the first row of an irregular layout) are filled at random,
+    and the rest is completed by dancing links. The elements are relabeled at random afterwards.
+
+    Output:
+    - grid(list(str))
+    '''
+    rnd = rnd if rnd else random.Random()
+    size = meta_size**2
+    geometry = get_geometry(meta_size, box_idx_list)
+    elements = [str(i + 1) for i in range(size)]
+    while True:
+        data = ['.'] * size**2
+        seeds = [geometry.boxes[k * (meta_size + 1)] for k in range(meta_size)] if geometry.flg_regular else [geometry.rows[0]]
+        for unit in seeds:
+            for idx, ele in zip(unit, rnd.sample(elements, size)):
+                data[idx] = ele
+        solutions = dlx_solve(Structure(data, meta_size=meta_size, box_idx_list=box_idx_list))
+        if solutions: break
+    labels = dict(zip(elements, rnd.sample(elements, size)))
+    return [labels[ele] for ele in solutions[0]]
+
+def generate_puzzle(meta_size=3, level=None, box_idx_list=None, rnd=None, symmetric=False, max_tries=50):
+    '''Generate a puzzle with a unique solution.
+    The clues are removed in a random order. A removal is kept if the puzzle stays unique:
+    - the removed blanks are naked or hidden singles of the clues left, which keeps every property, or
+    - level is easy / medium / hard: the basic solver still solves it with the methods up to the level, which also proves uniqueness;
+    - else: keeps_unique finds no solution other than the grid.
+    For a level, the puzzle is also required to be graded at the level, else a new grid is tried.
+
+    Input:
+    - meta_size(int)
+    - level(str): easy / medium / hard / expert, if None(default), then any level
+    - box_idx_list(list(list)): the irregular layout, if None(default), then the regular one
+    - rnd(random.Random): the random generator, seeded for a deterministic output
+    - symmetric(Boolean): if True, then the clues are removed in pairs symmetric about the center
+    - max_tries(int): the max number of grids tried for the level
+
+    Output:
+    - (puzzle, solution): lists of str, or None if no puzzle of the level is found in max_tries grids
+    '''
+    assert level is None or level in LEVELS, 'Level error: ' + str(level) + ' is not in ' + str(LEVELS) + '.'
+    rnd = rnd if rnd else random.Random()
+    geometry = get_geometry(meta_size, box_idx_list)
+    flg_logic = level in ('easy', 'medium', 'hard')
+    methods = level_methods(level) if flg_logic else None
+    elements = sorted([str(i + 1) for i in range(meta_size**2)], key=lambda ele: (len(ele), ele))
+    element_bits = {ele: 1 << i for i, ele in enumerate(elements)}
+    full_mask = (1 << len(elements)) - 1
+    cells_num = meta_size**4
+
+    for _ in range(max_tries):
+        solution = generate_grid(meta_size, box_idx_list, rnd)
+        puzzle = list(solution)
+        order = rnd.sample(range(cells_num), cells_num)
+        visited = set()
+        unit_masks = ([0] * meta_size**2, [0] * meta_size**2, [0] * meta_size**2)
+        for idx, ele in enumerate(solution):
+            for masks, units in zip(unit_masks, (geometry.cell_rows, geometry.cell_cols, geometry.cell_boxes)):
+                masks[units[idx]] |= element_bits[ele]
+        for idx in order:
+            if idx in visited: continue
+            idxes = [idx, cells_num - 1 - idx] if symmetric and idx != cells_num - 1 - idx else [idx]
+            toggle_clues(geometry, unit_masks, puzzle, solution, idxes, element_bits)
+            flg_kept = all(is_forced(geometry, unit_masks, puzzle, i, element_bits[solution[i]], full_mask) for i in idxes)
+            if not flg_kept:
+                if flg_logic:
+                    graded = graded_level(puzzle, meta_size, box_idx_list, methods)
+                    flg_kept = graded is not None and LEVELS.index(graded) <= LEVELS.index(level)
+                else:
+                    flg_kept = keeps_unique(geometry, puzzle, solution, idxes, element_bits)
+            visited.update(idxes)
+            if not flg_kept:
+                toggle_clues(geometry, unit_masks, puzzle, solution, idxes, element_bits)
+        if level == 'expert' and graded_level(puzzle, meta_size, box_idx_list) is not None:
+            continue
+        if flg_logic and graded_level(puzzle, meta_size, box_idx_list) != level:
+            continue
+        return puzzle, solution
+    return None
+
+def generate_one(args):
+    '''Generate the puzzle i of a batch with its own seed, so the output does not depend on the number of processes.'''
+    i, seed, meta_size, level, box_idx_list, symmetric = args
+    return generate_puzzle(meta_size=meta_size, level=level, box_idx_list=box_idx_list, \
+        rnd=random.Random(str(seed) + '-' + str(i)), symmetric=symmetric)
+
+def generate_puzzles(count, meta_size=3, level=None, box_idx_list=None, seed=0, symmetric=False, workers=1, chunk_size=16):
+    '''Generate the puzzles, deterministic for the seed whatever the number of workers.
+
+    Output:
+    - generator of (puzzle, solution), None for a puzzle whose level is not reached
+    '''
+    tasks = ((i, seed, meta_size, level, box_idx_list, symmetric) for i in range(count))
+    if workers == 1:
+        for task in tasks:
+            yield generate_one(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for puzzle in executor.map(generate_one, tasks, chunksize=chunk_size):
+            yield puzzle
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate puzzles with unique solutions.')
+    parser.add_argument('output', help='the puzzle file')
+    parser.add_argument('-n', '--count', type=int, default=100)
+    parser.add_argument('-m', '--meta-size', type=int, default=3)
+    parser.add_argument('-l', '--level', choices=LEVELS, default=None)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-w', '--workers', type=int, default=1)
+    parser.add_argument('-f', '--format', choices=['comma', 'dotted', 'binary'], default='comma')
+    parser.add_argument('--symmetric', action='store_true')
+    args = parser.parse_args(argv)
+    start = time.time()
+    puzzles = generate_puzzles(args.count, meta_size=args.meta_size, level=args.level, seed=args.seed, \
+        symmetric=args.symmetric, workers=args.workers)
+    num = write_puzzles(args.output, (puzzle for puzzle, _ in filter(None, puzzles)), fmt=args.format, meta_size=args.meta_size)
+    sys.stderr.write(str(num) + ' puzzles in ' + '%.2f s' % (time.time() - start) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# coding:utf-8
+# python3.6
+
+'''Hint sessions for the interactive app: one long-lived solver per game, edited by the moves of the player.
+
+Usage:
+    python -m utils.hint puzzles.txt
+
+A move only changes the masks of its peers, so the session never rebuilds the solver:
+place() is one BasicSolver.place(), erase() undoes the trail back to the move and places the later moves again.
+The singles found by the scanned method are kept between the moves, and only the dirty cells and units are scanned again,
+so the hint after a move costs about the peers of the move. The other techniques only run when there is no single left,
+and the hint is cached until the next move.
+'''
+
+# Our libraries:
+from .structure import *
+from .solver import *
+from .stream import read_puzzles
+
+# Externel environment
+import sys
+import time
+import argparse
+
+class HintSession():
+    '''The hint session of a puzzle, the moves of the player are placed onto the solver of the puzzle.
+
+    Elements:
+    - solver(BasicSolver): the solver of the puzzle with the moves placed, never stepped by the session
+    - moves: the moves of the player in order [(idx, element), ...], the i-th move is the i-th placement of the trail
+    - singles: {idx: element} of the singles found by the scanned method and still valid
+    - hint_cache: (solver.changes, hint) of the last hint
+
+    Functions:
+    - place: Place the element of the player into a blank
+    - erase: Erase the move of the player in idx
+    - hint: The next deducible move and the technique of it
+    '''
+    __slots__ = ('solver', 'moves', 'singles', 'hint_cache')
+
+    def __init__(self, problem_structure):
+        self.solver = BasicSolver(problem_structure)
+        self.moves = []
+        self.singles = {}
+        self.hint_cache = None
+
+    @property
+    def data(self):
+        return self.solver.data
+
+    @property
+    def flg_conflict(self):
+        '''True if the moves contradict the puzzle, e.g. an element placed twice in a unit.'''
+        return self.solver.flg_conflict
+
+    @property
+    def flg_solved(self):
+        return self.solver.blank_count == 0 and not self.solver.flg_conflict
+
+    def place(self, idx, element):
+        '''Place the element into the blank idx, the move in idx is replaced if there is one.
+        A move against the candidates is placed as well, and flg_conflict is set.
+        '''
+        solver = self.solver
+        assert element in solver.element_bits, 'Edit error: The element ' + str(element) + ' is not in the element set.'
+        assert not solver.structure.cells[idx], 'Edit error: The idx ' + str(idx) + ' is given by the puzzle.'
+        if solver.data[idx] != '.':
+            self.erase(idx)
+        solver.place(idx, element)
+        self.moves.append((idx, element))
+
+    def erase(self, idx):
+        '''Erase the move in idx: undo the moves back to it and place the later moves again, in O(their peers).
+        The eliminations of the move are undone by the trail, so the candidates are the same as never placing it.
+        '''
+        solver = self.solver
+        assert not solver.structure.cells[idx], 'Edit error: The idx ' + str(idx) + ' is given by the puzzle.'
+        assert solver.data[idx] != '.', 'Edit error: The idx ' + str(idx) + ' is blank.'
+        move_id = [i for i, move in enumerate(self.moves) if move[0] == idx][0]
+        later = self.moves[move_id + 1:]
+        for _ in range(len(self.moves) - move_id):
+            solver.undo_place()
+        del self.moves[move_id:]
+        flg_conflict = solver.flg_conflict
+        for move in later:
+            solver.place(move[0], move[1])
+        self.moves.extend(later)
+        if flg_conflict:
+            # Erasing never makes a new contradiction, but the old one may be gone: check the moves again,
+            # and scan every unit again for the contradictions the scan had found
+            structure = solver.structure
+            element_ids = get_elements(structure.element_set, structure.meta_size)[2]
+            cells = bytearray(element_ids[i] for i in solver.data)
+            solver.flg_conflict = find_conflict(cells, structure.geometry, solver.elements) is not None
+            solver.dirty_units = set(range(len(solver.units)))
+
+    def update_singles(self):
+        '''Keep the singles still valid and scan the dirty cells and units for the new ones.
+        A single out of the dirty units is not changed by the moves, the others are checked again by check_idx_only.
+        '''
+        solver = self.solver
+        dirty_units = set(solver.dirty_units)
+        for idx in solver.dirty_cells:
+            dirty_units.update(solver.cell_units[idx])
+        for idx, element in list(self.singles.items()):
+            if dirty_units.isdisjoint(solver.cell_units[idx]): continue
+            if solver.data[idx] != '.' or not solver.candidates[idx] & solver.element_bits[element] or \
+                    not solver.check_idx_only(idx, last_left=True, candidate=element, save_ready=False):
+                del self.singles[idx]
+        solver.ready, solver.ready_idxes = [], set()
+        solver.check_dirty_singles()
+        for idx, element, method in solver.ready:
+            self.singles[idx] = element
+        solver.ready, solver.ready_idxes = [], set()
+
+    def find_hint(self):
+        '''Find the next deducible move: a single if there is one, else the first move of the other methods in order.'''
+        solver = self.solver
+        if solver.flg_conflict or not solver.blank_count: return None
+        self.update_singles()
+        if solver.flg_conflict: return None
+        if self.singles:
+            idx = min(self.singles)
+            return (idx, self.singles[idx], 'scanned')
+        hint = None
+        for method in solver.methods:
+            if method == 'scanned': continue
+            solver.current_method = method
+            for element in solver.elements:
+                if solver.methods[method](element, fresh=False, save_scanned_data=False, save_ready=True):
+                    hint = solver.ready[0]
+                    break
+            solver.ready, solver.ready_idxes = [], set()
+            if hint: break
+        return None if solver.flg_conflict else hint
+
+    def hint(self):
+        '''The next deducible move of the current data.
+
+        Output:
+        - hint: (idx, element, method), None if nothing can be deduced, the puzzle is solved or flg_conflict is set
+        '''
+        changes = self.solver.changes
+        if self.hint_cache is None or self.hint_cache[0] != changes:
+            self.hint_cache = (changes, self.find_hint())
+        return self.hint_cache[1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play every puzzle of a file by the hints only, and time the hints.')
+    parser.add_argument('input', help='the puzzle file, see stream.read_puzzles')
+    args = parser.parse_args(argv)
+    for i, problem_structure in enumerate(read_puzzles(args.input)):
+        session = HintSession(problem_structure)
+        counts = {}
+        seconds = 0.0
+        while True:
+            start = time.time()
+            hint = session.hint()
+            seconds += time.time() - start
+            if hint is None: break
+            counts[hint[2]] = counts.get(hint[2], 0) + 1
+            session.place(hint[0], hint[1])
+        hints_num = sum(counts.values())
+        print(str(i) + '\t' + str(int(session.flg_solved)) + '\t' + str(hints_num) + '\t' + str(counts) + '\t' + \
+            '%.1f us/hint' % (seconds * 1e6 / max(hints_num, 1)))
+
+if __name__ == '__main__':
+    main()
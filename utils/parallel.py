@@ -0,0 +1,214 @@
+# coding:utf-8
+# python3.6
+
+'''Parallel search for a single hard puzzle, for the big grids where one search can take minutes on one core.
+
+Usage:
+    python -m utils.parallel puzzles.txt -w 8
+    python -m utils.parallel puzzles.txt -w 8 --count --limit 100
+
+The puzzle is propagated to a fixed point and its search frontier is split breadth first into independent subproblems.
+The subproblems are searched by a process pool in time slices: when a slice runs out, the worker splits the search
+not done yet into subproblems by Predictor.frontier() and keeps them in its local queue.
+If some workers are idle, then the worker gives its local queue back, so the idle workers steal the work.
+The workers are stopped as soon as a solution is found, or the count reaches the limit in the counting mode.
+'''
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+from .stream import read_puzzles
+
+# Externel environment
+import os
+import sys
+import time
+import queue
+import argparse
+import multiprocessing
+from collections import deque
+
+# The layout of the puzzle, the number of idle workers and the stop flag, set in every worker by init_worker()
+worker_layout = None
+worker_idle = None
+worker_stop = None
+
+def init_worker(layout, idle, stop):
+    global worker_layout, worker_idle, worker_stop
+    worker_layout = layout
+    worker_idle = idle
+    worker_stop = stop
+
+class StopToken():
+    '''The CancelToken of a worker, cancelled when the pool is stopped.'''
+    __slots__ = ()
+
+    @property
+    def flg_cancelled(self):
+        return worker_stop.value > 0
+
+def get_layout(problem_structure):
+    '''The arguments of Structure to rebuild a subproblem of the puzzle: (meta_size, box_idx_list, element_set, units, cages).'''
+    geometry = problem_structure.geometry
+    return problem_structure.meta_size, None if geometry.flg_regular else problem_structure.box_idx_list, \
+        None if problem_structure.flg_regular else problem_structure.element_set, \
+        problem_structure.units if geometry.extras else None, problem_structure.cages if geometry.cages else None
+
+def split_frontier(problem_structure, target):
+    '''Propagate the puzzle to a fixed point, then split the frontier breadth first on the blank with the fewest candidates
+    until there are target subproblems or nothing is left to split.
+
+    Output:
+    - (solutions, subproblems): the data of the solutions found while splitting, and the data of every subproblem
+    '''
+    layout = get_layout(problem_structure)
+    frontier = deque([problem_structure.data])
+    solutions = []
+    while frontier and len(frontier) < target:
+        predictor = Predictor(Structure(frontier.popleft(), *layout))
+        predictor.propagate()
+        solver = predictor.solver
+        if solver.flg_conflict: continue
+        idx, mask = predictor.choose_point()
+        if idx is None:
+            solutions.append(list(solver.data))
+            continue
+        while mask:
+            bit = mask & -mask
+            mask &= ~bit
+            data = list(solver.data)
+            data[idx] = solver.elements[bit.bit_length() - 1]
+            frontier.append(data)
+    return solutions, list(frontier)
+
+def search_task(subproblems, limit, slice_seconds):
+    '''Search the subproblems in a worker, one time slice at a time, until limit solutions are found.
+
+    Output:
+    - (kind, solutions_num, nodes, payload):
+        ('solved', num, nodes, data): the data of the last solution found, num reaches the limit
+        ('done', num, nodes, None): every subproblem is searched, or the pool is stopped
+        ('split', num, nodes, subproblems): the subproblems not searched yet, given back for the idle workers
+    '''
+    local = list(subproblems)
+    solutions_num, nodes = 0, 0
+    token = StopToken()
+    while local and not worker_stop.value:
+        predictor = Predictor(Structure(local.pop(), *worker_layout))
+        found = predictor.search(Budget(timeout=slice_seconds, token=token), limit=None if limit is None else limit - solutions_num, \
+                                 flg_frontier=True)
+        solutions_num += found
+        nodes += predictor.nodes
+        if limit is not None and solutions_num >= limit:
+            return 'solved', solutions_num, nodes, list(predictor.solver.data)
+        if predictor.subproblems:
+            local.extend(predictor.subproblems)
+            # Some workers are idle: give the work back instead of keeping it
+            if worker_idle.value > 0 and len(local) > 1:
+                return 'split', solutions_num, nodes, local
+    return 'done', solutions_num, nodes, None
+
+def parallel_search(problem_structure, limit=1, workers=None, slice_seconds=0.5, split_factor=4):
+    '''Search the puzzle with a process pool.
+
+    Input:
+    - problem_structure(Structure)
+    - limit(int): the number of solutions to stop at, if None, then count all of them
+    - workers(int): the number of processes, if None(default), then os.cpu_count()
+    - slice_seconds(float): the time slice of a worker before it splits its search
+    - split_factor(int): the number of subproblems per worker split before the pool starts
+
+    Output:
+    - (solutions_num, solution, nodes): solution is the data of a solution found, None if there is none.
+        solutions_num is the number of solutions found, up to the limit.
+    '''
+    workers = workers if workers else os.cpu_count()
+    if problem_structure.find_conflict():
+        return 0, None, 0
+    solutions, subproblems = split_frontier(problem_structure, workers * split_factor)
+    solutions_num = len(solutions)
+    solution = solutions[0] if solutions else None
+    nodes = 0
+    if (limit is not None and solutions_num >= limit) or not subproblems:
+        return min(solutions_num, limit) if limit is not None else solutions_num, solution, nodes
+
+    layout = get_layout(problem_structure)
+    idle = multiprocessing.Value('i', 0)
+    stop = multiprocessing.Value('i', 0)
+    results = queue.Queue()
+    pending = deque([subproblem] for subproblem in subproblems)
+    in_flight = 0
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(layout, idle, stop))
+    try:
+        while True:
+            while pending and in_flight < workers:
+                task = (pending.popleft(), None if limit is None else limit - solutions_num, slice_seconds)
+                pool.apply_async(search_task, task, callback=results.put, error_callback=results.put)
+                in_flight += 1
+            idle.value = workers - in_flight
+            if not in_flight: break
+            result = results.get()
+            in_flight -= 1
+            if isinstance(result, BaseException): raise result
+            kind, found, task_nodes, payload = result
+            solutions_num += found
+            nodes += task_nodes
+            if kind == 'solved':
+                solution = payload
+            if limit is not None and solutions_num >= limit: break
+            if kind == 'split':
+                pending.extend([subproblem] for subproblem in payload)
+        # The search left is not needed any more: the workers stop at their next check of the budget.
+        # They are not killed, a worker killed while sending its result would leave the result queue locked and hang the pool.
+        stop.value = 1
+        while in_flight:
+            results.get()
+            in_flight -= 1
+    except BaseException:
+        pool.terminate()
+        pool.join()
+        raise
+    pool.close()
+    pool.join()
+    return min(solutions_num, limit) if limit is not None else solutions_num, solution, nodes
+
+def parallel_solve(problem_structure, workers=None, slice_seconds=0.5, split_factor=4):
+    '''Solve the puzzle with a process pool, the steps of the workers are not collected.
+
+    Output:
+    - result(SolveResult)
+    '''
+    start = time.time()
+    solutions_num, solution, nodes = parallel_search(problem_structure, limit=1, workers=workers, \
+                                                     slice_seconds=slice_seconds, split_factor=split_factor)
+    return SolveResult(solution if solution else problem_structure.data, solution is not None, [], {}, time.time() - start, nodes=nodes)
+
+def parallel_count(problem_structure, limit=2, workers=None, slice_seconds=0.5, split_factor=4):
+    '''Count the solutions of the puzzle with a process pool, the counts of the workers are merged.
+
+    Output:
+    - solutions_num(int): up to the limit, if limit is None, then all of them
+    '''
+    return parallel_search(problem_structure, limit=limit, workers=workers, \
+                           slice_seconds=slice_seconds, split_factor=split_factor)[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve every puzzle of a file one by one, each with a process pool.')
+    parser.add_argument('input', help='the puzzle file, see stream.read_puzzles')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='the number of processes (default: cpu count)')
+    parser.add_argument('-s', '--slice', type=float, default=0.5, help='the time slice(seconds) of a worker before it splits')
+    parser.add_argument('--count', action='store_true', help='count the solutions instead of solving')
+    parser.add_argument('--limit', type=int, default=2, help='the number of solutions to stop counting at (default: 2)')
+    args = parser.parse_args(argv)
+    for i, problem_structure in enumerate(read_puzzles(args.input)):
+        start = time.time()
+        if args.count:
+            solutions_num = parallel_count(problem_structure, limit=args.limit, workers=args.workers, slice_seconds=args.slice)
+            print(str(i) + '\t' + str(solutions_num))
+        else:
+            result = parallel_solve(problem_structure, workers=args.workers, slice_seconds=args.slice)
+            print(str(i) + '\t' + str(int(result.flg_solved)) + '\t' + ','.join(result.solution))
+        sys.stderr.write('puzzle ' + str(i) + ': ' + '%.2f s' % (time.time() - start) + '\n')
+
+if __name__ == '__main__':
+    main()
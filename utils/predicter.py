@@ -2,10 +2,200 @@
 # python3.6
 
 from .structure import *
+from .solver import *
+
+# Externel environment
+import time
 
-# TODO: UNSOLVED, history save and retrace - use solver's data and data_origin
-# TODO: UNSOLVED, predict point's possible number and add checkpoint
 class Predictor():
+    '''The predictor for the puzzles which can not be solved by the basic solver only.
+    It guesses the point with the fewest candidates, propagates the guess with the basic solver and backtracks on conflict.
+
+    Elements:
+    - solver: the BasicSolver doing the propagation, its data is the current state of the search
+    - point: the checkpoint of the current guess [solver checkpoint, point_index, candidates not tried yet]
+    - point_index: the index of the current guess
+    - value: the element of the current guess
+    - checkpoints: the stack of checkpoints, one for every guess level.
+        Only the solver.checkpoint() before the guess is saved, the data is rolled back by solver.rollback().
+    - nodes: the number of guesses explored
+    - max_depth: the max depth of the checkpoint stack
+    - subproblems: the data of the subproblems not searched yet when the budget ran out, see frontier()
+    - fast_methods: the cheap methods propagating alone before the others are tried, the cages are checked with the singles
+
+    Functions:
+    - choose_point: Choose the blank with the fewest candidates
+    - propagate: Step the basic solver until nothing can be done
+    - predict: Search until the puzzle is solved, every guess fails or the budget runs out
+    - search: Search for up to limit solutions, used by predict and by the counting of the solutions
+    - frontier: Split the search not done yet into independent subproblems
+    - result: Collect the current state into a SolveResult
+    '''
     point = None
     point_index = 0
-    value = None
\ No newline at end of file
+    value = None
+
+    def __init__(self, problem_structure):
+        self.solver = BasicSolver(problem_structure)
+        self.checkpoints = []
+        self.nodes = 0
+        self.max_depth = 0
+        self.subproblems = None
+        self.fast_methods = ['scanned', 'cage'] if 'cage' in self.solver.methods else ['scanned']
+
+    def choose_point(self):
+        '''Choose the blank with the fewest candidates.
+        The candidates after the cage drops are used if they are up to date, so no guess breaks the sum of a cage.
+
+        Output:
+        - (idx, candidates): (None, 0) if there is no blank
+        '''
+        solver = self.solver
+        cache = solver.cage_cache
+        candidates = cache[1] if cache is not None and cache[0] == solver.changes else solver.candidates
+        best_idx, best_mask, best_num = None, 0, None
+        for idx, mask in enumerate(candidates):
+            if self.solver.data[idx] != '.': continue
+            num = popcount(mask)
+            if best_num is None or num < best_num:
+                best_idx, best_mask, best_num = idx, mask, num
+                if num < 2: break
+        return best_idx, best_mask
+
+    def propagate(self, budget=None):
+        '''Step the basic solver until it is solved, conflicted or stuck, or the budget runs out.
+        The cheap scanned method runs alone until it is stuck, then all methods are tried once.
+        '''
+        solver = self.solver
+        while not solver.flg_conflict and not solver.done_check():
+            if budget is not None:
+                solver.stop_reason = budget.exceeded(solver.placements, self.nodes)
+                if solver.stop_reason: break
+            if solver.step(methods=self.fast_methods): continue
+            if solver.flg_conflict or not solver.step(): break
+
+    def predict(self, budget=None):
+        '''Search until the puzzle is solved or every guess fails.
+        If the budget runs out, then the search is rolled back to the state before the first guess,
+        so the partial result only keeps the deduced blanks, and the reason is saved in solver.stop_reason.
+
+        Input:
+        - budget(Budget): if None(default), then no limit
+
+        Output:
+        - flg_solved(Boolean)
+        '''
+        return self.search(budget=budget) > 0
+
+    def search(self, budget=None, limit=1, flg_frontier=False):
+        '''Search until limit solutions are found or every guess fails, a solution found is searched past like a conflict.
+        If the search stops at the limit, then the solver keeps the last solution found.
+
+        Input:
+        - budget(Budget): if None(default), then no limit. If it runs out, then the search stops as in predict().
+        - limit(int): the number of solutions to stop at, if None, then count all of them.
+        - flg_frontier(Boolean): if True, then the subproblems not searched yet are saved in self.subproblems when the budget runs out
+
+        Output:
+        - solutions_num(int): the number of solutions found in the part searched
+        '''
+        solver = self.solver
+        solver.stop_reason = None
+        self.subproblems = None
+        solutions_num = 0
+        # The subproblems given back must be smaller than the puzzle: with flg_frontier the budget is checked only after
+        # the first guess, else a slice too short for one guess gives the same puzzle back forever
+        nodes_start = self.nodes
+        self.propagate(None if flg_frontier else budget)
+        if solver.stop_reason: return 0
+        if solver.flg_conflict: return 0
+        while True:
+            idx, mask = self.choose_point()
+            flg_solved = not solver.flg_conflict and idx is None
+            if flg_solved:
+                solutions_num += 1
+                if limit is not None and solutions_num >= limit: return solutions_num
+            if budget is not None and not (flg_frontier and self.nodes == nodes_start):
+                solver.stop_reason = budget.exceeded(solver.placements, self.nodes)
+                if solver.stop_reason:
+                    if flg_frontier:
+                        self.subproblems = self.frontier(flg_current=not solver.flg_conflict and not flg_solved)
+                    elif self.checkpoints:
+                        solver.rollback(self.checkpoints[0][0])
+                    return solutions_num
+            if not solver.flg_conflict and mask:
+                self.checkpoints.append([solver.checkpoint(), idx, mask])
+                self.max_depth = max(self.max_depth, len(self.checkpoints))
+            else:
+                # Backtrack to the latest checkpoint with candidates not tried yet
+                while self.checkpoints and not self.checkpoints[-1][2]:
+                    self.checkpoints.pop()
+                if not self.checkpoints:
+                    return solutions_num
+                solver.rollback(self.checkpoints[-1][0])
+
+            self.point = self.checkpoints[-1]
+            bit = self.point[2] & -self.point[2]
+            self.point[2] &= ~bit
+            self.point_index = self.point[1]
+            self.value = solver.elements[bit.bit_length() - 1]
+            self.nodes += 1
+            solver.add_ready(self.point_index, self.value, method='guess')
+            solver.update()
+            self.propagate(budget)
+
+    def frontier(self, flg_current=True):
+        '''Split the search not done yet into independent subproblems: the current state if flg_current,
+        then the state of every guess level with each of its candidates not tried yet.
+        The solver is rolled back to the state before the first guess and the checkpoints are cleared.
+
+        Output:
+        - subproblems(list(list(str))): the data of every subproblem, the guesses are placed but not propagated
+        '''
+        solver = self.solver
+        subproblems = [list(solver.data)] if flg_current else []
+        for checkpoint, idx, mask in reversed(self.checkpoints):
+            solver.rollback(checkpoint)
+            while mask:
+                bit = mask & -mask
+                mask &= ~bit
+                data = list(solver.data)
+                data[idx] = solver.elements[bit.bit_length() - 1]
+                subproblems.append(data)
+        self.checkpoints = []
+        return subproblems
+
+    def result(self, seconds=0.0):
+        '''Collect the current state into a SolveResult.'''
+        result = self.solver.result(seconds)
+        result.nodes = self.nodes
+        result.max_depth = self.max_depth
+        return result
+
+def solve_puzzle(problem_structure, search=True, display=False, profiler=None, budget=None, sink=None):
+    '''Solve the puzzle without changing the structure and without printing anything by default.
+
+    Input:
+    - problem_structure(Structure)
+    - search(Boolean): if True(default), then search with the Predictor when the basic solver is stuck;
+                        else, then only the basic solver.
+    - display(Boolean): if True, then print the display of the result.
+    - profiler(TechniqueProfiler): if not None, then it records the techniques of this solve.
+    - budget(Budget): if not None, then the solve stops when it runs out, with the partial result and result.reason.
+    - sink: if not None, then the steps are sent to it as they are made, see BasicSolver.sink.
+
+    Output:
+    - result(SolveResult)
+    '''
+    start = time.time()
+    predictor = Predictor(problem_structure)
+    if profiler is not None:
+        profiler.attach(predictor.solver)
+    predictor.solver.sink = sink
+    if search:
+        predictor.predict(budget)
+    else:
+        predictor.solver.solve(budget=budget)
+    if display:
+        print(predictor.solver.display())
+    return predictor.result(time.time() - start)
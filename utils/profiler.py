@@ -0,0 +1,105 @@
+# coding:utf-8
+# python3.6
+
+# Our libraries:
+from .predicter import *
+
+# Externel environment
+import json
+import time
+import cProfile
+import pstats
+
+class TechniqueProfiler():
+    '''The opt-in instrumentation of the techniques (solver.methods) of BasicSolver.
+    attach() wraps the methods of a solver, a solver never attached runs without any extra cost.
+    The wrappers call the original check_*_drop functions, so they also show up by name in cProfile.
+
+    Elements:
+    - stats(dict): {method: {'calls', 'seconds', 'eliminated', 'placed', 'elements': {element: {'calls', 'seconds', 'eliminated', 'placed'}}}}
+        eliminated is the number of candidates dropped by the technique, placed is the number of blanks it made ready.
+
+    Functions:
+    - attach: Wrap the methods of a solver
+    - detach: Restore the methods of a solver
+    - merge: Add the stats of another profiler
+    - to_dict / to_json: Export the stats
+    '''
+    def __init__(self):
+        self.stats = {}
+
+    def attach(self, solver):
+        if solver.profiled_methods is not None: return
+        solver.profiled_methods = dict(solver.methods)
+        for method, func in solver.profiled_methods.items():
+            solver.methods[method] = self.wrap(solver, method, func)
+
+    def detach(self, solver):
+        if solver.profiled_methods is None: return
+        solver.methods.update(solver.profiled_methods)
+        solver.profiled_methods = None
+
+    def wrap(self, solver, method, func):
+        stat = self.stats.setdefault(method, new_stat())
+        stat.setdefault('elements', {})
+        def profiled(element, **kwargs):
+            bit = solver.element_bits[element]
+            before = sum(1 for mask in solver.candidates if mask & bit)
+            ready_num = len(solver.ready)
+            start = time.perf_counter()
+            re = func(element, **kwargs)
+            seconds = time.perf_counter() - start
+            after = sum(1 for mask in solver.last_candidates if mask & bit) if solver.last_candidates is not None else before
+            for s in (stat, stat['elements'].setdefault(element, new_stat())):
+                s['calls'] += 1
+                s['seconds'] += seconds
+                s['eliminated'] += max(before - after, 0)
+                s['placed'] += len(solver.ready) - ready_num
+            return re
+        return profiled
+
+    def merge(self, other):
+        for method, other_stat in other.stats.items():
+            stat = self.stats.setdefault(method, new_stat())
+            add_stat(stat, other_stat)
+            for element, other_element_stat in other_stat.get('elements', {}).items():
+                add_stat(stat.setdefault('elements', {}).setdefault(element, new_stat()), other_element_stat)
+
+    def to_dict(self):
+        return json.loads(json.dumps(self.stats))
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.stats, **kwargs)
+
+def new_stat():
+    return {'calls': 0, 'seconds': 0.0, 'eliminated': 0, 'placed': 0}
+
+def add_stat(stat, other_stat):
+    for key in ('calls', 'seconds', 'eliminated', 'placed'):
+        stat[key] += other_stat[key]
+
+def profile_solve(problem_structure, profiler=None, search=True, cprofile=False):
+    '''Solve the puzzle with the techniques profiled, optionally under cProfile as well.
+
+    Input:
+    - problem_structure(Structure)
+    - profiler(TechniqueProfiler): if None(default), then a new one; pass one to aggregate many puzzles.
+    - search(Boolean): the same as solve_puzzle
+    - cprofile(Boolean): if True, then also run cProfile and return its pstats.Stats
+
+    Output:
+    - (result, profiler, cprofile_stats): cprofile_stats is None if not cprofile
+    '''
+    profiler = profiler if profiler is not None else TechniqueProfiler()
+    cprofile_stats = None
+    if cprofile:
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+        try:
+            result = solve_puzzle(problem_structure, search=search, profiler=profiler)
+        finally:
+            cprofiler.disable()
+        cprofile_stats = pstats.Stats(cprofiler)
+    else:
+        result = solve_puzzle(problem_structure, search=search, profiler=profiler)
+    return result, profiler, cprofile_stats
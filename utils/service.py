@@ -0,0 +1,390 @@
+# coding:utf-8
+# python3.6
+
+'''The solving service: an asyncio HTTP/JSON front end on a bounded process pool, for localhost only.
+
+Usage:
+    python -m utils.service --port 8098 -w 4 --timeout 10 --max-pending 256
+    python -m utils.service --unix /tmp/sudoku.sock
+
+Endpoints:
+- POST /solve {"puzzle": "..."}: solve one puzzle, the result is a JSON object.
+- POST /solve {"puzzles": ["...", ...]}: solve a batch, the results are streamed back as chunked JSON lines
+    {"index": i, ...} in the order they are finished.
+    Both accept "timeout"(seconds) to shorten the timeout of the service for this request,
+    and "max_nodes" / "max_steps" to limit the solve of every puzzle.
+    A puzzle stopped by its budget gets its partial solution and the "reason", see solver.Budget.
+    A puzzle is in the comma format or the dotted format(up to 9x9), and its solution is always in the comma format.
+- GET /metrics: the queue depth, the solve counts and the latency histograms.
+- GET /health
+
+Backpressure: at most 2 puzzles per worker are submitted to the pool, the others wait in the queue.
+A request is rejected by 503 if its puzzles would make the service hold more than max_pending puzzles.
+The deadline of the request is passed to the workers, so a puzzle running out of time stops itself and gives its slot back.
+A slot is only given back when its worker returns, so the queue slows down instead of overloading the pool.
+'''
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+from .stream import detect_format, get_meta_size, parse_dotted_line, raw_to_structure
+
+# Externel environment
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# The upper bounds(ms) of the latency buckets, the last bucket is '+Inf'.
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+MAX_BODY_SIZE = 16 * 1024 * 1024
+DEADLINE_GRACE = 0.1
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', \
+           413: 'Payload Too Large', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+def parse_puzzle(line):
+    '''Parse and validate a puzzle line in the comma or the dotted format.
+
+    Output:
+    - (problem_structure, fmt, error): error(str) is None if the puzzle is valid, else problem_structure is None
+    '''
+    fmt = detect_format(line)
+    if not line.strip():
+        return None, fmt, 'invalid puzzle: the puzzle is empty'
+    try:
+        if fmt == 'comma':
+            problem_structure = Structure(line)
+        else:
+            raw = parse_dotted_line(line)
+            # The same limit as the PuzzleWriter: a cell is a single character only up to 9x9
+            assert get_meta_size(len(raw)) <= 3, 'the dotted format is only for the grids up to 9x9'
+            problem_structure = raw_to_structure(raw)
+    except (AssertionError, KeyError, ValueError) as e:
+        return None, fmt, 'invalid puzzle: ' + str(e)
+    conflict = problem_structure.find_conflict()
+    if conflict:
+        return None, fmt, 'invalid puzzle: ' + problem_structure.conflict_message(conflict)
+    return problem_structure, fmt, None
+
+def solve_request(cells, deadline=None, max_nodes=None, max_steps=None):
+    '''Solve a puzzle validated by parse_puzzle in a worker, the solution is in the comma format.
+
+    Input:
+    - cells(bytes): the Structure.cells of the puzzle, with the default elements
+    - deadline(float): the time.time() to stop at
+    - max_nodes / max_steps(int): the budget of the solve
+
+    Output:
+    - result(dict): {'flg_solved', 'solution', 'seconds', 'nodes'} and 'reason' if the budget runs out
+    '''
+    problem_structure = raw_to_structure(cells)
+    result = solve_puzzle(problem_structure, budget=Budget(deadline=deadline, max_nodes=max_nodes, max_steps=max_steps))
+    response = {'flg_solved': result.flg_solved, 'solution': ','.join(result.solution), \
+                'seconds': result.seconds, 'nodes': result.nodes}
+    if result.reason: response['reason'] = result.reason
+    return response
+
+class Histogram():
+    '''The latency histogram with fixed buckets(ms).'''
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        i = 0
+        while i < len(LATENCY_BUCKETS) and ms > LATENCY_BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += ms
+
+    def to_dict(self):
+        buckets = {str(bound): num for bound, num in zip(LATENCY_BUCKETS, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+        return {'buckets_ms': buckets, 'count': self.count, 'mean_ms': self.total / self.count if self.count else 0.0}
+
+class SolveService():
+    '''The solving service.
+
+    Elements:
+    - workers(int): the number of processes of the pool
+    - timeout(float): the max seconds of a request
+    - max_pending(int): the max number of puzzles held by the service, waiting or solving
+    - executor(ProcessPoolExecutor)
+    - slots(asyncio.Semaphore): the puzzles submitted to the pool, 2 per worker
+    - pending(int): the puzzles held by the requests, waiting or solving
+    - waiting(int): the puzzles waiting for a slot, the queue depth
+    - running(int): the puzzles submitted to the pool, including the timed out ones not finished yet
+    - counts(dict): {'requests', 'puzzles', 'solved', 'unsolved', 'invalid', 'timeouts', 'stopped', 'rejected'},
+        'timeouts' for the deadline, 'stopped' for the other budgets
+    - puzzle_latency / request_latency(Histogram)
+
+    Functions:
+    - solve: Validate a puzzle line and solve it in the pool before the deadline
+    - handle: Serve the HTTP requests of a connection
+    - start / close
+    - metrics
+    '''
+    def __init__(self, workers=None, timeout=10.0, max_pending=256, loop=None):
+        self.workers = workers if workers else os.cpu_count()
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._loop = loop
+        self.executor = None
+        self.servers = []
+        self.slots = asyncio.Semaphore(2 * self.workers)
+        self.pending = 0
+        self.waiting = 0
+        self.running = 0
+        self.started = time.time()
+        self.counts = {'requests': 0, 'puzzles': 0, 'solved': 0, 'unsolved': 0, 'invalid': 0, 'timeouts': 0, 'stopped': 0, 'rejected': 0}
+        self.puzzle_latency = Histogram()
+        self.request_latency = Histogram()
+
+    @property
+    def loop(self):
+        '''The given loop, or the running loop bound at the first use.'''
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    async def start(self, host='127.0.0.1', port=8098, unix_path=None):
+        '''Start the pool and listen on host:port, or on the unix socket if unix_path is given.'''
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host=host, port=port)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    def release(self):
+        self.running -= 1
+        self.slots.release()
+
+    async def solve(self, line, deadline, max_nodes=None, max_steps=None):
+        '''Solve a puzzle line in the pool before the deadline(loop time).
+        The line is validated here first, so an invalid puzzle never takes a slot of the pool.
+        The result is {'error': 'timeout'} if it is still waiting for a slot at the deadline,
+        or if its worker does not return in time after stopping itself.
+        '''
+        start = self.loop.time()
+        try:
+            problem_structure, _, error = parse_puzzle(line)
+            if error:
+                result = {'error': error}
+            else:
+                result = await self.submit(bytes(problem_structure.cells), deadline, max_nodes, max_steps)
+        finally:
+            self.pending -= 1
+        if result.get('error') == 'timeout' or result.get('reason') == 'deadline':
+            self.counts['timeouts'] += 1
+        elif 'reason' in result:
+            self.counts['stopped'] += 1
+        elif 'error' in result:
+            self.counts['invalid'] += 1
+        else:
+            self.counts['solved' if result['flg_solved'] else 'unsolved'] += 1
+        self.puzzle_latency.add(self.loop.time() - start)
+        return result
+
+    async def submit(self, cells, deadline, max_nodes, max_steps):
+        '''Wait for a slot and run solve_request in the pool.'''
+        try:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), deadline - self.loop.time())
+            finally:
+                self.waiting -= 1
+        except asyncio.TimeoutError:
+            return {'error': 'timeout'}
+        self.running += 1
+        future = self.executor.submit(solve_request, cells, time.time() + deadline - self.loop.time(), max_nodes, max_steps)
+        # The slot is held until the worker is finished, even if the request times out before.
+        future.add_done_callback(lambda _: self.loop.call_soon_threadsafe(self.release))
+        try:
+            # A little grace for the worker to return the partial result after its deadline
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline - self.loop.time() + DEADLINE_GRACE)
+        except asyncio.TimeoutError:
+            return {'error': 'timeout'}
+
+    def admit(self, num):
+        '''Admit num puzzles, or reject the request by 503 if the service is full.'''
+        if self.pending + num > self.max_pending:
+            self.counts['rejected'] += 1
+            raise HTTPError(503, 'too many pending puzzles: ' + str(self.pending) + ' / ' + str(self.max_pending))
+        self.pending += num
+        self.counts['puzzles'] += num
+
+    def metrics(self):
+        return {'uptime': time.time() - self.started, 'workers': self.workers, 'max_pending': self.max_pending, \
+                'pending': self.pending, 'running': self.running, 'queue_depth': self.waiting, \
+                'counts': dict(self.counts), 'puzzle_latency': self.puzzle_latency.to_dict(), \
+                'request_latency': self.request_latency.to_dict()}
+
+    async def handle(self, reader, writer):
+        '''Serve the HTTP requests of a connection, kept alive unless the client asks to close it.'''
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None: break
+                    method, path, version, headers, body = request
+                    flg_keep = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                    await self.dispatch(method, path, body, writer, flg_keep)
+                except HTTPError as e:
+                    flg_keep = False
+                    write_response(writer, e.status, {'error': str(e)}, flg_keep)
+                await writer.drain()
+                if not flg_keep: break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body, writer, flg_keep):
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            write_response(writer, 200, {'ok': True}, flg_keep)
+        elif path == '/metrics':
+            write_response(writer, 200, self.metrics(), flg_keep)
+        elif path != '/solve':
+            raise HTTPError(404, 'no such path: ' + path)
+        elif method != 'POST':
+            raise HTTPError(405, 'only POST is allowed on /solve')
+        else:
+            await self.handle_solve(body, writer, flg_keep)
+
+    async def handle_solve(self, body, writer, flg_keep):
+        try:
+            request = json.loads(body.decode('utf-8'))
+            timeout = min(float(request.get('timeout', self.timeout)), self.timeout)
+            limits = [int(request[key]) if request.get(key) is not None else None for key in ('max_nodes', 'max_steps')]
+        except (ValueError, UnicodeDecodeError, AttributeError, TypeError) as e:
+            raise HTTPError(400, 'invalid request: ' + str(e))
+        if isinstance(request.get('puzzle'), str):
+            puzzles, flg_batch = [request['puzzle']], False
+        elif isinstance(request.get('puzzles'), list) and all(isinstance(line, str) for line in request['puzzles']):
+            puzzles, flg_batch = request['puzzles'], True
+        else:
+            raise HTTPError(400, 'invalid request: a "puzzle" string or a "puzzles" list of strings is required')
+        start = self.loop.time()
+        deadline = start + timeout
+        self.admit(len(puzzles))
+        self.counts['requests'] += 1
+        if not flg_batch:
+            result = await self.solve(puzzles[0], deadline, *limits)
+            status = 504 if result.get('error') == 'timeout' or result.get('reason') == 'deadline' else (400 if 'error' in result else 200)
+            write_response(writer, status, result, flg_keep)
+        else:
+            tasks = [asyncio.ensure_future(self.solve_indexed(i, line, deadline, limits)) for i, line in enumerate(puzzles)]
+            write_head(writer, 200, 'application/x-ndjson', flg_keep, chunked=True)
+            try:
+                for task in asyncio.as_completed(tasks):
+                    result = await task
+                    write_chunk(writer, (json.dumps(result) + '\n').encode('utf-8'))
+                    await writer.drain()
+                write_chunk(writer, b'')
+            except ConnectionError:
+                # The client is gone, the puzzles left are still finished to keep the counts right.
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        self.request_latency.add(self.loop.time() - start)
+
+    async def solve_indexed(self, i, line, deadline, limits):
+        result = await self.solve(line, deadline, *limits)
+        result['index'] = i
+        return result
+
+async def read_request(reader):
+    '''Read an HTTP request.
+
+    Output:
+    - (method, path, version, headers, body), or None if the connection is closed before the request
+    '''
+    line = await reader.readline()
+    if not line.strip(): return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise HTTPError(400, 'invalid request line: ' + line.decode('latin-1').strip())
+    method, path, version = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''): break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, 'invalid content-length: ' + headers['content-length'])
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, 'the body is larger than ' + str(MAX_BODY_SIZE) + ' bytes')
+    body = (await reader.readexactly(length)) if length > 0 else b''
+    return method, path, version, headers, body
+
+def write_head(writer, status, content_type, flg_keep, length=None, chunked=False):
+    head = 'HTTP/1.1 ' + str(status) + ' ' + REASONS.get(status, '') + '\r\nContent-Type: ' + content_type + '\r\n'
+    head += 'Transfer-Encoding: chunked\r\n' if chunked else 'Content-Length: ' + str(length) + '\r\n'
+    if status == 503: head += 'Retry-After: 1\r\n'
+    head += 'Connection: ' + ('keep-alive' if flg_keep else 'close') + '\r\n\r\n'
+    writer.write(head.encode('latin-1'))
+
+def write_chunk(writer, data):
+    writer.write(('%x\r\n' % len(data)).encode('latin-1') + data + b'\r\n')
+
+def write_response(writer, status, obj, flg_keep):
+    body = (json.dumps(obj) + '\n').encode('utf-8')
+    write_head(writer, status, 'application/json', flg_keep, length=len(body))
+    writer.write(body)
+
+def serve(host='127.0.0.1', port=8098, unix_path=None, workers=None, timeout=10.0, max_pending=256):
+    '''Run the service until it is interrupted.'''
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    service = SolveService(workers=workers, timeout=timeout, max_pending=max_pending, loop=loop)
+    server = loop.run_until_complete(service.start(host=host, port=port, unix_path=unix_path))
+    address = unix_path if unix_path else ':'.join(str(i) for i in server.sockets[0].getsockname()[:2])
+    sys.stderr.write('serving on ' + address + ' with ' + str(service.workers) + ' workers\n')
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(service.close())
+        if unix_path and os.path.exists(unix_path): os.remove(unix_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the solver over HTTP/JSON on localhost.')
+    parser.add_argument('--host', default='127.0.0.1', help='the address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8098, help='the port to listen on (default: 8098)')
+    parser.add_argument('--unix', default=None, help='listen on this unix socket instead of the port')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='the number of processes (default: cpu count)')
+    parser.add_argument('-t', '--timeout', type=float, default=10.0, help='the max seconds of a request (default: 10)')
+    parser.add_argument('-m', '--max-pending', type=int, default=256, help='the max number of puzzles held before 503 (default: 256)')
+    args = parser.parse_args(argv)
+    serve(host=args.host, port=args.port, unix_path=args.unix, workers=args.workers, timeout=args.timeout, max_pending=args.max_pending)
+
+if __name__ == '__main__':
+    main()
@@ -6,430 +6,820 @@ from .structure import *
 # from .analytics import *
 
 # Externel environment
-from itertools import combinations
+import time
+from array import array
+
+def popcount(mask):
+    '''Count the candidates (set bits) in a candidate mask.'''
+    return bin(mask).count('1')
+
+def covered_subsets(items, max_size):
+    '''Find the sets of n items (2 <= n <= max_size) whose masks cover n bits only.
+    The search is depth first on the union of the masks, a branch is pruned as soon as the union covers more than max_size bits.
+
+    Input:
+    - items: [(key, mask), ...], the masks with more than max_size bits should be filtered out before
+    - max_size(int)
+
+    Output:
+    - subsets: [(keys, union), ...], keys is a tuple of the keys of the items
+    '''
+    subsets = []
+    stack = [(0, (), 0, 0)]
+    while stack:
+        start, keys, union, num = stack.pop()
+        for i in range(start, len(items)):
+            key, mask = items[i]
+            new_union = union | mask
+            new_num = num if new_union == union else bin(new_union).count('1')
+            if new_num > max_size: continue
+            new_keys = keys + (key,)
+            if len(new_keys) >= 2 and len(new_keys) >= new_num:
+                subsets.append((new_keys, new_union))
+            elif len(new_keys) < max_size:
+                stack.append((i + 1, new_keys, new_union, new_num))
+    return subsets
+
+combinations_cache = {}
+
+def cage_combinations(values, mask, num, total):
+    '''Find the combinations of num different elements in the mask which sum up to the total, cached by the arguments.
+
+    Input:
+    - values(list(int)): the number of every element, values[i] for the bit (1 << i)
+    - mask(int): the elements allowed
+    - num(int): the number of elements in a combination
+    - total(int)
+
+    Output:
+    - combinations(tuple(int)): the mask of every combination
+    '''
+    key = (tuple(values), mask, num, total)
+    combinations = combinations_cache.get(key)
+    if combinations is None:
+        bits = [(values[i], 1 << i) for i in range(len(values)) if mask >> i & 1]
+        found = []
+        stack = [(0, 0, 0, 0)]
+        while stack:
+            start, combination, count, value_sum = stack.pop()
+            if count == num:
+                if value_sum == total: found.append(combination)
+                continue
+            for j in range(start, len(bits)):
+                value, bit = bits[j]
+                if value_sum + value <= total: stack.append((j + 1, combination | bit, count + 1, value_sum + value))
+        combinations = combinations_cache[key] = tuple(found)
+    return combinations
+
+class CancelToken():
+    '''The cooperative cancellation of a solve call, checked between the steps and the search nodes.
+    cancel() can be called from another thread or a signal handler.
+    '''
+    __slots__ = ('flg_cancelled',)
+
+    def __init__(self):
+        self.flg_cancelled = False
+
+    def cancel(self):
+        self.flg_cancelled = True
+
+class Budget():
+    '''The limits of a solve call, a solve stops with a partial result and the reason when any of them runs out.
+    The budget is checked between the steps, so a step placing several blanks may go past max_steps.
+
+    Elements:
+    - deadline(float): the time.time() to stop at, None for no limit. timeout(seconds) is turned into the deadline.
+    - max_steps(int): the max number of placements, the guesses and the placements rolled back by the search included,
+        see BasicSolver.placements
+    - max_nodes(int): the max number of search nodes
+    - token(CancelToken)
+
+    Functions:
+    - exceeded: The reason the budget runs out: 'cancelled' / 'deadline' / 'max_steps' / 'max_nodes', None if it does not
+    '''
+    __slots__ = ('deadline', 'max_steps', 'max_nodes', 'token')
+
+    def __init__(self, timeout=None, deadline=None, max_steps=None, max_nodes=None, token=None):
+        if timeout is not None:
+            deadline = min(deadline, time.time() + timeout) if deadline is not None else time.time() + timeout
+        self.deadline = deadline
+        self.max_steps = max_steps
+        self.max_nodes = max_nodes
+        self.token = token
+
+    def exceeded(self, placements=0, nodes=0):
+        if self.token is not None and self.token.flg_cancelled: return 'cancelled'
+        if self.deadline is not None and time.time() >= self.deadline: return 'deadline'
+        if self.max_steps is not None and placements >= self.max_steps: return 'max_steps'
+        if self.max_nodes is not None and nodes >= self.max_nodes: return 'max_nodes'
+        return None
+
+class SolveResult():
+    '''The result of a solve, holding no reference to the solver or the structure.
+
+    Elements:
+    - solution(list(str)): the data after solving, the blanks not solved are left as '.'
+    - flg_solved(Boolean): True if every blank is solved without conflict
+    - steps(list): [(idx, element, method), ...]
+    - technique_counts(dict): {method: the number of steps of it}, counted from the steps, so the branches rolled back
+        by the search are not included; 'guess' is the number of guesses kept, the guesses tried are counted by nodes
+    - seconds(float): the wall time of the solve
+    - nodes / max_depth(int): the statistics of the search, 0 if there is no search
+    - reason(str): why the solve stopped before its end, see Budget.exceeded, None if it ran to the end
+    '''
+    __slots__ = ('solution', 'flg_solved', 'steps', 'technique_counts', 'seconds', 'nodes', 'max_depth', 'reason')
+
+    def __init__(self, solution, flg_solved, steps, technique_counts, seconds, nodes=0, max_depth=0, reason=None):
+        self.solution = solution
+        self.flg_solved = flg_solved
+        self.steps = steps
+        self.technique_counts = technique_counts
+        self.seconds = seconds
+        self.nodes = nodes
+        self.max_depth = max_depth
+        self.reason = reason
+
+    def __repr__(self):
+        return 'SolveResult(flg_solved=' + str(self.flg_solved) + ', steps=' + str(len(self.steps)) + \
+            ', technique_counts=' + str(self.technique_counts) + ', seconds=' + '%.6f' % self.seconds + \
+            (', reason=' + repr(self.reason) if self.reason else '') + ')'
 
 class BasicSolver():
     '''The basic solver for the sudoku puzzle.
 
+    The solver keeps one integer bitmask of candidates per cell and one "placed" mask per row / column / box.
+    Bit i of a mask stands for the element self.elements[i].
+    The masks are updated incrementally whenever update() commits a value, so no technique has to rebuild the grid.
+    A placement also marks what it changed as dirty, and a step only re-examines the dirty cells, units and elements.
+
     Elements:
 
     - structure: the structure inherited from the structure.add()
-    - data: the current puzzle data
+    - data: the current puzzle data, a copy of structure.data, so the structure is never changed by the solver
+    - data_origin: the puzzle data before solving, decoded from the structure on every access
     - meta_size: the structure's meta_size inherited from the structure class in order to simplify the coding.
-    - idxes_need_to_solve: list of indexes where the blank not solved [idx, ...]
-    - steps: the step-by-step history of the solving process [(idx, update_num), ...]
-    - ready: the step-by-step solutions which is ready to update [(idx, update_num), ...]
-    - tmp_scanned_data # TODO: SOLVED, make self.tmp_scanned_data a list of dict {element: tmp_scanned_data ...} and delete self.tmp_scanned_element
-    # - tmp_scanned_element
+    - idxes_need_to_solve: list of indexes where the blank not solved [idx, ...], built from the structure on every access
+    - steps: the step-by-step history of the solving process [(idx, update_num, method), ...]
+    - ready: the step-by-step solutions which is ready to update [(idx, update_num, method), ...]
+    - current_method: the method scanning now, recorded with the ready it finds
+    - elements: the sorted elements shared with the structure, elements[i] is represented by the bit (1 << i)
+    - element_bits: {element: bit}
+    - candidates: the candidate mask of every cell, 0 for the solved cells, an array('q') while the masks fit in 63 bits
+    - units / cell_units / units_num_full: the unit index of the geometry, see Geometry.
+        Only the first units_num_full units hold every element, so only they find the hidden singles and subsets.
+    - placed_units: the mask of elements already placed in every unit
+    - cages / cell_cages: the killer cages of the geometry, see Geometry
+    - element_values: the number of every element, the cages sum them up, None if there is no cage
+    - cage_sums / cage_blanks: the sum of the elements placed and the number of blanks of every cage
+    - tmp_scanned_data: {element: scanned data}, rebuilt from the candidates on demand for display and debug
+    - last_candidates: the candidate masks the last technique checked the singles with
+    - dirty_cells: the blanks whose candidates changed since the last scan of the singles
+    - dirty_units: the unit ids with a placement since the last scan of the singles,
+        the units of the dirty cells are scanned as well
+    - dirty_elements: {method: the mask of the elements whose candidates changed since the method last ran in a step}
+    - placements(int): the number of placements since the solver was built, the ones rolled back included, checked by Budget.max_steps
+    - changes(int): the number of placements and undos, the key of the cached drops of the subset and cage methods
+    - trail: the undo log of every placement after the givens, a few integers per change, see place()
+    - flg_conflict(Boolean): True if the current data contradicts itself, e.g. an element placed twice in a unit
+                            or an element without any place left in a unit
+    - stop_reason(str): why the last solve call stopped before its end, see Budget.exceeded, None if it did not
+    - sink: if not None, then every placement of update() is sent to sink.step(idx, element, method, eliminations) as it is made,
+            and every rollback to sink.rollback(steps_num), e.g. trace.TraceWriter
 
     Functions:
     - display
+    - place: Place an element into a blank and update the masks of its peers
     - update: Update the self.data into a new state, clear the ready and record the steps
+    - check_dirty_singles: The scanned method on the dirty cells and units only
+    - checkpoint / rollback: Save the current state and roll back to it in O(changes)
     - check_idx_only
     - check_idx_last_left
     - check_scanned_drop
     - check_area_drop
     - check_grouped_dropped
     - check_squared_dropped
+    - check_subset_drop: Naked / hidden pairs, triples and quads
+    - check_fish_drop: X-Wing / Swordfish / Jellyfish of any size up to 4, where check_square_drop only finds the lines sharing the same crossing lines
+    - check_cage_drop: The combinations of the elements left which sum up to the total left of every cage, only for the cages
     TODO: UNSOLVED, predict part
     FIXME: SOLVED, save_ready & save_scanned_data seperated
-    TODO: UNSOLVED, OPTIMIZE THE BASIC SOLVER
+    TODO: SOLVED, OPTIMIZE THE BASIC SOLVER
     '''
+    __slots__ = ('structure', 'data', 'meta_size', 'steps', 'ready', 'current_method', 'ready_idxes', \
+                'methods', 'fallback_methods', 'last_candidates', 'profiled_methods', \
+                'rows', 'cols', 'boxes', 'cell_rows', 'cell_cols', 'cell_boxes', 'peers', \
+                'units', 'cell_units', 'units_num_full', 'cages', 'cell_cages', 'element_values', 'cage_sums', 'cage_blanks', \
+                'elements', 'element_bits', 'full_mask', 'placed_units', 'blank_count', 'flg_conflict', \
+                'dirty_cells', 'dirty_units', 'dirty_elements', 'placements', 'changes', 'subset_cache', 'cage_cache', 'trail', 'candidates', \
+                'stop_reason', 'sink')
+
     def __init__(self, problem_structure):
         assert problem_structure.__class__ == Structure, 'Parameter error: The problem_structure\'s class is not Structure.'
         self.structure = problem_structure
-        self.data = problem_structure.data # the same as the structure.data, synchronous
-        self.data_origin = list(self.data)
+        self.data = problem_structure.data
         self.meta_size = problem_structure.meta_size
-        self.idxes_need_to_solve = [idx for idx, i in enumerate(self.data_origin) if i == '.']
         self.steps = []
-        self.ready = [] # the [{idx : update_num} ..] of what is ready to update
-        self.display = problem_structure.display
+        self.ready = [] # the [(idx, update_num, method) ..] of what is ready to update
+        self.current_method = None
+        self.ready_idxes = set()
 
         self.methods = {'scanned': self.check_scanned_drop, \
                     'area':self.check_area_drop, \
                     'group': self.check_group_drop, \
-                    'square': self.check_square_drop}
+                    'square': self.check_square_drop, \
+                    'subset': self.check_subset_drop, \
+                    'fish': self.check_fish_drop}
+        if problem_structure.geometry.cages:
+            self.methods = dict([('scanned', self.check_scanned_drop), ('cage', self.check_cage_drop)] + list(self.methods.items())[1:])
+        self.fallback_methods = {'subset', 'fish'} # the expensive methods, only tried when the others are stuck
+        self.last_candidates = None
+        self.profiled_methods = None # the original methods while a profiler is attached
+
+        # Geometry: shared lookup tables of the structure
+        geometry = problem_structure.geometry
+        self.rows = geometry.rows
+        self.cols = geometry.cols
+        self.boxes = geometry.boxes
+        self.cell_rows = geometry.cell_rows
+        self.cell_cols = geometry.cell_cols
+        self.cell_boxes = geometry.cell_boxes
+        self.peers = geometry.peers
+        self.units = geometry.units
+        self.cell_units = geometry.cell_units
+        self.units_num_full = geometry.units_num_full
+        self.cages = geometry.cages
+        self.cell_cages = geometry.cell_cages
+
+        # Candidates
+        self.elements = problem_structure.elements
+        self.element_bits = {ele: 1 << i for i, ele in enumerate(self.elements)}
+        self.full_mask = (1 << len(self.elements)) - 1
+        self.placed_units = placed_units = [0] * len(self.units)
+        self.blank_count = len(self.data)
+        self.flg_conflict = False
+        self.stop_reason = None
+        self.sink = None
+        self.dirty_units = set(range(len(self.units)))
+        self.dirty_elements = {method: self.full_mask for method in self.methods}
+        self.placements = 0
+        self.changes = 0
+        self.subset_cache = None # (changes, candidates after the subset drops)
+        self.cage_cache = None # (changes, candidates after the cage drops)
+        self.trail = array('q') if self.full_mask < 1 << 63 else [] # the undo log of the placements, the givens are not logged
+        # The givens: the unit masks in one pass, then the candidates, without the peers loop of place()
+        for idx, i in enumerate(self.data):
+            if i != '.':
+                bit = self.element_bits[i]
+                for unit_id in self.cell_units[idx]:
+                    if placed_units[unit_id] & bit: self.flg_conflict = True
+                    placed_units[unit_id] |= bit
+                self.blank_count -= 1
+        candidates = [self.mask_of(idx) if i == '.' else 0 for idx, i in enumerate(self.data)]
+        self.element_values = [int(ele) for ele in self.elements] if self.cages else None
+        self.cage_sums = [sum(self.element_values[self.elements.index(self.data[idx])] for idx in idxes if self.data[idx] != '.') \
+            for idxes, total in self.cages]
+        self.cage_blanks = [sum(1 for idx in idxes if self.data[idx] == '.') for idxes, total in self.cages]
+        for cage_id in range(len(self.cages)):
+            if self.cage_conflict(cage_id): self.flg_conflict = True
+        self.candidates = array('q', candidates) if self.full_mask < 1 << 63 else candidates
+        # A blank without any candidate is a contradiction found before any step
+        if any(not mask for idx, mask in enumerate(candidates) if self.data[idx] == '.'): self.flg_conflict = True
+        self.dirty_cells = set(idx for idx, i in enumerate(self.data) if i == '.')
+
+    @property
+    def data_origin(self):
+        return self.structure.data
+
+    @property
+    def idxes_need_to_solve(self):
+        return [idx for idx, i in enumerate(self.structure.cells) if i == 0]
+
+    def display(self, data=None):
+        '''Display the current situation of the solver, data: if None(default), then use self.data.'''
+        return self.structure.display(data if data else self.data)
+
+    @property
+    def tmp_scanned_data(self):
+        '''The scanned data of every element: the blanks where the element has been dropped are marked by ''.'''
+        return {ele: [i if i != '.' else ('.' if self.candidates[idx] & bit else '') for idx, i in enumerate(self.data)] \
+            for ele, bit in self.element_bits.items()}
+
+    def mask_of(self, idx, placed_units=None):
+        '''The candidate mask of the blank idx: the elements not placed in any of its units.'''
+        placed_units = placed_units if placed_units else self.placed_units
+        mask = 0
+        for unit_id in self.cell_units[idx]:
+            mask |= placed_units[unit_id]
+        return self.full_mask & ~mask
+
+    def cage_conflict(self, cage_id):
+        '''Check if the elements placed in the cage sum up beyond its total, or the full cage misses the total.'''
+        total = self.cages[cage_id][1]
+        return self.cage_sums[cage_id] > total or (not self.cage_blanks[cage_id] and self.cage_sums[cage_id] != total)
+
+    def candidates_from_data(self, data):
+        '''Build the candidate masks from an external data list.
+        Blanks marked by '' are treated as already dropped for every element.
+        '''
+        placed_units = [0] * len(self.units)
+        for idx, i in enumerate(data):
+            if i in self.element_bits:
+                for unit_id in self.cell_units[idx]:
+                    placed_units[unit_id] |= self.element_bits[i]
+        return [self.mask_of(idx, placed_units) if i == '.' else 0 for idx, i in enumerate(data)]
+
+    def place(self, idx, element):
+        '''Place the element into the blank idx and drop it from the candidates of the peers.
+        The units of idx, the peers losing the candidate and the elements changed are marked as dirty.
+        The change is recorded into the trail as [peer, ..., the number of peers, unit flags, old candidates of idx, idx],
+        bit k of the unit flags tells if the k-th unit of cell_units[idx] did not have the element before.
+        The sum of the cage of idx is updated, and flg_conflict is set if the cage goes beyond its total.
+
+        Output:
+        - eliminations(int): the number of peers losing the element from their candidates
+        '''
+        bit = self.element_bits[element]
+        old_mask = self.candidates[idx]
+        changed = old_mask | bit
+        if not old_mask & bit: self.flg_conflict = True
+        self.data[idx] = element
+        self.candidates[idx] = 0
+        placed_units = self.placed_units
+        unit_ids = self.cell_units[idx]
+        flags = 0
+        for k, unit_id in enumerate(unit_ids):
+            if not placed_units[unit_id] & bit:
+                flags |= 1 << k
+                placed_units[unit_id] |= bit
+        self.blank_count -= 1
+        self.placements += 1
+        self.changes += 1
+        self.dirty_units.update(unit_ids)
+        cage_id = self.cell_cages[idx]
+        if cage_id >= 0:
+            self.cage_sums[cage_id] += self.element_values[bit.bit_length() - 1]
+            self.cage_blanks[cage_id] -= 1
+            if self.cage_conflict(cage_id): self.flg_conflict = True
+        candidates = self.candidates
+        trail = self.trail
+        peers = self.peers[idx]
+        trail_num = len(trail)
+        for peer in peers:
+            mask = candidates[peer]
+            if mask & bit:
+                mask ^= bit
+                candidates[peer] = mask
+                trail.append(peer)
+                if not mask & (mask - 1): changed |= mask # a new naked single of another element
+        eliminations = len(trail) - trail_num
+        trail.extend((eliminations, flags, old_mask, idx))
+        self.dirty_cells.update(peers)
+        dirty_elements = self.dirty_elements
+        for method in dirty_elements:
+            dirty_elements[method] |= changed
+        return eliminations
+
+    def undo_place(self):
+        '''Undo the last placement recorded in the trail, in O(the number of its peers changed).
+
+        Output:
+        - idx: the index cleared
+        '''
+        trail = self.trail
+        idx = trail.pop()
+        old_mask = trail.pop()
+        flags = trail.pop()
+        peers_num = trail.pop()
+        bit = self.element_bits[self.data[idx]]
+        candidates = self.candidates
+        for _ in range(peers_num):
+            peer = trail.pop()
+            candidates[peer] |= bit
+            self.dirty_cells.add(peer)
+        self.data[idx] = '.'
+        candidates[idx] = old_mask
+        unit_ids = self.cell_units[idx]
+        for k, unit_id in enumerate(unit_ids):
+            if flags >> k & 1: self.placed_units[unit_id] &= ~bit
+        cage_id = self.cell_cages[idx]
+        if cage_id >= 0:
+            self.cage_sums[cage_id] -= self.element_values[bit.bit_length() - 1]
+            self.cage_blanks[cage_id] += 1
+        self.blank_count += 1
+        self.changes += 1
+        self.dirty_cells.add(idx)
+        self.dirty_units.update(unit_ids)
+        for method in self.dirty_elements:
+            self.dirty_elements[method] |= old_mask | bit
+        return idx
+
+    def checkpoint(self):
+        '''Save a checkpoint of the current state, which is only the lengths of the trail and the steps.
+
+        Output:
+        - checkpoint(tuple): (the length of the trail, the number of steps, flg_conflict), passed to rollback()
+        '''
+        return (len(self.trail), len(self.steps), self.flg_conflict)
+
+    def rollback(self, checkpoint):
+        '''Roll the state back to the checkpoint by undoing the placements after it, in O(changes) since then.
+        The ready is cleared, the drops saved by save_scanned_data=True are not rolled back.
+
+        Input:
+        - checkpoint(tuple): returned by checkpoint()
+        '''
+        trail_num, steps_num, flg_conflict = checkpoint
+        while len(self.trail) > trail_num:
+            self.undo_place()
+        del self.steps[steps_num:]
+        if self.sink is not None: self.sink.rollback(steps_num)
+        self.ready = []
+        self.ready_idxes = set()
+        self.flg_conflict = flg_conflict
 
-        self.tmp_scanned_data = {ele:list(self.data_origin) for ele in problem_structure.element_set}
-        # self.tmp_scanned_element = None
-    
-    def check_idx_only(self, idx, data=None, last_left=False, candidate=None, save_ready=True):
-        '''Check if the item with the index idx is the only blank of its row / column / box.
+    def add_ready(self, idx, element, save_ready=True, method=None):
+        '''Add (idx, element, method) into the ready list if the idx is not in it.
+
+        Input:
+        - method: the technique finding it, if None(default), then self.current_method
+
+        Output:
+        - flg_changed(Boolean): True if it is ready to update
+        '''
+        if idx in self.ready_idxes: return False
+        if save_ready:
+            self.ready.append((idx, element, method if method else self.current_method))
+            self.ready_idxes.add(idx)
+        return True
+
+    def check_idx_only(self, idx, candidates=None, last_left=False, candidate=None, save_ready=True):
+        '''Check if the item with the index idx is the only place for the candidate in its row / column / box.
 
         Input:
         - idx: the index where we check
-        - data: the external data we put in.
+        - candidates: the candidate masks we check with, if None(default), then use self.candidates.
         - last_left(Boolean): if False(default), then use the scan only;
                                     if True, then use the last_left_check.
-        - candidate: if None(default), then the element to be updated will be fixed with the only one left from the element_set
-                            else, then the candidate will be the new value.
-        - save_ready: if True(default), then save the ready to update into self.ready; else, then just scan and update the tmp_scanned_data
+        - candidate: the element we check in the units holding every element, if None(default), then only the last_left_check can be used.
+        - save_ready: if True(default), then save the ready to update into self.ready
 
         Ouput:
         - flg_changed(Boolean): True if it is ready to update
-        
-        # TODO: UNSOLVED, element_set auto recognition.
-        # TODO: SOLVED, add a parameter to determine whether to use the last_left_check
         '''
-        data = data if data else list(self.data)
-        # print(self.data[idx])
-
-        # Check if the index is already in ready list
-        if idx in [i[0] for i in self.ready]: return False
-
-        def check_idx_only_in_line(line, idx_in_line, element_set, candidate=candidate):
-            '''check if the element with the index idx_in_line is the only one in line
-            
-            Input:
-            - line
-            - id_in_line
-            - element_set
-            
-
-            Output:
-            - flg_change
-            '''
-            candidate = candidate if candidate else list(element_set - set(line))[0] if len(element_set - set(line)) == 1 else element_set - set(line)
-            return candidate if (line[idx_in_line] == '.' and line.count('.') == 1) else element_set - set(line)
-        
-        # Check row
-        row_line = data[int(idx / (self.meta_size**2)) * self.meta_size**2:int(idx / (self.meta_size**2) + 1) * self.meta_size**2]
-        idx_in_row_line = idx % (self.meta_size**2)
-        re_row = check_idx_only_in_line(row_line, idx_in_row_line, self.structure.element_set)
-        # print(row_line, idx_in_row_line, re_row)
-        if type(re_row) != set:
-            if re_row in row_line:
-                return False
-            if save_ready:
-                self.ready.append((idx, re_row))
-            return True
-    
-        # Check column
-        col_line = [data[idx % (self.meta_size**2) + row * self.meta_size**2] for row in range(self.meta_size**2)]
-        idx_in_col_line = int(idx / (self.meta_size**2))
-        re_col = check_idx_only_in_line(col_line, idx_in_col_line, self.structure.element_set)
-        # print(col_line, idx_in_col_line, re_col)
-        if type(re_col) != set:
-            if re_col in col_line:
-                return False
-            if save_ready:
-                self.ready.append((idx, re_col))
-            return True
-            
-        # Check box
-        box_line = [data[i] for i in self.structure.box_idx_list[self.structure.get_boxid_by_idx(idx)]]
-        idx_in_box_line = self.structure.box_idx_list[self.structure.get_boxid_by_idx(idx)].index(idx)
-        re_box = check_idx_only_in_line(box_line, idx_in_box_line, self.structure.element_set)
-        # print(box_line, idx_in_box_line, re_box)
-        if type(re_box) != set:
-            if re_box in box_line:
-                return False
-            if save_ready:
-                self.ready.append((idx, re_box))
-            return True
-        
-        if last_left:
-            re = list(re_col & re_row & re_box)
-            if len(re) == 1:
-                if re[0] in col_line or re[0] in row_line or re[0] in box_line:
-                    return False
-                if save_ready:
-                    self.ready.append((idx, re[0]))
-                return True
-        
+        candidates = candidates if candidates else self.candidates
+        if candidate is not None:
+            bit = self.element_bits[candidate]
+            if candidates[idx] & bit:
+                for unit_id in self.cell_units[idx]:
+                    if unit_id >= self.units_num_full or self.placed_units[unit_id] & bit: continue
+                    if not any(candidates[i] & bit for i in self.units[unit_id] if i != idx):
+                        return self.add_ready(idx, candidate, save_ready)
+
+        if last_left and candidates[idx] and not candidates[idx] & (candidates[idx] - 1):
+            return self.add_ready(idx, self.elements[candidates[idx].bit_length() - 1], save_ready)
+
         return False
 
-    def check_idx_last_left(self, idx, data=None, last_left=True, candidate=None, save_ready=True):
-        return self.check_idx_only(idx, data=data, last_left=last_left, candidate=candidate, save_ready=save_ready)
-    
+    def check_idx_last_left(self, idx, candidates=None, last_left=True, candidate=None, save_ready=True):
+        return self.check_idx_only(idx, candidates=candidates, last_left=last_left, candidate=candidate, save_ready=save_ready)
+
+    def check_singles(self, element, candidates, save_ready=True):
+        '''Check every unit holding every element for the element which has only one place left,
+        and every blank with the element as its last candidate.'''
+        self.last_candidates = candidates
+        bit = self.element_bits[element]
+        flg_change = False
+        placed_units = self.placed_units
+        for unit_id in range(self.units_num_full):
+            if placed_units[unit_id] & bit: continue
+            only = None
+            for idx in self.units[unit_id]:
+                if candidates[idx] & bit:
+                    if only is not None:
+                        only = -1
+                        break
+                    only = idx
+            if only is None: self.flg_conflict = True
+            elif only >= 0 and self.add_ready(only, element, save_ready): flg_change = True
+        for idx, mask in enumerate(candidates):
+            if mask == bit and self.add_ready(idx, element, save_ready): flg_change = True
+        return flg_change
+
     def check_scanned_drop(self, element, fresh=False, data=None, save_scanned_data=True, save_ready=True):
         '''Check whether the element can be scanned and dropped
 
         Input:
         - element
-        - data(structure.data): if None(default), then we use the self.data. # TODO: SOLVED, Just leave them both. decide use data /(fresh and self.tmp_scanned_data) to pass the data.
-        # - save_scanned_data(Boolean): if False, then we just do the basic scan and return flg_change;
-        #                                 if True(default), then we save the tmp_scanned_date in self.tmp_scanned_data.
+        - fresh(Boolean): kept for compatibility, the candidates are always up to date with self.data.
+        - data(structure.data): if None(default), then we use the self.candidates.
+        - save_scanned_data(Boolean): kept for compatibility, scanning itself never drops more than the masks already do.
         - save_ready
 
         Output:
         - flg_change
-
-        # TODO: SOLVED, add a parameter to determine whether to save the scanned progress and element
         '''
         if data:
             self.structure.check_data_and_boxes(data=data, processed=True)
-        else:
-            data = list(self.tmp_scanned_data[element]) if not fresh else list(self.data) # FIXME: SOLVED, all copy should be replaced by deepcopy
-        idxes_elements_distributed = [idx for idx, i in enumerate(data) if i == element]
-        idxes_need_to_solve = [idx for idx, i  in enumerate(data) if i == '.']
-        tmp_scanned_data = list(data)
-        # check_in_same_row int(idx_1 / (meta_size**2)) == int(idx_2 / (meta_size**2))
-        # check_in_same_col idx_1 % (meta_size**2) == idx_2 % (meta_size**2)
-        # check_in_same_box self.structure.get_boxid_by_idx(idx)
-        for idx in idxes_elements_distributed:
-            idxes_need_to_solve = [i for i in list(idxes_need_to_solve) if ( \
-              int(idx / (self.meta_size**2)) != int(i / (self.meta_size**2)) and \
-              idx % (self.meta_size**2) != i % (self.meta_size**2) and \
-              self.structure.get_boxid_by_idx(idx) != self.structure.get_boxid_by_idx(i) \
-            )]
-        for idx in list(set(self.idxes_need_to_solve) - set(idxes_need_to_solve)):
-            # if save_scanned_data:
-            #     print('drop scanned element ', element, ' in idx ', idx)
-            tmp_scanned_data[idx] = ''
-        
-        flg_change = False
-        for idx in idxes_need_to_solve:
-            if self.check_idx_only(idx, tmp_scanned_data, candidate=element, save_ready=save_ready) or self.check_idx_last_left(idx, tmp_scanned_data, candidate=element, save_ready=save_ready): flg_change = True
-        
-        if save_scanned_data:
-            self.tmp_scanned_data[element] = tmp_scanned_data
-        # print(self.structure.display(tmp_scanned_data[element]))
-        # print(idxes_need_to_solve)
+            return self.check_singles(element, self.candidates_from_data(data), save_ready=save_ready)
+        return self.check_singles(element, self.candidates, save_ready=save_ready)
+
+    def check_dirty_singles(self, save_ready=True):
+        '''The scanned method on the dirty cells and units only, which is the same as scan_all('scanned') on every element.
+        A clean cell or unit has not changed since the last scan, so it has no single not found then.
+        The hidden singles of all the elements of a unit are found in one pass: the bits seen once but not twice.
 
+        Output:
+        - flg_change
+        '''
+        self.current_method = 'scanned'
+        self.last_candidates = self.candidates
+        candidates, data, elements = self.candidates, self.data, self.elements
+        units, placed_units, units_num_full = self.units, self.placed_units, self.units_num_full
+        flg_change = False
+        dirty_units = set(self.dirty_units)
+        for idx in self.dirty_cells:
+            mask = candidates[idx]
+            if data[idx] != '.': continue
+            dirty_units.update(self.cell_units[idx])
+            if not mask: self.flg_conflict = True
+            elif not mask & (mask - 1) and self.add_ready(idx, elements[mask.bit_length() - 1], save_ready): flg_change = True
+        for unit_id in sorted(dirty_units):
+            if unit_id >= units_num_full: break
+            once, twice = 0, 0
+            for idx in units[unit_id]:
+                twice |= once & candidates[idx]
+                once |= candidates[idx]
+            if self.full_mask & ~placed_units[unit_id] & ~once: self.flg_conflict = True
+            hidden = once & ~twice
+            if not hidden: continue
+            for idx in units[unit_id]:
+                mask = candidates[idx] & hidden
+                if mask and self.add_ready(idx, elements[(mask & -mask).bit_length() - 1], save_ready): flg_change = True
+        if save_ready:
+            self.dirty_cells = set()
+            self.dirty_units = set()
+            self.dirty_elements['scanned'] = 0
         return flg_change
 
-    def scan_all(self, method='scanned', fresh=False, save_scanned_data=True, save_ready=False): # BUG: SOLVED, scan all does not work for square
+    def scan_all(self, method='scanned', fresh=False, save_scanned_data=True, save_ready=False, mask=None): # BUG: SOLVED, scan all does not work for square
         '''Scan all the elements in self.element_set with selected method
         Input:
         - method: check_scanned_drop(default)
         - save_ready
+        - mask: only scan the elements in the mask, if None(default), then all
         '''
-        re = {ele: False for ele in self.structure.element_set}
-        for ele in self.structure.element_set:
-            re[ele] = self.methods[method](ele, fresh=fresh, save_scanned_data=save_scanned_data, save_ready=save_ready)
-            # print('method : ', method,  ' element: ', ele, '\n result ready : ', {chr(int(int(t[0])/(self.meta_size**2)) + ord('A'))+ str(int(t[0])%(self.meta_size**2) + 1) : t[1] for t in self.ready})
-        return any(list(re.values()))
+        re = False
+        self.current_method = method
+        for i, ele in enumerate(self.elements):
+            if mask is not None and not mask >> i & 1: continue
+            if self.methods[method](ele, fresh=fresh, save_scanned_data=save_scanned_data, save_ready=save_ready): re = True
+        return re
 
     def check_area_drop(self, element, fresh=False, save_scanned_data=False, save_ready=False):
         '''Check whether the element can be scanned in the area form and dropped
 
         Input:
         - element
-        - fresh(Boolean): if False(default), then we use the self.tmp_scanned_data as the data
-                    if True, then we use the self.data as the new data
-        - save_scanned_data(Boolean)
+        - fresh(Boolean): kept for compatibility.
+        - save_scanned_data(Boolean): if True, then the drops are saved into self.candidates.
 
         Output:
         - flg_change
-        BUG: SOLVED, STILL not fixed!!!
         '''
-        if self.check_scanned_drop(element, save_scanned_data=False, save_ready=False):
-            # print('Before area drop, scanned drop can also make some changes.')
-            pass
-            # self.update()
-            # return self.check_area_drop(element)
-            # return True # FIXME: SOLVED, first update the data and then do the rest part.
-        tmp_scanned_data = list(self.tmp_scanned_data[element]) if not fresh else list(self.data)
-
-        # FIXME:  SOLVED, area scanned part. test_demo[6]
-        # idxes_elements_distributed = [idx for idx, i in enumerate(self.data) if i == element]
-        idxes_need_to_solve = [idx for idx, i in enumerate(tmp_scanned_data) if i == '.']
-        boxes = self.structure.box_idx_list
+        bit = self.element_bits[element]
+        candidates = self.candidates if save_scanned_data else list(self.candidates)
+        size = len(self.rows)
 
         # Box
-        # print('Box : ')
-        for box in boxes:
-            # print('box : ', box)
-            if element in [tmp_scanned_data[idx] for idx in box]:
-                continue
-            box_idxes_to_solve = list(set(box) & set(idxes_need_to_solve))
-
-            rows_of = []
-            cols_of = []
-            for idx in box_idxes_to_solve:
-                rows_of.append(int(idx / (self.meta_size**2)))
-                cols_of.append(idx % (self.meta_size**2))
-            
-            if len(set(rows_of)) == 1:
-                row = rows_of[0]
-                # print(' - row : ', row)
-                for idx in idxes_need_to_solve:
-                    if int(idx / (self.meta_size**2)) == row and idx not in box: tmp_scanned_data[idx] = ''
-            
-            if len(set(cols_of)) == 1:
-                col = cols_of[0]
-                # print(' - col : ', col)
-                for idx in idxes_need_to_solve:
-                    if idx % (self.meta_size**2) == col and idx not in box: tmp_scanned_data[idx] = ''
-        
-        # Row
-        # print('Row : ')
-        for rowi in range(self.meta_size**2):
-            row = range(rowi * (self.meta_size**2), (rowi + 1) * (self.meta_size**2))
-            if element in [tmp_scanned_data[idx] for idx in row]:
-                continue
-            row_idxes_to_solve = list(set(row) & set(idxes_need_to_solve))
-            
-            boxes_of = []
-            for idx in row_idxes_to_solve:
-                boxes_of.append(self.structure.get_boxid_by_idx(idx))
-
-            if len(set(boxes_of)) == 1:
-                box = boxes_of[0]
-                # print(' - box : ', box)
-                for idx in idxes_need_to_solve:
-                    if self.structure.get_boxid_by_idx(idx) == box and idx not in row: tmp_scanned_data[idx] = ''
-        
-        # Col
-        # print('Col : ')
-        for coli in range(self.meta_size**2):
-            col = [coli + row * self.meta_size**2 for row in range(self.meta_size**2)]
-            if element in [tmp_scanned_data[idx] for idx in col]:
-                continue
-            col_idxes_to_solve = list(set(col) & set(idxes_need_to_solve))
-            
-            boxes_of = []
-            for idx in col_idxes_to_solve:
-                boxes_of.append(self.structure.get_boxid_by_idx(idx))
-
-            if len(set(boxes_of)) == 1:
-                box = boxes_of[0]
-                # print(' - box : ', box)
-                for idx in idxes_need_to_solve:
-                    if self.structure.get_boxid_by_idx(idx) == box and idx not in col: tmp_scanned_data[idx] = ''
-        
-        if save_scanned_data:
-            self.tmp_scanned_data[element] = tmp_scanned_data
-        return self.check_scanned_drop(element, data=tmp_scanned_data, save_scanned_data=save_scanned_data, save_ready=save_ready)
+        for boxid, box in enumerate(self.boxes):
+            if self.placed_units[2 * size + boxid] & bit: continue
+            idxes = [idx for idx in box if candidates[idx] & bit]
+            if not idxes: continue
+            rows_of = set(self.cell_rows[idx] for idx in idxes)
+            if len(rows_of) == 1:
+                for idx in self.rows[rows_of.pop()]:
+                    if self.cell_boxes[idx] != boxid: candidates[idx] &= ~bit
+            cols_of = set(self.cell_cols[idx] for idx in idxes)
+            if len(cols_of) == 1:
+                for idx in self.cols[cols_of.pop()]:
+                    if self.cell_boxes[idx] != boxid: candidates[idx] &= ~bit
+
+        # Row & Col
+        for units, offset, cell_units in ((self.rows, 0, self.cell_rows), (self.cols, size, self.cell_cols)):
+            for unit_id, unit in enumerate(units):
+                if self.placed_units[offset + unit_id] & bit: continue
+                boxes_of = set(self.cell_boxes[idx] for idx in unit if candidates[idx] & bit)
+                if len(boxes_of) == 1:
+                    for idx in self.boxes[boxes_of.pop()]:
+                        if cell_units[idx] != unit_id: candidates[idx] &= ~bit
+
+        return self.check_singles(element, candidates, save_ready=save_ready)
+
+    def drop_by_groups(self, element, candidates, units, cell_lines, lines, max_num=None):
+        '''Group the units by the set of lines where the element can be placed.
+        If n units share the same n lines, then the element can be dropped from those lines outside the units.
+
+        Input:
+        - element
+        - candidates: the candidate masks to drop from
+        - units: the units to be grouped (boxes / rows / cols)
+        - cell_lines: the line id of every idx
+        - lines: the lines crossing the units
+        - max_num: the max size of the group, if None(default), then no limit
+        '''
+        bit = self.element_bits[element]
+        groups = {}
+        for unit_id, unit in enumerate(units):
+            line_mask = 0
+            for idx in unit:
+                if candidates[idx] & bit: line_mask |= 1 << cell_lines[idx]
+            num = popcount(line_mask)
+            if num < 2 or (max_num and num > max_num): continue
+            groups.setdefault(line_mask, []).append(unit_id)
+        for line_mask, unit_ids in groups.items():
+            if len(unit_ids) < popcount(line_mask): continue
+            in_units = set()
+            for unit_id in unit_ids:
+                in_units.update(units[unit_id])
+            for line_id, line in enumerate(lines):
+                if line_mask >> line_id & 1:
+                    for idx in line:
+                        if idx not in in_units: candidates[idx] &= ~bit
 
     def check_group_drop(self, element, fresh=False, save_scanned_data=False, save_ready=True):
         '''Check whether the element can be scanned in group form and dropped
 
         Input:
         - element
-        - fresh(Boolean)
-        - save_scanned_data(Boolean)
+        - fresh(Boolean): kept for compatibility.
+        - save_scanned_data(Boolean): if True, then the drops are saved into self.candidates.
 
         Output:
         - flg_change
-        TODO: SOLVED, Group dropped part. test_demo[7:10]
-        BUG: SOLVED, THE SAME AS AREA SCAN PART, STILL not fixed!!!
         '''
-        if self.check_scanned_drop(element, save_scanned_data=False, save_ready=False): 
-            # print('Before grouped drop, scanned drop can also make some changes.')
-            pass
-            # self.update()
-            # return self.check_group_drop(element)
-            # return True # FIXME: SOLVED, no need to first update the data, just do the rest part.
-        tmp_scanned_data = list(self.tmp_scanned_data[element]) if not fresh else list(self.data)
-        # FIXME:  SOLVED, group scanned part
-        idxes_need_to_solve = [idx for idx, i in enumerate(tmp_scanned_data) if i == '.']
-        # print(idxes_need_to_solve)
-        boxes = self.structure.box_idx_list
-        box_rows = {boxid : None for boxid in range(len(boxes))} # {boxid: rows in this box}
-        box_cols = {boxid : None for boxid in range(len(boxes))}
-        for boxid in range(len(boxes)):
-            box_idxes_to_solve = list(set(boxes[boxid]) & set(idxes_need_to_solve))
-
-            box_rows[boxid] = set([int(idx / (self.meta_size**2)) for idx in box_idxes_to_solve])
-            box_cols[boxid] = set([idx % (self.meta_size**2) for idx in box_idxes_to_solve])
-        # print('box_rows', box_rows)
-        # print('box_cols', box_cols)
-        max_row_len = max([len(s) for s in box_rows.values()])
-        max_col_len = max([len(c) for c in box_cols.values()])
-
+        candidates = self.candidates if save_scanned_data else list(self.candidates)
         # Row group
-        for iter_num in range(2, max_row_len + 1): # FIXME: SOLVED, REWIRTE THIS PART, MAKE SURE THAT THE GROUP PART DO NOT BE DELETED 
-            combines_key = list(combinations(box_rows, iter_num))
-            # print('combines:')
-            for combine_key in combines_key:
-                # print('combine:', combine_key)
-                if all(list(map(lambda x: box_rows[x] == box_rows[combine_key[0]], combine_key))) and len(box_rows[combine_key[0]]) == iter_num:
-                    # print('Found the group drop part in box ', combine_key, ' is ', box_rows[combine_key[0]], ' rows.')
-                    # print(self.display(self.tmp_scanned_data[element]))
-                    rows = box_rows[combine_key[0]]
-                    for idx in idxes_need_to_solve:
-                        if int(idx / (self.meta_size**2)) in rows and idx not in sum([boxes[boxid] for boxid in combine_key], []):
-                            # print('dropped', idx)
-                            tmp_scanned_data[idx] = ''
-        
+        self.drop_by_groups(element, candidates, self.boxes, self.cell_rows, self.rows)
         # Col group
-        for iter_num in range(2, max_col_len + 1):
-            combines_key = list(combinations(box_cols, iter_num))
-            # print('combines:')
-            for combine_key in combines_key:
-                # print('combine_key:', combine_key)
-                if all(list(map(lambda x: box_cols[x] == box_cols[combine_key[0]], combine_key))) and len(box_cols[combine_key[0]]) == iter_num:
-                    # print('Found the group drop part in box ', combine_key, ' is', box_cols[combine_key[0]], ' cols.')
-                    cols = box_cols[combine_key[0]]
-                    for idx in idxes_need_to_solve:
-                        if idx % (self.meta_size**2) in cols and idx not in sum([boxes[boxid] for boxid in combine_key], []):
-                            # print('dropped', idx)
-                            tmp_scanned_data[idx] = '' # TODO: SOLVED, make every solver save their tmp_scanned_data
-        
-        # print(self.display(tmp_scanned_data))
-        if save_scanned_data:
-            self.tmp_scanned_data[element] = tmp_scanned_data
-        return self.check_scanned_drop(element, data=tmp_scanned_data, save_scanned_data=save_scanned_data, save_ready=save_ready)
+        self.drop_by_groups(element, candidates, self.boxes, self.cell_cols, self.cols)
+        return self.check_singles(element, candidates, save_ready=save_ready)
 
     def check_square_drop(self, element, fresh=False, save_scanned_data=False, save_ready=True):
         '''Check whether the element can be scanned in square form and dropped
 
         Input:
         - element
-        - fresh(Boolean)
-        - save_scanned_data(Boolean)
+        - fresh(Boolean): kept for compatibility.
+        - save_scanned_data(Boolean): if True, then the drops are saved into self.candidates.
 
         Output:
         - flg_change
+        '''
+        candidates = self.candidates if save_scanned_data else list(self.candidates)
+        # Row square
+        self.drop_by_groups(element, candidates, self.rows, self.cell_cols, self.cols, max_num=self.meta_size - 1)
+        # Col square
+        self.drop_by_groups(element, candidates, self.cols, self.cell_rows, self.rows, max_num=self.meta_size - 1)
+        return self.check_singles(element, candidates, save_ready=save_ready)
+
+    def drop_by_subsets(self, candidates):
+        '''Drop the candidates by the naked and hidden subsets of every unit, up to quads.
+        - naked: n blanks of a unit with only n candidates together, then the n candidates are dropped from the other blanks;
+        - hidden: n candidates of a unit with only n places together, then the other candidates are dropped from the n blanks.
+        A naked subset of n blanks among m is a hidden subset of the other m - n blanks, so n <= m / 2 is enough for both.
+        The hidden subsets are only for the units holding every element, not for the cages.
+        '''
+        for unit_id, unit in enumerate(self.units):
+            blanks = [idx for idx in unit if candidates[idx]]
+            max_size = min(4, int(len(blanks) / 2))
+            if max_size < 2: continue
+            # Naked
+            items = [(idx, candidates[idx]) for idx in blanks if popcount(candidates[idx]) <= max_size]
+            for idxes, union in covered_subsets(items, max_size):
+                for idx in blanks:
+                    if idx not in idxes: candidates[idx] &= ~union
+            if unit_id >= self.units_num_full: continue
+            # Hidden
+            places = {}
+            for j, idx in enumerate(blanks):
+                mask = candidates[idx]
+                while mask:
+                    bit = mask & -mask
+                    places[bit] = places.get(bit, 0) | 1 << j
+                    mask ^= bit
+            items = sorted((bit, mask) for bit, mask in places.items() if popcount(mask) <= max_size)
+            for bits, union in covered_subsets(items, max_size):
+                mask = sum(bits)
+                for j, idx in enumerate(blanks):
+                    if union >> j & 1: candidates[idx] &= mask
+
+    def check_subset_drop(self, element, fresh=False, save_scanned_data=False, save_ready=True):
+        '''Check whether the element can be dropped by the naked / hidden subsets
+
+        The subsets drop every element at once, so the drops are computed once and cached until the next placement.
 
-        TODO: SOLVED, Square dropped part. test_demo[11]
+        Input:
+        - element
+        - fresh(Boolean): kept for compatibility.
+        - save_scanned_data(Boolean): if True, then the drops are saved into self.candidates.
+
+        Output:
+        - flg_change
+        '''
+        cache = self.subset_cache
+        if cache is None or cache[0] != self.changes:
+            candidates = list(self.candidates)
+            self.drop_by_subsets(candidates)
+            self.subset_cache = cache = (self.changes, candidates)
+        if save_scanned_data:
+            for idx, mask in enumerate(cache[1]):
+                self.candidates[idx] &= mask
+            return self.check_singles(element, self.candidates, save_ready=save_ready)
+        return self.check_singles(element, cache[1], save_ready=save_ready)
+
+    def drop_by_fish(self, element, candidates, lines, cell_lines, cell_cross, crosses):
+        '''Drop the element by the fish of the lines: if n lines have the element in n crossing lines only,
+        then the element can be dropped from those crossing lines outside the n lines.
+        A fish of n lines among m is a fish of the other direction with m - n lines, so n <= m / 2 is enough.
         '''
-        if self.check_scanned_drop(element, save_scanned_data=False, save_ready=False): 
-            # print('Before square drop, scanned drop can also make some changes.')
-            pass
-            # self.update()
-            # return self.check_group_drop(element)
-            # return True # FIXME: SOLVED, no need to first update the data, just do the rest part. test_demo[11]
-        tmp_scanned_data = list(self.tmp_scanned_data[element]) if not fresh else list(self.data)
-        # FIXME:  SOLVED, group scanned part
-        idxes_need_to_solve = [idx for idx, i in enumerate(tmp_scanned_data) if i == '.']
-        # print(idxes_need_to_solve)
-        rows_of = {boxid : None for boxid in range(self.meta_size**2)}
-        cols_of = {boxid : None for boxid in range(self.meta_size**2)}
-        for row_id in range(self.meta_size**2):
-            row_idxes_to_solve = list(set(range(row_id * self.meta_size**2, (row_id + 1) * self.meta_size**2)) & set(idxes_need_to_solve))
-            rows_of[row_id] = set([idx % (self.meta_size**2) for idx in row_idxes_to_solve])
-        for col_id in range(self.meta_size**2):
-            col_idxes_to_solve = list(set([col_id + row * self.meta_size**2 for row in range(self.meta_size**2)]) & set(idxes_need_to_solve))
-            cols_of[col_id] = set([int(idx / (self.meta_size**2)) for idx in col_idxes_to_solve])
+        bit = self.element_bits[element]
+        items = []
+        for line_id, line in enumerate(lines):
+            cross_mask = 0
+            for idx in line:
+                if candidates[idx] & bit: cross_mask |= 1 << cell_cross[idx]
+            if cross_mask: items.append((line_id, cross_mask))
+        max_size = min(4, int(len(items) / 2))
+        if max_size < 2: return
+        items = [item for item in items if popcount(item[1]) <= max_size]
+        for line_ids, union in covered_subsets(items, max_size):
+            line_mask = sum(1 << line_id for line_id in line_ids)
+            for cross_id, cross in enumerate(crosses):
+                if union >> cross_id & 1:
+                    for idx in cross:
+                        if not line_mask >> cell_lines[idx] & 1: candidates[idx] &= ~bit
+
+    def check_fish_drop(self, element, fresh=False, save_scanned_data=False, save_ready=True):
+        '''Check whether the element can be dropped by the X-Wing / Swordfish / Jellyfish of rows and columns
 
-        # Row group
-        for iter_num in range(2, self.meta_size):
-            combines_key = list(combinations(rows_of, iter_num))
-            # print('combines:')
-            for combine_key in combines_key:
-                # print('combine_key :', combine_key)
-                if all(list(map(lambda x: rows_of[x] == rows_of[combine_key[0]], combine_key))) and len(rows_of[combine_key[0]]) == iter_num:
-                    # print('Found the square drop part in the row ', combine_key, ' is ', rows_of[combine_key[0]], ' cols.')
-                    cols = rows_of[combine_key[0]]
-                    # print('cols : ', cols)
-                    for idx in idxes_need_to_solve:
-                        if idx % (self.meta_size**2) in cols and idx not in sum([list(range(row_id * (self.meta_size**2), (row_id + 1) * (self.meta_size**2))) for row_id in combine_key], []):
-                            # print('dropped', idx)
-                            tmp_scanned_data[idx] = ''
-        
-        # Col group
-        for iter_num in range(2, self.meta_size):
-            combines_key = list(combinations(cols_of, iter_num))
-            # print('combines:')
-            for combine_key in combines_key:
-                # print('combine:', combine)
-                if all(list(map(lambda x: cols_of[x] == cols_of[combine_key[0]], combine_key))) and len(cols_of[combine_key[0]]) == iter_num:
-                    # print('Found the square drop part in the col ', combine_key, ' is ', cols_of[combine_key[0]], ' rows.')
-                    rows = cols_of[combine_key[0]]
-                    for idx in idxes_need_to_solve:
-                        if int(idx / (self.meta_size**2)) in rows and idx not in sum([[col_id + row * self.meta_size**2 for row in range(self.meta_size**2)] for col_id in combine_key], []):
-                            # print('dropped', idx)
-                            tmp_scanned_data[idx] = ''
-        
-        # print(self.display(tmp_scanned_data[element]))
+        Input:
+        - element
+        - fresh(Boolean): kept for compatibility.
+        - save_scanned_data(Boolean): if True, then the drops are saved into self.candidates.
+
+        Output:
+        - flg_change
+        '''
+        candidates = self.candidates if save_scanned_data else list(self.candidates)
+        # Row fish
+        self.drop_by_fish(element, candidates, self.rows, self.cell_rows, self.cell_cols, self.cols)
+        # Col fish
+        self.drop_by_fish(element, candidates, self.cols, self.cell_cols, self.cell_rows, self.rows)
+        return self.check_singles(element, candidates, save_ready=save_ready)
+
+    def drop_by_cages(self, candidates):
+        '''Drop the candidates of every cage by the combinations of the elements not placed in it, see cage_combinations:
+        a combination is kept if every blank of the cage has a candidate in it, the other candidates are dropped.
+        A cage without any combination left is a contradiction.
+        '''
+        for cage_id, (idxes, total) in enumerate(self.cages):
+            blanks = [idx for idx in idxes if self.data[idx] == '.']
+            if not blanks: continue
+            union = 0
+            for idx in blanks:
+                union |= candidates[idx]
+            union &= ~self.placed_units[self.units_num_full + cage_id]
+            keep = 0
+            for combination in cage_combinations(self.element_values, union, len(blanks), total - self.cage_sums[cage_id]):
+                if all(candidates[idx] & combination for idx in blanks): keep |= combination
+            if not keep: self.flg_conflict = True
+            for idx in blanks:
+                candidates[idx] &= keep
+
+    def check_cage_drop(self, element, fresh=False, save_scanned_data=False, save_ready=True):
+        '''Check whether the element can be dropped by the sums of the cages
+
+        The cages drop every element at once, so the drops are computed once and cached until the next placement.
+
+        Input:
+        - element
+        - fresh(Boolean): kept for compatibility.
+        - save_scanned_data(Boolean): if True, then the drops are saved into self.candidates.
+
+        Output:
+        - flg_change
+        '''
+        cache = self.cage_cache
+        if cache is None or cache[0] != self.changes:
+            candidates = list(self.candidates)
+            self.drop_by_cages(candidates)
+            self.cage_cache = cache = (self.changes, candidates)
         if save_scanned_data:
-            self.tmp_scanned_data[element] = tmp_scanned_data
-        return self.check_scanned_drop(element, data=tmp_scanned_data, save_scanned_data=save_scanned_data, save_ready=save_ready)
-    
+            for idx, mask in enumerate(cache[1]):
+                self.candidates[idx] &= mask
+            return self.check_singles(element, self.candidates, save_ready=save_ready)
+        return self.check_singles(element, cache[1], save_ready=save_ready)
+
     def update(self):
         '''Update the self.data into a new state, clear the ready and record the steps.
         Make sure that the length of ready is greater than 0.
@@ -437,60 +827,55 @@ class BasicSolver():
         ready = list(self.ready)
         assert len(ready) > 0, 'Update Error: the length of ready ' + str(len(ready)) + ' is not greater than 0.'
         for t in ready:
-            self.data[t[0]] = t[1]
+            eliminations = self.place(t[0], t[1])
+            if self.sink is not None: self.sink.step(t[0], t[1], t[2], eliminations)
         self.steps.extend(self.ready)
         self.ready = []
+        self.ready_idxes = set()
         return True
-    
-    def step(self, data=None):
+
+    def step(self, data=None, methods=None):
         '''A step of the solution:
-            1. scan every element, checking for all ready to update, save ready(scanned - area - group - square);
+            1. scan every element, checking for all ready to update, save ready(scanned - area - group - square - subset - fish);
             2. update the blanks;
-            
+        The fallback methods only run if the methods before them find nothing in this step.
+        Only the dirty elements of every method are scanned, and the scanned method only re-examines the dirty cells and units,
+        unless a profiler is attached, which needs every technique called per element.
+
         Input:
         - data: if None(default), then use self.data
-        TODO: SOLVED, step part
-        BUG: SOLVED, solve not complete, CHECKED its area scan part BUG, forget to check for element already exists.
-        BUG: SOLVED, scan drop also has a bug
+        - methods: the methods used in this step, if None(default), then all of self.methods
         '''
         if data:
             self.structure.check_data_and_boxes(data=data, processed=True)
-        else:
-            data = self.data
-        re = {method : False for method in self.methods}
-        for method in self.methods:
-            if method == 'scanned':
-                re[method] = self.scan_all(method, fresh=True, save_scanned_data=True, save_ready=True)
+        methods = methods if methods else self.methods
+        re = {method : False for method in methods}
+        for method in methods:
+            if method in self.fallback_methods and any(re.values()): continue
+            mask = self.dirty_elements[method] if method not in ('subset', 'cage') or not self.dirty_elements[method] else None
+            self.dirty_elements[method] = 0
+            if method == 'scanned' and self.profiled_methods is None:
+                re[method] = self.check_dirty_singles()
+            elif method == 'scanned':
+                re[method] = self.scan_all(method, fresh=True, save_scanned_data=True, save_ready=True, mask=mask)
             else:
-                re[method] = self.scan_all(method, fresh=False, save_scanned_data=False, save_ready=True)
-        # print(self.display())
-        # print('re step : ', re)
-        # print('Before - ready: ', {chr(int(int(t[0])/(self.meta_size**2)) + ord('A'))+ str(int(t[0])%(self.meta_size**2) + 1) : t[1] for t in self.ready})
+                re[method] = self.scan_all(method, fresh=False, save_scanned_data=False, save_ready=True, mask=mask)
         if any(list(re.values())):
-            re_step = self.update()
-            # print(self.display())
-            # print('After - ready: ', {chr(int(int(t[0])/(self.meta_size**2)) + ord('A'))+ str(int(t[0])%(self.meta_size**2) + 1) : t[1] for t in self.ready})
-            return re_step
+            return self.update()
         else:
             return False
-        
+
     def check(self, data=None):
         '''Check the selected data for whether it contains some blanks can be updated.
-        
+
         Input:
         - data: if None(default), then use the self.data.
-        TODO: SOLVED, check all part. NEED TO TEST AND RECHECK.
-        FIXME: SOLVED, make every check optional for save_ready.
 
         Output:
         - flg: True if the puzzle can be updated now
         '''
         if data:
             self.structure.check_data_and_boxes(data=data, processed=True)
-        else:
-            data = self.data
-        # for ele in self.element_set:
-        # scan_all(self, method='scanned', fresh=False, save_scanned_data=True)
         re = {method : False for method in self.methods}
         for method in self.methods:
             if method == 'scanned':
@@ -506,17 +891,33 @@ class BasicSolver():
         '''
         if data:
             self.structure.check_data_and_boxes(data=data, processed=True)
-        else:
-            data = self.data
-        return all([item in self.structure.element_set for item in data])
+            return all([item in self.structure.element_set for item in data])
+        return self.blank_count == 0
 
-    def solve(self):
+    def solve(self, display=False, budget=None):
         '''Do the whole process of our basic solver until nothing can be done by basic solver.
 
+        Input:
+        - display(Boolean): if True, then print the display of the result.
+        - budget(Budget): if not None, then stop when it runs out, the reason is saved in self.stop_reason.
+
         Output:
         - step number: how many blank be updated
         '''
-        while not self.done_check() and self.step():
-            continue
-        print(self.display())
-        return len(self.steps)
\ No newline at end of file
+        self.stop_reason = None
+        while not self.done_check() and not self.flg_conflict:
+            if budget is not None:
+                self.stop_reason = budget.exceeded(self.placements)
+                if self.stop_reason: break
+            if not self.step(): break
+        if display:
+            print(self.display())
+        return len(self.steps)
+
+    def result(self, seconds=0.0):
+        '''Collect the current state into a SolveResult, the technique counts are the ones of the steps.'''
+        technique_counts = {method: 0 for method in self.methods}
+        for step in self.steps:
+            technique_counts[step[2]] = technique_counts.get(step[2], 0) + 1
+        return SolveResult(list(self.data), self.done_check() and not self.flg_conflict, list(self.steps), \
+            technique_counts, seconds, reason=self.stop_reason)
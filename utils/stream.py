@@ -0,0 +1,215 @@
+# coding:utf-8
+# python3.6
+
+'''Streaming puzzle reader / writer.
+
+Formats:
+- 'comma': the format of Structure, elements split by ',' and '.' for blank, one puzzle per line.
+- 'dotted': one char per cell, '.' or '0' for blank, one puzzle per line, only for the grids up to 9x9.
+- 'binary': a header and fixed-width records, 4 bits per cell for the grids up to 9x9 and 8 bits per cell for the bigger ones.
+    header: b'SDKB' + meta_size(uint8) + bits(uint8) + record_size(uint16, little endian)
+
+The raw puzzle is a bytearray with one value per cell, 0 for blank and i for the element str(i).
+'''
+
+# Our libraries:
+from .structure import *
+
+# Externel environment
+import mmap
+import struct
+
+BINARY_MAGIC = b'SDKB'
+BINARY_HEADER = struct.Struct('<4sBBH')
+
+SYMBOLS = ['.'] + [str(i) for i in range(1, 256)]
+VALUES = {symbol: i for i, symbol in enumerate(SYMBOLS)}
+VALUES['0'] = 0
+
+DOTTED_TABLE = bytes(VALUES.get(chr(i), 255) for i in range(256))
+DOTTED_SYMBOLS = b'.123456789'
+HIGH_TABLE = bytes(i >> 4 for i in range(256))
+LOW_TABLE = bytes(i & 15 for i in range(256))
+
+def get_meta_size(cells_num):
+    return int(round(cells_num**(1/4)))
+
+def parse_comma_line(line):
+    '''Parse a line in the comma format into a raw puzzle.'''
+    return bytearray(VALUES[i] for i in line.replace(' ', '').strip().split(','))
+
+def parse_dotted_line(line):
+    '''Parse a line in the dotted format into a raw puzzle.'''
+    raw = bytearray(line.strip().encode('ascii').translate(DOTTED_TABLE))
+    assert 255 not in raw, 'The input line has some invalid element: ' + line.strip()
+    return raw
+
+def format_comma_line(raw):
+    return ','.join([SYMBOLS[i] for i in raw])
+
+def format_dotted_line(raw):
+    return bytes(raw).translate(DOTTED_SYMBOLS + bytes(246)).decode('ascii')
+
+def raw_to_structure(raw):
+    '''Build the Structure of a raw puzzle with the default elements, the raw values are the element ids of the cells.'''
+    return Structure(raw, meta_size=get_meta_size(len(raw)))
+
+def structure_to_raw(problem_structure):
+    if problem_structure.symbols == tuple(SYMBOLS[:len(problem_structure.symbols)]):
+        return bytearray(problem_structure.cells)
+    return bytearray(VALUES[i] for i in problem_structure.data)
+
+def get_bits(meta_size):
+    return 4 if meta_size**2 < 16 else 8
+
+def get_record_size(meta_size):
+    return (meta_size**4 * get_bits(meta_size) + 7) // 8
+
+def pack_raw(raw, meta_size):
+    '''Pack a raw puzzle into a binary record.'''
+    if get_bits(meta_size) == 8: return bytes(raw)
+    padded = raw + bytearray(len(raw) % 2)
+    return bytes(high << 4 | low for high, low in zip(padded[0::2], padded[1::2]))
+
+def unpack_record(record, meta_size):
+    '''Unpack a binary record into a raw puzzle.'''
+    if get_bits(meta_size) == 8: return bytearray(record)
+    raw = bytearray(len(record) * 2)
+    raw[0::2] = record.translate(HIGH_TABLE)
+    raw[1::2] = record.translate(LOW_TABLE)
+    del raw[meta_size**4:]
+    return raw
+
+def detect_format(line):
+    '''Detect the text format of a line: 'comma' or 'dotted'.'''
+    return 'comma' if ',' in line else 'dotted'
+
+def read_puzzles(source, fmt=None, raw=False):
+    '''Read the puzzles lazily.
+
+    Input:
+    - source(str / file): the path or the opened text file, the binary format is only read from a path (through mmap)
+    - fmt(str): 'comma' / 'dotted' / 'binary', if None(default), then detected from the content
+    - raw(Boolean): if True, then yield the raw puzzles and skip Structure; else, then yield the Structures
+
+    Output:
+    - generator of Structure / bytearray, blank lines are skipped
+    '''
+    if fmt == 'binary' or (fmt is None and isinstance(source, str) and is_binary_file(source)):
+        with BinaryPuzzleFile(source) as puzzles:
+            for puzzle in puzzles:
+                yield puzzle if raw else raw_to_structure(puzzle)
+        return
+    fin = open(source, 'r') if isinstance(source, str) else source
+    try:
+        for line in fin:
+            if not line.strip(): continue
+            line_fmt = fmt if fmt else detect_format(line)
+            if line_fmt == 'comma':
+                yield parse_comma_line(line) if raw else Structure(line)
+            else:
+                puzzle = parse_dotted_line(line)
+                yield puzzle if raw else raw_to_structure(puzzle)
+    finally:
+        if isinstance(source, str): fin.close()
+
+def is_binary_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+class PuzzleWriter():
+    '''The writer of the puzzles in one of the formats.
+
+    Elements:
+    - fout: the opened file
+    - fmt(str): 'comma' / 'dotted' / 'binary'
+    - meta_size(int): the meta_size of every puzzle, written in the header of the binary format
+
+    Functions:
+    - write: Write a Structure / raw puzzle / data list
+    '''
+    def __init__(self, target, fmt='comma', meta_size=3):
+        assert fmt in ('comma', 'dotted', 'binary'), 'Format error: ' + str(fmt) + ' is not comma / dotted / binary.'
+        assert fmt != 'dotted' or meta_size <= 3, 'Format error: the dotted format is only for the grids up to 9x9.'
+        self.fmt = fmt
+        self.meta_size = meta_size
+        self.flg_opened = isinstance(target, str)
+        self.fout = open(target, 'wb' if fmt == 'binary' else 'w') if self.flg_opened else target
+        if fmt == 'binary':
+            self.fout.write(BINARY_HEADER.pack(BINARY_MAGIC, meta_size, get_bits(meta_size), get_record_size(meta_size)))
+
+    def write(self, puzzle):
+        raw = structure_to_raw(puzzle) if isinstance(puzzle, Structure) else \
+            puzzle if isinstance(puzzle, (bytes, bytearray)) else bytearray(VALUES[i] for i in puzzle)
+        assert len(raw) == self.meta_size**4, \
+            'Length error: The puzzle\'s length ' + str(len(raw)) + ' does not equal to ' + str(self.meta_size**4) + '.'
+        if self.fmt == 'binary':
+            self.fout.write(pack_raw(raw, self.meta_size))
+        elif self.fmt == 'dotted':
+            self.fout.write(format_dotted_line(raw) + '\n')
+        else:
+            self.fout.write(format_comma_line(raw) + '\n')
+
+    def close(self):
+        if self.flg_opened: self.fout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def write_puzzles(target, puzzles, fmt='comma', meta_size=3):
+    '''Write the puzzles into the target in the format, return the number of puzzles written.'''
+    num = 0
+    with PuzzleWriter(target, fmt=fmt, meta_size=meta_size) as writer:
+        for puzzle in puzzles:
+            writer.write(puzzle)
+            num += 1
+    return num
+
+class BinaryPuzzleFile():
+    '''The puzzle file in the binary format, read through mmap.
+    The puzzle i is at a fixed offset, so it can be read without parsing the puzzles before it.
+
+    Elements:
+    - meta_size(int)
+    - record_size(int): the bytes of every puzzle
+
+    Functions:
+    - record: the packed bytes of the puzzle i
+    - [i]: the raw puzzle i
+    '''
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.meta_size, bits, self.record_size = BINARY_HEADER.unpack_from(self.mmap, 0)
+        assert magic == BINARY_MAGIC, 'Format error: ' + path + ' is not a binary puzzle file.'
+        assert bits == get_bits(self.meta_size) and self.record_size == get_record_size(self.meta_size), \
+            'Format error: the header of ' + path + ' is broken.'
+
+    def __len__(self):
+        return (len(self.mmap) - BINARY_HEADER.size) // self.record_size
+
+    def record(self, i):
+        start = BINARY_HEADER.size + i * self.record_size
+        return self.mmap[start:start + self.record_size]
+
+    def __getitem__(self, i):
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self): raise IndexError('puzzle index out of range')
+        return unpack_record(self.record(i), self.meta_size)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield unpack_record(self.record(i), self.meta_size)
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,42 +1,361 @@
 # coding:utf-8
 # python3.6
 
+# Externel environment
+from collections import OrderedDict
+
+class Geometry():
+    '''The immutable lookup tables of a sudoku layout, built once and shared by all structures and solvers of the same layout.
+    Use get_geometry() instead of building it directly, so that the tables are cached by the layout.
+
+    Every constraint is compiled into one index of units: the rows, the columns, the boxes, the extra units and the cages,
+    all of them all-different. The first units_num_full units hold every element, a cage may hold fewer cells.
+
+    Elements:
+    - meta_size(int)
+    - size(int): the length of a row / column / box, meta_size**2
+    - rows / cols / boxes(tuple(tuple)): unit id -> the indexes in the unit
+    - cell_rows / cell_cols / cell_boxes(tuple(int)): idx -> the unit id of the row / column / box
+    - extras(tuple(tuple)): the extra units of size indexes, e.g. the diagonals, see diagonal_units
+    - cages(tuple): ((indexes, total), ...), the killer cages: the elements of a cage are all different and sum up to the total
+    - units(tuple(tuple)): the index of every unit, rows + cols + boxes + extras + the indexes of the cages,
+        the unit id of row r / column c / box b / extra e / cage k is r / size + c / 2 * size + b / 3 * size + e / units_num_full + k
+    - units_num_full(int): the number of units holding every element
+    - cell_units(tuple(tuple)): idx -> the unit ids of the units holding idx, the row / column / box first
+    - cell_cages(tuple(int)): idx -> the cage id of idx, -1 if it is not in a cage
+    - peers(tuple(tuple)): idx -> the indexes sharing a unit with idx
+    - flg_regular(Boolean): True if the boxes are the regular meta_size x meta_size ones
+    '''
+    __slots__ = ('meta_size', 'size', 'rows', 'cols', 'boxes', 'flg_regular', 'cell_rows', 'cell_cols', 'cell_boxes', \
+                 'extras', 'cages', 'units', 'units_num_full', 'cell_units', 'cell_cages', 'peers')
+
+    def __init__(self, meta_size, box_idx_list=None, units=None, cages=None):
+        size = meta_size**2
+        self.meta_size = meta_size
+        self.size = size
+        self.rows = tuple(tuple(range(row * size, (row + 1) * size)) for row in range(size))
+        self.cols = tuple(tuple(range(col, size**2, size)) for col in range(size))
+        regular_boxes = tuple(tuple(i + int(k/meta_size) * meta_size**3 + (k%meta_size) * meta_size + size * j \
+            for i in range(meta_size) for j in range(meta_size)) for k in range(size))
+        self.boxes = tuple(tuple(box) for box in box_idx_list) if box_idx_list else regular_boxes
+        self.flg_regular = self.boxes == regular_boxes
+        assert sorted(sum(self.boxes, ())) == list(range(size**2)), \
+            'The input box_idx_list ' + str(box_idx_list) + ' cannot be combined into the range(' + str(size**2) + ').'
+        self.cell_rows = tuple(int(idx / size) for idx in range(size**2))
+        self.cell_cols = tuple(idx % size for idx in range(size**2))
+        cell_boxes = [0] * size**2
+        for boxid, box in enumerate(self.boxes):
+            for idx in box:
+                cell_boxes[idx] = boxid
+        self.cell_boxes = tuple(cell_boxes)
+
+        # Extra units and cages
+        self.extras = tuple(tuple(unit) for unit in units) if units else ()
+        for unit in self.extras:
+            assert len(set(unit)) == size and all(0 <= idx < size**2 for idx in unit), \
+                'The input unit ' + str(unit) + ' does not hold ' + str(size) + ' different indexes of the grid.'
+        self.cages = tuple((tuple(idxes), total) for idxes, total in cages) if cages else ()
+        cell_cages = [-1] * size**2
+        for cageid, (idxes, total) in enumerate(self.cages):
+            assert 0 < len(set(idxes)) == len(idxes) <= size, 'The input cage ' + str(idxes) + ' is empty or too large.'
+            for idx in idxes:
+                assert cell_cages[idx] < 0, 'The idx ' + str(idx) + ' is in two cages.'
+                cell_cages[idx] = cageid
+        self.cell_cages = tuple(cell_cages)
+
+        # The unit index
+        self.units = self.rows + self.cols + self.boxes + self.extras + tuple(idxes for idxes, total in self.cages)
+        self.units_num_full = 3 * size + len(self.extras)
+        cell_units = [[self.cell_rows[idx], size + self.cell_cols[idx], 2 * size + self.cell_boxes[idx]] for idx in range(size**2)]
+        for unit_id in range(3 * size, len(self.units)):
+            for idx in self.units[unit_id]:
+                cell_units[idx].append(unit_id)
+        self.cell_units = tuple(tuple(unit_ids) for unit_ids in cell_units)
+        self.peers = tuple(tuple(sorted(set(i for unit_id in self.cell_units[idx] for i in self.units[unit_id]) - {idx})) \
+            for idx in range(size**2))
+
+# The caches of the layouts are LRU bounded: every jigsaw or killer puzzle has its own layout,
+# so a stream of them would keep one geometry, display template and exact cover matrix per puzzle otherwise
+LAYOUT_CACHE_SIZE = 64
+
+def cache_get(cache, key):
+    '''Get the value of the LRU cache (OrderedDict) and mark it the most recently used, None if it is not cached.'''
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+def cache_put(cache, key, value, max_size=LAYOUT_CACHE_SIZE):
+    '''Save the value into the LRU cache (OrderedDict), the least recently used ones beyond max_size are dropped.'''
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_size:
+        cache.popitem(last=False)
+    return value
+
+geometry_cache = OrderedDict()
+
+def get_geometry(meta_size, box_idx_list=None, units=None, cages=None):
+    '''Get the cached geometry of the layout, build it at the first time.
+    Only the last LAYOUT_CACHE_SIZE layouts used are kept, see cache_get.
+
+    Input:
+    - meta_size(int)
+    - box_idx_list(list(list)): if None(default), then the regular boxes.
+    - units(list(list)): the extra units, if None(default), then no extra unit.
+    - cages(list): [(indexes, total), ...], the killer cages, if None(default), then no cage.
+
+    Output:
+    - geometry(Geometry)
+    '''
+    key = (meta_size, tuple(tuple(box) for box in box_idx_list) if box_idx_list else None, \
+           tuple(tuple(unit) for unit in units) if units else None, \
+           tuple((tuple(idxes), total) for idxes, total in cages) if cages else None)
+    geometry = cache_get(geometry_cache, key)
+    if geometry is None:
+        geometry = cache_put(geometry_cache, key, Geometry(meta_size, box_idx_list, units, cages))
+    return geometry
+
+def diagonal_units(meta_size=3):
+    '''The two diagonals of the grid, the extra units of the diagonal sudoku (sudoku X).'''
+    size = meta_size**2
+    return [[i * size + i for i in range(size)], [i * size + size - 1 - i for i in range(size)]]
+
+elements_cache = {}
+
+def get_elements(element_set=None, meta_size=3):
+    '''Get the cached tables of the element set, shared by all structures with the same elements.
+
+    Input:
+    - element_set(set): if None(default), then {'1', ..., str(meta_size**2)}
+
+    Output:
+    - (elements, element_set, element_ids, symbols):
+        elements(tuple): the elements sorted by (len, str)
+        element_set(frozenset)
+        element_ids(dict): {element: i + 1} for elements[i], and {'.': 0}
+        symbols(tuple): ('.',) + elements, symbols[element_id] is the element
+    '''
+    key = frozenset(element_set) if element_set else meta_size
+    tables = elements_cache.get(key)
+    if tables is None:
+        element_set = frozenset(element_set) if element_set else frozenset(str(i + 1) for i in range(meta_size**2))
+        elements = tuple(sorted(element_set, key=lambda ele: (len(ele), ele)))
+        assert len(elements) < 256, 'Element error: ' + str(len(elements)) + ' elements cannot be stored in bytes.'
+        element_ids = {ele: i + 1 for i, ele in enumerate(elements)}
+        element_ids['.'] = 0
+        tables = elements_cache[key] = (elements, element_set, element_ids, ('.',) + elements)
+    return tables
+
+def find_conflict(cells, geometry, elements):
+    '''Find the first contradiction of the givens in one sweep of the unit masks, without building a solver.
+
+    Input:
+    - cells(bytearray): the element ids of Structure.cells
+    - geometry(Geometry)
+    - elements(tuple): the elements of the ids, the values of the cages
+
+    Output:
+    - None if there is no contradiction, else (reason, idx):
+        ('duplicate', idx): the element of idx is already given in a unit of idx
+        ('no_candidate', idx): the blank idx has no candidate left
+        ('cage', idx): the givens of the cage of idx sum up beyond its total, or fill it without the total,
+            idx is the first index of the cage
+    '''
+    cell_units = geometry.cell_units
+    placed = [0] * len(geometry.units)
+    # Bit i for the element id i, the bit 0 of the blank is never set
+    for idx, i in enumerate(cells):
+        if i:
+            bit = 1 << i
+            unit_ids = cell_units[idx]
+            for unit_id in unit_ids:
+                if placed[unit_id] & bit: return ('duplicate', idx)
+            for unit_id in unit_ids:
+                placed[unit_id] |= bit
+    full_mask = (1 << (len(elements) + 1)) - 2
+    for idx, i in enumerate(cells):
+        if not i:
+            mask = 0
+            for unit_id in cell_units[idx]:
+                mask |= placed[unit_id]
+            if mask == full_mask: return ('no_candidate', idx)
+    for idxes, total in geometry.cages:
+        values = [int(elements[cells[idx] - 1]) for idx in idxes if cells[idx]]
+        if sum(values) > total or (len(values) == len(idxes) and sum(values) != total): return ('cage', idxes[0])
+    return None
+
+def validate_many(puzzles, meta_size=None, box_idx_list=None, element_set=None):
+    '''Validate the puzzles at ingest, before any solver is built:
+    the format checked by Structure and the contradictions found by find_conflict.
+
+    Input:
+    - puzzles(iterable): every puzzle is a Structure, or the data of Structure built with the other arguments
+
+    Output:
+    - generator of (i, error): error(str) is None if the i-th puzzle is valid
+    '''
+    for i, puzzle in enumerate(puzzles):
+        try:
+            problem_structure = puzzle if isinstance(puzzle, Structure) else \
+                Structure(puzzle, meta_size=meta_size, box_idx_list=box_idx_list, element_set=element_set)
+        except (AssertionError, KeyError) as e:
+            yield i, str(e)
+            continue
+        conflict = problem_structure.find_conflict()
+        yield i, problem_structure.conflict_message(conflict) if conflict else None
+
+display_templates = OrderedDict()
+
+def get_display_template(geometry, width=1, flg_plain=False):
+    '''Get the cached template of the display: a format string with one '%s' slot per cell, in the order of the cells.
+
+    Input:
+    - geometry(Geometry)
+    - width(int): the width of a cell, the longest element
+    - flg_plain(Boolean): if True, then the plain style of the regular grids up to 9x9 with 1-char elements,
+                        else the formatted style drawing the borders of any box layout
+
+    Output:
+    - template(str)
+    '''
+    key = (geometry, width, flg_plain)
+    template = cache_get(display_templates, key)
+    if template is None:
+        template = cache_put(display_templates, key, build_display_template(geometry, width, flg_plain))
+    return template
+
+def build_display_template(geometry, width=1, flg_plain=False):
+    '''Draw the skeleton of the display with the cells left as slots, and compile it into the template of get_display_template.'''
+    meta_size = geometry.meta_size
+    size, cells_num = meta_size**2, meta_size**4
+    line_size = (meta_size * 2) * meta_size + 2 # the chars of a line, the '\n' included
+    display = ''
+    for idx in range(cells_num):
+        if idx % cells_num == 0:
+            display += ('+' + '-' * (meta_size * 2 - 1)) * meta_size + "+\n|."
+        elif idx % (meta_size**3) == 0:
+            display += "|\n" + ('+' + '-' * (meta_size * 2 - 1)) * meta_size + "+\n|."
+        elif idx % size == 0:
+            display += "|\n" + ('|' + ' ' * (meta_size * 2 - 1)) * meta_size + "|\n|."
+        elif idx % meta_size == 0:
+            display += '|.'
+        else:
+            display += ' .'
+    display = display + "|\n" + ('+' + '-' * (meta_size * 2 - 1)) * meta_size + "+\n"
+    template = list(display)
+    slots = [idx for idx, char in enumerate(template) if char == '.']
+    if not flg_plain:
+        # Formatted display: a slot and a margin take the width of a cell, a junction takes 1 char
+        slot_set = set(slots)
+        for idx, char in enumerate(template):
+            if idx in slot_set:
+                template[idx] = None
+            elif char != '\n':
+                template[idx] = ' '
+        cell_boxes = geometry.cell_boxes
+        # Determine the margins (' ' / '|' / '-')
+        for idx in range(cells_num):
+            # upper
+            flg_border = idx - size < 0 or cell_boxes[idx - size] != cell_boxes[idx]
+            template[slots[idx] - line_size] = '-' * width if flg_border else ' ' * width
+            # lower
+            if idx + size >= cells_num:
+                template[slots[idx] + line_size] = '-' * width
+            # left
+            if idx % size == 0 or cell_boxes[idx - 1] != cell_boxes[idx]:
+                template[slots[idx] - 1] = '|'
+            # right
+            elif idx % size == size - 1:
+                template[slots[idx] + 1] = '|'
+        # Determine the juctions (' ' / '+' / '|' / '-')
+        dash = '-' * width
+        for idx, item in enumerate(template):
+            if item == ' ':
+                flg_horizontal = idx - line_size < 0 or idx + line_size >= len(template) or \
+                    template[idx - 1] == dash or template[idx + 1] == dash
+                flg_vertical = idx % line_size == 0 or idx % line_size == line_size - 2 or \
+                    (idx >= line_size and template[idx - line_size] == '|') or \
+                    (idx < len(template) - line_size and template[idx + line_size] == '|')
+                if flg_vertical and flg_horizontal: template[idx] = '+'
+                elif flg_vertical or flg_horizontal: template[idx] = '|' if flg_vertical else '-'
+    template = [item.replace('%', '%%') if item else '' for item in template]
+    for idx in slots:
+        template[idx] = '%s'
+    return ''.join(template)
+
+def render_many(puzzles, fout, separator='\n'):
+    '''Render the puzzles one by one straight into the file, the template of every layout is built only once.
+
+    Input:
+    - puzzles(iterable): Structure, or (Structure, data) to render the data in the layout of the structure
+    - fout(file): the opened text file
+    - separator(str): written after every display
+
+    Output:
+    - num(int): the number of the puzzles rendered
+    '''
+    num = 0
+    for puzzle in puzzles:
+        problem_structure, data = puzzle if isinstance(puzzle, tuple) else (puzzle, None)
+        fout.write(problem_structure.display(data))
+        fout.write(separator)
+        num += 1
+    return num
+
 class Structure():
     '''The structure of the sudoku.
     
+    The grid is stored as the element ids in a bytearray, the tables of the elements and the geometry are shared,
+    so a structure costs about one byte per cell.
+
     Elements:
+    - cells(bytearray):
+        The element id of every cell, 0 for blank and i + 1 for elements[i].
     - data(list(str)):
-        A list of all elements in this grid.
+        A list of all elements in this grid, decoded from the cells on every access.
         All elements are strings.
         e.g. ['1', '.', '.', '4', '3', '4', '1', '.', '.', '3', '2', '1', '2', '.', '.', '3']
     - meta_size(int): 
         The size of the meta grid's box if this is a regular sudoku.
     - box_idx_list(list(list)):
-        The list containing all lists of indexes in the same box.
+        The list containing all lists of indexes in the same box, built from the geometry on every access.
         The idx of the box in box_idx_list is used as boxid.
-    - element_set(set):
+    - element_set(frozenset):
         The elements we use in puzzle.
+    - elements(tuple):
+        The elements sorted by (len, str).
+    - units / cages(list):
+        The extra units and the killer cages, built from the geometry on every access.
     - flg_regular(Boolean):
         If the sudoku puzzle is the regular one.
         This flag is specially designed to optimize the time complexity of the box parts.
         True - regular one(9x9 sudoku with 3x3 boxes.)
+    - geometry(Geometry):
+        The cached lookup tables shared by all structures with the same meta_size and box layout.
     
     Functions:
     - display:
         Display the current situation of the sudoku.
         Output:
         - display_result(str)
+    - find_conflict:
+        Find the first duplicate given, blank without candidate or cage beyond its total, see find_conflict.
     '''
-    def __init__(self, data, meta_size=None, box_idx_list=None, element_set=None):
+    __slots__ = ('cells', 'meta_size', 'geometry', 'elements', 'element_set', 'symbols', 'flg_regular')
+
+    def __init__(self, data, meta_size=None, box_idx_list=None, element_set=None, units=None, cages=None):
         '''Initialize the sudoku puzzle, we format the puzzle into our structure and check its validity.
         We also create a box_idx_list for representing all boxes.
         
         Input:
-        - data(str):
+        - data(str / list(str)):
             A string short for this sudoku puzzle.
             This string contains all the numbers we already know.
             All elements are split by ','.
             And '.' represents blank.
+            A list of the elements already split is also accepted, it is copied without parsing.
+            A bytes / bytearray of the element ids (see cells) is also accepted, it is copied without decoding.
             e.g. ".,.,.,.,.,.,.,.,.,.,.,6,.,9,3,.,.,.,9,.,.,7,6,.,.,.,4,4,.,.,.,.,6,.,3,.,.,.,.,8,.,.,.,.,2,.,1,.,.,.,.,8,5,.,7,.,.,6,5,.,.,4,.,.,8,4,.,.,.,9,.,.,.,.,3,2,.,.,.,.,."
         - meta_size(int):
             e.g. 3(default)for 9x9; 4 for 16x16; 5 for 25x25
@@ -49,35 +368,86 @@ class Structure():
         - element_set(set):
             e.g. None(default): if meta_size == 3, then {'1', '2', '3', '4', '5', '6', '7', '8', '9'}
 
+        - units(list(list)):
+            The extra units besides the rows, columns and boxes, every unit holds every element once.
+            e.g. None(default): no extra unit; diagonal_units(3) for the diagonal sudoku.
+
+        - cages(list):
+            The killer cages [(indexes, total), ...], the elements of a cage are all different and sum up to the total.
+            The elements must be numbers.
+            e.g. None(default): no cage; [([0, 1], 3), ([2, 11, 20], 15), ...]
+
         # TODO: UNSOLVED, recognize the elements and collect them into a set.
         # TODO: UNSOLVED, restrict the input data: No '.' or '?'.
         '''
-        self.data = data.replace(' ', '').strip('\n').split(',')
-        self.meta_size = meta_size if meta_size else int(len(self.data)**(1/4))
-        self.box_idx_list = box_idx_list if box_idx_list \
-            else [sum([[i + int(k/(self.meta_size)) * self.meta_size**3 + (k%self.meta_size) * self.meta_size + self.meta_size**2 * j \
-                for j in range(self.meta_size)] \
-                for i in range(self.meta_size)], []) \
-                for k in range(self.meta_size**2)]
-        self.element_set = element_set if element_set \
-            else set([str(i + 1) for i in range(self.meta_size**2)])
-        self.flg_regular = True if (not box_idx_list and not element_set) else False
-
-        self.check_data_and_boxes()
+        if isinstance(data, (bytes, bytearray)):
+            cells, data = bytearray(data), None
+        else:
+            data = data.replace(' ', '').strip('\n').split(',') if isinstance(data, str) else list(data)
+        self.meta_size = meta_size if meta_size else int(len(data if data is not None else cells)**(1/4))
+        self.geometry = get_geometry(self.meta_size, box_idx_list, units, cages)
+        self.elements, self.element_set, element_ids, self.symbols = get_elements(element_set, self.meta_size)
+        self.flg_regular = True if (not box_idx_list and not element_set and not units and not cages) else False
+        assert not cages or all(ele.isdigit() for ele in self.elements), \
+            'The elements ' + str(self.elements) + ' are not numbers, which the cages can not sum up.'
+
+        if data is not None:
+            self.check_data_and_boxes(data=data)
+            self.cells = bytearray(element_ids[i] for i in data)
+        else:
+            self.cells = cells
+            assert len(cells) == self.meta_size**4, \
+                'Length error: The input data\'s length ' + str(len(cells)) + ' does not equal to ' +  str(self.meta_size**4) + '.'
+            assert not cells or max(cells) <= len(self.elements), 'The input data has some invalid element id ' + str(max(cells))
+
+    @property
+    def data(self):
+        symbols = self.symbols
+        return [symbols[i] for i in self.cells]
+
+    @data.setter
+    def data(self, data):
+        self.check_data_and_boxes(data=data)
+        element_ids = get_elements(self.element_set, self.meta_size)[2]
+        self.cells = bytearray(element_ids[i] for i in data)
+
+    @property
+    def box_idx_list(self):
+        return [list(box) for box in self.geometry.boxes]
+
+    @property
+    def units(self):
+        return [list(unit) for unit in self.geometry.extras]
+
+    @property
+    def cages(self):
+        return [(list(idxes), total) for idxes, total in self.geometry.cages]
 
     def check_data_and_boxes(self, data=None, processed=False, box_idx_list=None):
         '''Check the correctness of data(default:None, for self.data) and box_idx_list(default:None, for self.box_idx_list).
         If processed(default:False), we ignore '' in data.
         '''
-        data = data if data else self.data
-        box_idx_list = box_idx_list if box_idx_list else self.box_idx_list
+        data = data if data is not None else self.data
         assert len(data) == self.meta_size**4, \
             'Length error: The input data\'s length ' + str(len(data)) + ' does not equal to ' +  str(self.meta_size**4) + '.'
         set_data = set(data) - {'.'} if not processed else set(data) - {'.'} - {''}
         assert set_data.issubset(self.element_set), \
             'The input data has some invalid element' + str((set_data - self.element_set))
-        assert set(sum(box_idx_list, [])) == set(range(self.meta_size**4)), \
-            'The input box_idx_list ' + str(box_idx_list) + ' cannot be combined into the range(' + str(self.meta_size**4) + ').'
+        # The boxes are checked once when the geometry of the layout is built, then the layout is cached.
+        if box_idx_list:
+            get_geometry(self.meta_size, box_idx_list)
+
+    def find_conflict(self):
+        '''Find the first contradiction of the givens: None, or (reason, idx), see find_conflict.'''
+        return find_conflict(self.cells, self.geometry, self.elements)
+
+    def conflict_message(self, conflict):
+        reason, idx = conflict
+        if reason == 'duplicate':
+            return 'Conflict error: The element ' + self.symbols[self.cells[idx]] + ' of idx ' + str(idx) + ' is given twice in a unit.'
+        if reason == 'cage':
+            return 'Conflict error: The givens of the cage of idx ' + str(idx) + ' do not fit its total.'
+        return 'Conflict error: The blank idx ' + str(idx) + ' has no candidate left.'
 
     def get_boxid_by_idx(self, idx):
         '''Use the element idx to find the box where it belongs.
@@ -88,91 +458,25 @@ class Structure():
         Output:
         - boxid(int)
         '''
-        if self.flg_regular: return int(idx / (self.meta_size**3)) * self.meta_size + int((idx % (self.meta_size**2)) / self.meta_size)
-        return int(sum(self.box_idx_list, []).index(idx) / self.meta_size**2)
+        return self.geometry.cell_boxes[idx]
     
     def display(self, data=None):
         '''Display the current situation of the sudoku.
-        
+        The skeleton of the borders and the junctions is cached per geometry and cell width, see get_display_template,
+        so the display is only a fill of the cell slots.
+
+        Input:
+        - data: if None(default), then use self.data.
+
         Output:
         - display_result(str): A string of display result
         '''
-        display = ''
-        template_data = list('.' * (self.meta_size ** 4)) if not (self.flg_regular and self.meta_size < 4) else self.data
-        for idx,char in enumerate(template_data):
-            if idx % (self.meta_size**4) == 0:
-                display += ('+' + '-' * (self.meta_size * 2 - 1)) * self.meta_size + "+\n|" + char
-            elif idx % (self.meta_size**3) == 0:
-                display += "|\n" + ('+' + '-' * (self.meta_size * 2 - 1)) * self.meta_size + "+\n|" + char
-            elif idx % (self.meta_size**2) == 0:
-                display += "|\n" + ('|' + ' ' * (self.meta_size * 2 - 1)) * self.meta_size + "|\n|" + char
-            elif idx % (self.meta_size) == 0:
-                display += '|' + char
-            else:
-                display += ' ' + char
-            idx += 1
-        display = display + "|\n" + ('+' + '-' * (self.meta_size * 2 - 1)) * self.meta_size + "+\n"
-        if self.flg_regular and self.meta_size < 4 and data is None:
-            return display
-        # Formatted display
-        template = list(display)
-        valid_idxes = []
         data = data if data else self.data
-        min_font_size = max([len(char) for char in data])
-        for idx, i in enumerate(template):
-            if i in self.element_set or i == '.':
-                valid_idxes.append(idx)
-            if idx not in valid_idxes and template[idx] != '\n':
-                template[idx] = ' '
-        for idx, i in enumerate(valid_idxes):
-            template[i] = data[idx] if len(data[idx]) == min_font_size else data[idx] + ' ' * (min_font_size - len(data[idx]))
-        # print(''.join(template))
-        
-        # Determine the margins (' ' / '|' / '-')
-        for idx in range(self.meta_size**4):
-            box = self.box_idx_list[self.get_boxid_by_idx(idx)]
-            # # For debug:
-            # print('Num:', str(idx), ' ', idx - self.meta_size**2, idx - self.meta_size**2 < 0, \
-            #     idx - self.meta_size**2, idx - self.meta_size**2 not in box, \
-            #     idx + self.meta_size**2, idx + self.meta_size**2 >= self.meta_size**4, \
-            #     idx % (self.meta_size**2), idx % (self.meta_size**2) == 0, \
-            #     idx - 1, idx - 1 not in box, \
-            #     idx % (self.meta_size**2), idx % (self.meta_size**2) == self.meta_size**2 - 1, box)
-
-            # upper
-            if idx - self.meta_size**2 < 0 or idx - self.meta_size**2 not in box:
-                template[valid_idxes[idx] - ((self.meta_size * 2) * self.meta_size + 2)] = '-' * min_font_size
-            else:
-                template[valid_idxes[idx] - ((self.meta_size * 2) * self.meta_size + 2)] = ' ' * min_font_size
-            # lower
-            if idx + self.meta_size**2 >= self.meta_size**4:
-                template[valid_idxes[idx] + ((self.meta_size * 2) * self.meta_size + 2)] = '-' * min_font_size
-            # left
-            if idx % (self.meta_size**2) == 0 or idx - 1 not in box:
-                template[valid_idxes[idx] - 1] = '|'
-            # right
-            elif idx % (self.meta_size**2) == self.meta_size**2 - 1:
-                template[valid_idxes[idx] + 1] = '|'
-        # print(''.join(template))
-
-        # Determine the juctions (' ' / '+' / '|' / '-')
-        for idx, item in enumerate(template):
-            if item == ' ':
-                flg_horizontal = False
-                flg_vertical = False
-                if idx - ((self.meta_size * 2) * self.meta_size + 2) < 0 or \
-                    idx + ((self.meta_size * 2) * self.meta_size + 2) >= len(template) \
-                    or template[idx - 1] == '-' * min_font_size or \
-                    template[idx + 1] == '-' * min_font_size: flg_horizontal = True
-                if idx % ((self.meta_size * 2) * self.meta_size + 2) == 0 or \
-                    idx % ((self.meta_size * 2) * self.meta_size + 2) == ((self.meta_size * 2) * self.meta_size) : 
-                    flg_vertical = True
-                if (idx >= ((self.meta_size * 2) * self.meta_size + 2) and \
-                    template[idx - ((self.meta_size * 2) * self.meta_size + 2)] == '|') or \
-                (idx < len(template) - ((self.meta_size * 2) * self.meta_size + 2) and \
-                    template[idx + ((self.meta_size * 2) * self.meta_size + 2)] == '|'): flg_vertical = True
-                if flg_vertical and flg_horizontal: template[idx] = '+'
-                elif flg_vertical or flg_horizontal: template[idx] = '|' if flg_vertical else '-'
-        return ''.join(template)
+        width = max([len(char) for char in data])
+        flg_plain = self.flg_regular and self.meta_size < 4 and width == 1 and all(len(char) == 1 for char in data)
+        template = get_display_template(self.geometry, width, flg_plain)
+        if flg_plain or width == 1:
+            return template % tuple(char if char else ' ' for char in data)
+        return template % tuple(char.ljust(width) for char in data)
     
     
\ No newline at end of file
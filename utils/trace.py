@@ -0,0 +1,246 @@
+# coding:utf-8
+# python3.6
+
+'''Streaming step traces of the solves, for the audit logs.
+
+Usage:
+    python -m utils.trace puzzles.txt -o traces.bin
+    python -m utils.trace --read traces.bin
+
+The steps are written by the sink of the solver (BasicSolver.sink) as they are made, so no step list is kept per puzzle.
+By default the steps of a puzzle are packed into a buffer, and a rollback of the search truncates the buffer,
+so only the steps to the result are written when the puzzle ends. With flg_rollbacks, every step and rollback is
+written to the file at once, for the audit of the whole search.
+
+Format: a header, then for every puzzle a puzzle record, its step / rollback records and an end record.
+Every record begins with its code: the technique code for a step, or ROLLBACK_CODE / PUZZLE_CODE / END_CODE.
+    header: b'SDKT' + version(uint8)
+    puzzle: PUZZLE_CODE(uint8) + meta_size(uint8) + puzzle_id(uint32) + the element ids of the cells packed as stream.pack_raw
+    step: technique code(uint8) + idx(uint8, uint16 for the grids over 256 cells) + element id(uint8) + eliminations(uint8),
+        4 bytes for the grids up to 16x16, the eliminations over 255 are saved as 255
+    rollback: ROLLBACK_CODE(uint8) + steps_num(uint32), the steps after the first steps_num are undone by the search
+    end: END_CODE(uint8) + flg_solved(uint8) + nodes(uint64) + rollbacks(uint32) + microseconds(uint64),
+        the rollbacks over 2**32 - 1 are saved as 2**32 - 1; version 1 saved the nodes and microseconds as uint32
+All the numbers are little endian, the element ids are the ones of Structure.cells.
+'''
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+from .stream import read_puzzles, raw_to_structure, pack_raw, unpack_record, get_record_size
+
+# Externel environment
+import sys
+import struct
+import argparse
+
+TRACE_MAGIC = b'SDKT'
+TRACE_VERSION = 2
+TRACE_HEADER = struct.Struct('<4sB')
+PUZZLE_RECORD = struct.Struct('<BBI')
+STEP_RECORD_SMALL = struct.Struct('<BBBB')
+STEP_RECORD = struct.Struct('<BHBB')
+ROLLBACK_RECORD = struct.Struct('<BI')
+END_RECORD = struct.Struct('<BBQIQ')
+END_RECORDS = {1: struct.Struct('<BBIII'), 2: END_RECORD} # version -> the end record, the old traces are still read
+
+# The technique code of every method, new methods are only appended so that the old traces keep their codes
+TECHNIQUES = ('scanned', 'area', 'group', 'square', 'subset', 'fish', 'guess', 'cage')
+TECHNIQUE_CODES = {method: code for code, method in enumerate(TECHNIQUES)}
+UNKNOWN_CODE = 0xFC
+ROLLBACK_CODE = 0xFD
+PUZZLE_CODE = 0xFE
+END_CODE = 0xFF
+
+def get_step_record(meta_size):
+    return STEP_RECORD_SMALL if meta_size**4 <= 256 else STEP_RECORD
+
+class TraceWriter():
+    '''The sink of the solvers writing the binary trace, see the format above.
+
+    Elements:
+    - fout: the opened binary file or buffer
+    - flg_rollbacks(Boolean): if True, then every step and rollback is written at once;
+        else, then the steps of the puzzle are buffered, and only the ones not rolled back are written at the end
+    - buffer(bytearray): the step records of the puzzle not written yet
+    - step_record(struct.Struct): the step record of the puzzle, see get_step_record
+    - element_ids: {element: id} of the puzzle being traced
+    - rollbacks: the number of rollbacks of the puzzle
+    - puzzles_num: the number of puzzles begun, the default puzzle_id
+
+    Functions:
+    - begin: Write the puzzle record
+    - step / rollback: Write a step / rollback record, called by the solver
+    - end: Write the end record of the result
+    - trace_solve: Solve a puzzle with the trace written
+    '''
+    def __init__(self, target, flg_rollbacks=False):
+        self.flg_opened = isinstance(target, str)
+        self.fout = open(target, 'wb') if self.flg_opened else target
+        self.fout.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION))
+        self.flg_rollbacks = flg_rollbacks
+        self.buffer = bytearray()
+        self.step_record = None
+        self.element_ids = None
+        self.rollbacks = 0
+        self.puzzles_num = 0
+
+    def begin(self, problem_structure, puzzle_id=None):
+        meta_size = problem_structure.meta_size
+        self.step_record = get_step_record(meta_size)
+        self.element_ids = get_elements(problem_structure.element_set, meta_size)[2]
+        self.rollbacks = 0
+        self.fout.write(PUZZLE_RECORD.pack(PUZZLE_CODE, meta_size, self.puzzles_num if puzzle_id is None else puzzle_id))
+        self.fout.write(pack_raw(problem_structure.cells, meta_size))
+        self.puzzles_num += 1
+
+    def step(self, idx, element, method, eliminations):
+        record = self.step_record.pack(TECHNIQUE_CODES.get(method, UNKNOWN_CODE), idx, self.element_ids[element], min(eliminations, 255))
+        if self.flg_rollbacks:
+            self.fout.write(record)
+        else:
+            self.buffer += record
+
+    def rollback(self, steps_num):
+        self.rollbacks += 1
+        if self.flg_rollbacks:
+            self.fout.write(ROLLBACK_RECORD.pack(ROLLBACK_CODE, steps_num))
+        else:
+            del self.buffer[steps_num * self.step_record.size:]
+
+    def end(self, result):
+        if self.buffer:
+            self.fout.write(self.buffer)
+            self.buffer = bytearray()
+        self.fout.write(END_RECORD.pack(END_CODE, int(result.flg_solved), result.nodes, min(self.rollbacks, 0xFFFFFFFF), \
+            int(result.seconds * 1e6)))
+
+    def trace_solve(self, problem_structure, puzzle_id=None, search=True, budget=None):
+        '''Solve the puzzle as solve_puzzle, with its trace written.
+
+        Output:
+        - result(SolveResult)
+        '''
+        self.begin(problem_structure, puzzle_id)
+        result = solve_puzzle(problem_structure, search=search, budget=budget, sink=self)
+        self.end(result)
+        return result
+
+    def close(self):
+        if self.flg_opened: self.fout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class TraceRecord():
+    '''The trace of a puzzle read back.
+
+    Elements:
+    - puzzle_id(int)
+    - meta_size(int)
+    - cells(bytearray): the element ids of the puzzle before solving
+    - steps(list): [(idx, element id, method, eliminations), ...], the steps undone by the rollbacks are removed
+    - rollbacks(int): the number of rollbacks of the search, the rollback records are only written with flg_rollbacks
+    - flg_solved(Boolean) / nodes(int) / seconds(float): the result of the solve
+
+    Functions:
+    - replay: Place the steps onto the Structure of the puzzle
+    '''
+    __slots__ = ('puzzle_id', 'meta_size', 'cells', 'steps', 'rollbacks', 'flg_solved', 'nodes', 'seconds')
+
+    def __init__(self, puzzle_id, meta_size, cells):
+        self.puzzle_id = puzzle_id
+        self.meta_size = meta_size
+        self.cells = cells
+        self.steps = []
+        self.rollbacks = 0
+        self.flg_solved = False
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def replay(self, problem_structure=None, steps_num=None):
+        '''Place the first steps_num steps onto the cells of the structure, without solving.
+
+        Input:
+        - problem_structure(Structure): the puzzle traced, changed in place.
+            If None(default), then a new one from the cells with the default elements, see stream.raw_to_structure
+        - steps_num(int): if None(default), then all the steps
+
+        Output:
+        - problem_structure(Structure)
+        '''
+        if problem_structure is None:
+            problem_structure = raw_to_structure(self.cells)
+        assert problem_structure.cells == self.cells, \
+            'Replay error: The structure is not the puzzle ' + str(self.puzzle_id) + ' of the trace.'
+        cells = bytearray(self.cells)
+        for idx, element_id, method, eliminations in self.steps[:steps_num]:
+            cells[idx] = element_id
+        problem_structure.cells = cells
+        return problem_structure
+
+def read_traces(source):
+    '''Read the traces lazily, one puzzle at a time.
+
+    Input:
+    - source(str / file): the path or the opened binary file
+
+    Output:
+    - generator of TraceRecord
+    '''
+    fin = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        magic, version = TRACE_HEADER.unpack(fin.read(TRACE_HEADER.size))
+        assert magic == TRACE_MAGIC, 'Format error: The source is not a trace file.'
+        assert version in END_RECORDS, 'Format error: The trace version ' + str(version) + ' is not supported.'
+        end_record = END_RECORDS[version]
+        record, step_record = None, None
+        while True:
+            tag = fin.read(1)
+            if not tag: break
+            code = tag[0]
+            if code < ROLLBACK_CODE:
+                _, idx, element_id, eliminations = step_record.unpack(tag + fin.read(step_record.size - 1))
+                record.steps.append((idx, element_id, TECHNIQUES[code] if code < len(TECHNIQUES) else None, eliminations))
+            elif code == ROLLBACK_CODE:
+                _, steps_num = ROLLBACK_RECORD.unpack(tag + fin.read(ROLLBACK_RECORD.size - 1))
+                del record.steps[steps_num:]
+            elif code == PUZZLE_CODE:
+                _, meta_size, puzzle_id = PUZZLE_RECORD.unpack(tag + fin.read(PUZZLE_RECORD.size - 1))
+                step_record = get_step_record(meta_size)
+                record = TraceRecord(puzzle_id, meta_size, unpack_record(fin.read(get_record_size(meta_size)), meta_size))
+            else:
+                _, flg_solved, record.nodes, record.rollbacks, microseconds = end_record.unpack(tag + fin.read(end_record.size - 1))
+                record.flg_solved = bool(flg_solved)
+                record.seconds = microseconds / 1e6
+                yield record
+                record = None
+    finally:
+        if isinstance(source, str): fin.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve the puzzles with their step traces written, or read the traces back.')
+    parser.add_argument('input', help='the puzzle file, see stream.read_puzzles, or the trace file with --read')
+    parser.add_argument('-o', '--output', default=None, help='the trace file to write')
+    parser.add_argument('--rollbacks', action='store_true', help='write the steps rolled back by the search as well')
+    parser.add_argument('--read', action='store_true', help='read the trace file and print a summary of every puzzle')
+    args = parser.parse_args(argv)
+    if args.read:
+        for record in read_traces(args.input):
+            counts = {}
+            for step in record.steps:
+                counts[step[2]] = counts.get(step[2], 0) + 1
+            print(str(record.puzzle_id) + '\t' + str(int(record.flg_solved)) + '\t' + str(len(record.steps)) + '\t' + \
+                str(counts) + '\t' + ','.join(record.replay().data))
+        return
+    assert args.output, 'Parameter error: The trace file to write is needed, see -o.'
+    with TraceWriter(args.output, flg_rollbacks=args.rollbacks) as writer:
+        for i, problem_structure in enumerate(read_puzzles(args.input)):
+            result = writer.trace_solve(problem_structure, puzzle_id=i)
+            sys.stderr.write('puzzle ' + str(i) + ': ' + str(len(result.steps)) + ' steps, ' + '%.2f ms' % (result.seconds * 1e3) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# coding:utf-8
+# python3.6
+
+'''Vectorized batch propagation for the regular 9x9 puzzles.
+
+The puzzles are an (N, 81) integer array, 0 for blank and 1..9 for the elements.
+The same naked singles (check_idx_only with last_left) and hidden singles (check_scanned_drop) as BasicSolver
+are found for all the puzzles at once on an (N, 81) array of candidate bitmasks, until a fixed point.
+Only the puzzles left unsolved go to the per-puzzle Predictor.
+This module needs numpy.
+'''
+
+# Our libraries:
+from .structure import *
+from .predicter import *
+from .stream import raw_to_structure, VALUES
+
+# Externel environment
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if np is not None:
+    geometry = get_geometry(3)
+    UNITS = np.array(geometry.rows + geometry.cols + geometry.boxes) # (27, 9)
+    CELL_ROWS = np.array(geometry.cell_rows)
+    CELL_COLS = np.array(geometry.cell_cols) + 9
+    CELL_BOXES = np.array(geometry.cell_boxes) + 18
+    del geometry
+    # value -> bit, bit -> value (0 if not a single bit), bit mask -> number of bits
+    BITS = np.array([0] + [1 << i for i in range(9)], dtype=np.int16)
+    BIT_VALUES = np.zeros(512, dtype=np.int8)
+    BIT_VALUES[BITS[1:]] = np.arange(1, 10)
+    BIT_NUMS = np.array([bin(mask).count('1') for mask in range(512)], dtype=np.int8)
+    FULL_MASK = 511
+
+def propagate_chunk(grids):
+    '''Propagate a chunk of puzzles in place until a fixed point.
+    The candidates of every cell are kept as a 9-bit mask, the same as the candidates of BasicSolver.
+
+    Input:
+    - grids(np.ndarray): (M, 81) int8, changed in place
+
+    Output:
+    - conflicted(np.ndarray): (M,) bool, True for the puzzles contradicting themselves
+    '''
+    conflicted = np.zeros(len(grids), dtype=bool)
+    active = np.arange(len(grids))
+    while len(active):
+        g = grids[active]
+        blank = g == 0
+        bits = BITS[g]
+        unit_bits = bits[:, UNITS] # (M, 27, 9)
+        unit_placed = np.bitwise_or.reduce(unit_bits, axis=2) # (M, 27)
+        flg_bad = (BIT_NUMS[unit_placed].sum(1) != (g > 0).sum(1) * 3) # an element placed twice in a unit
+        candidates = np.where(blank, FULL_MASK & ~(unit_placed[:, CELL_ROWS] | unit_placed[:, CELL_COLS] | unit_placed[:, CELL_BOXES]), 0)
+        flg_bad |= (blank & (candidates == 0)).any(1)
+
+        # Hidden singles: the elements seen once in a unit
+        unit_candidates = candidates[:, UNITS]
+        once = np.zeros_like(unit_placed)
+        twice = np.zeros_like(unit_placed)
+        for k in range(9):
+            twice |= once & unit_candidates[:, :, k]
+            once |= unit_candidates[:, :, k]
+        flg_bad |= ((FULL_MASK & ~unit_placed & ~once) != 0).any(1) # an element without any place left in a unit
+        hidden = once & ~twice
+        ready = candidates & (hidden[:, CELL_ROWS] | hidden[:, CELL_COLS] | hidden[:, CELL_BOXES])
+        # Naked singles
+        ready = np.where(ready != 0, ready, np.where(BIT_NUMS[candidates] == 1, candidates, 0))
+        flg_bad |= (BIT_NUMS[ready] > 1).any(1)
+
+        values = BIT_VALUES[ready]
+        values[flg_bad] = 0
+        g = np.where(values > 0, values, g)
+        grids[active] = g
+        conflicted[active[flg_bad]] = True
+        active = active[(values > 0).any(1) & (g == 0).any(1)]
+    # The placements of the last round may collide
+    unit_placed = np.bitwise_or.reduce(BITS[grids][:, UNITS], axis=2)
+    conflicted |= BIT_NUMS[unit_placed].sum(1) != (grids > 0).sum(1) * 3
+    return conflicted
+
+def batch_propagate(puzzles, chunk_size=4096):
+    '''Propagate the naked and hidden singles of all the puzzles until a fixed point.
+
+    Input:
+    - puzzles(array like): (N, 81) integers, 0 for blank
+    - chunk_size(int): the number of puzzles propagated together, which bounds the temporary memory
+
+    Output:
+    - (grids, unsolved, conflicted):
+        grids(np.ndarray): (N, 81) int8, the propagated puzzles
+        unsolved(np.ndarray): (N,) bool, True for the puzzles still needing search (including the conflicted ones)
+        conflicted(np.ndarray): (N,) bool, True for the puzzles contradicting themselves
+    '''
+    assert np is not None, 'Import error: batch_propagate needs numpy.'
+    grids = np.array(puzzles, dtype=np.int8).reshape(-1, 81)
+    assert grids.size == 0 or (grids.min() >= 0 and grids.max() <= 9), 'The input puzzles have some invalid element.'
+    conflicted = np.zeros(len(grids), dtype=bool)
+    for start in range(0, len(grids), chunk_size):
+        chunk = grids[start:start + chunk_size]
+        conflicted[start:start + chunk_size] = propagate_chunk(chunk)
+    unsolved = (grids == 0).any(1) | conflicted
+    return grids, unsolved, conflicted
+
+def batch_solve_array(puzzles, chunk_size=4096):
+    '''Solve all the puzzles: batch propagation first, then the Predictor for the puzzles left.
+
+    Output:
+    - (grids, solved): the solved (N, 81) int8 grids and an (N,) bool mask of the solved puzzles
+    '''
+    grids, unsolved, conflicted = batch_propagate(puzzles, chunk_size=chunk_size)
+    solved = ~unsolved
+    for i in np.flatnonzero(unsolved & ~conflicted):
+        predictor = Predictor(raw_to_structure(bytearray(grids[i].tobytes())))
+        if predictor.predict():
+            grids[i] = [VALUES[ele] for ele in predictor.solver.data]
+            solved[i] = True
+    return grids, solved